@@ -0,0 +1,702 @@
+"""Benchmarks for undataclass and the code it generates."""
+import ast
+from argparse import ArgumentParser
+from copy import deepcopy
+import dataclasses
+from decimal import Decimal
+import gc
+import importlib
+import inspect
+import json
+import marshal
+from operator import attrgetter
+from pathlib import Path
+import pickle
+from random import Random
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import tracemalloc
+from types import ModuleType
+
+from undataclass import (
+    SHARED_RUNTIME,
+    install_import_hook,
+    undataclass,
+    undataclass_with_stats,
+)
+
+
+def make_synthetic_module(class_count, field_count=8, unique_names=False):
+    """
+    Return code for a module with many (varied) dataclasses.
+
+    With unique_names, each class's field names are suffixed by its number,
+    so no two classes have the same fields.
+    """
+    lines = [
+        "from dataclasses import dataclass, field",
+        "from decimal import Decimal",
+    ]
+    decorators = [
+        "@dataclass",
+        "@dataclass(frozen=True)",
+        "@dataclass(order=True)",
+        "@dataclass(frozen=True, slots=True)",
+        "@dataclass(kw_only=True)",
+    ]
+    for n in range(class_count):
+        lines += ["", "", decorators[n % len(decorators)], f"class C{n}:"]
+        suffix = f"_{n}" if unique_names else ""
+        for i in range(field_count):
+            name = f"f{i}{suffix}"
+            match i % 4:
+                case _ if i < 2:
+                    lines.append(f"    {name}: int")
+                case 0:
+                    lines.append(f"    {name}: int = {i}")
+                case 1:
+                    lines.append(f"    {name}: str = 'value'")
+                case 2:
+                    lines.append(f"    {name}: Decimal = Decimal({i})")
+                case 3:
+                    lines.append(
+                        f"    {name}: list[int] = field(default_factory=list)"
+                    )
+        if n % len(decorators) == 0:
+            lines += [
+                "",
+                "    def __post_init__(self):",
+                f"        self.total = self.f0{suffix} * 2",
+            ]
+    return "\n".join(lines) + "\n"
+
+
+RECORD_MODULE = """
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, order=True)
+class Record:
+    id: int
+    name: str
+    price: float
+    tags: tuple
+
+
+@dataclass(frozen=True)
+class Key:
+    id: int
+"""
+
+
+FROZEN_MODULE = """
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Frozen:
+    a: int
+    b: int
+    c: int
+    d: int
+    e: int
+    f: int
+
+
+@dataclass(frozen=True, slots=True)
+class FrozenSlots:
+    a: int
+    b: int
+    c: int
+    d: int
+    e: int
+    f: int
+"""
+
+
+def make_wide_module(field_count, subclass_count=0):
+    """Return code for a wide dataclass & a chain of its subclasses."""
+    third = field_count // 3
+    lines = [
+        "from dataclasses import KW_ONLY, InitVar, dataclass, field",
+        "@dataclass",
+        "class Wide:",
+        *(f"    a{n}: int = {n}" for n in range(third)),
+        *(f"    b{n}: InitVar[int] = {n}" for n in range(third)),
+        "    _: KW_ONLY",
+        *(
+            f"    c{n}: int = field(kw_only=True, default={n})"
+            for n in range(field_count - 2*third)
+        ),
+    ]
+    for n in range(subclass_count):
+        base = f"Sub{n-1}" if n else "Wide"
+        lines += ["@dataclass", f"class Sub{n}({base}):", f"    s{n}: int = 0"]
+    return "\n".join(lines)
+
+
+def load_module(code, name):
+    """Execute code as an importable (and so picklable) module."""
+    module = ModuleType(name)
+    sys.modules[name] = module
+    exec(compile(code, name, "exec"), module.__dict__)
+    return module
+
+
+def best_time(func, repeat=5, number=1):
+    """Return the best per-call time (in seconds) of several timed runs."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = perf_counter()
+        for _ in range(number):
+            func()
+        times.append((perf_counter() - start) / number)
+    return min(times)
+
+
+def bench_transform(class_count=500):
+    """
+    Time each phase of undataclass() on a module of many dataclasses.
+
+    Methods used to be generated as code strings & parsed, so reparse is the
+    time to parse the code of the converted classes: a lower bound on that
+    approach's cost (on top of formatting the strings), to compare with the
+    methods phase that builds the same nodes directly.
+    """
+    code = make_synthetic_module(class_count)
+    result = undataclass(code)
+    parse_time = best_time(lambda: ast.parse(code))
+    unparse_tree = ast.parse(result)
+    unparse_time = best_time(lambda: ast.unparse(unparse_tree))
+    total_time = best_time(lambda: undataclass(code))
+    class_sources = [
+        ast.unparse(node)
+        for node in unparse_tree.body
+        if isinstance(node, ast.ClassDef)
+    ]
+    reparse_time = best_time(
+        lambda: [ast.parse(source) for source in class_sources]
+    )
+    methods_time = min(
+        undataclass_with_stats(code)[1].phase_seconds["methods"]
+        for _ in range(5)
+    )
+    return {
+        "classes": class_count,
+        "parse_seconds": parse_time,
+        "transform_seconds": total_time - parse_time - unparse_time,
+        "unparse_seconds": unparse_time,
+        "total_seconds": total_time,
+        "methods_seconds": methods_time,
+        "reparse_seconds": reparse_time,
+        "reparse_ratio": reparse_time / methods_time,
+    }
+
+
+def bench_methods(class_count=500):
+    """
+    Time generating methods against copying previously generated ones.
+
+    Later steps set line numbers on (and callers may change) the generated
+    nodes, so a memo of them would have to copy its nodes for each class.
+    A copy_ratio above 1 means generating the methods again is faster.
+    """
+    code = make_synthetic_module(class_count)
+
+    def methods_seconds():
+        _, stats = undataclass_with_stats(code)
+        return stats.phase_seconds["methods"]
+    generate_time = min(methods_seconds() for _ in range(5))
+    bodies = [
+        node.body
+        for node in ast.parse(undataclass(code)).body
+        if isinstance(node, ast.ClassDef)
+    ]
+    copy_time = best_time(lambda: deepcopy(bodies))
+    return {
+        "classes": class_count,
+        "generate_seconds": generate_time,
+        "copy_seconds": copy_time,
+        "copy_ratio": copy_time / generate_time,
+    }
+
+
+def bench_compare(number=200_000):
+    """Time __eq__, __lt__ & __hash__ with fast_compare and cache_hash."""
+    results = {}
+    labels = [
+        ("default", {}),
+        ("fast", {"fast_compare": True}),
+        ("cached", {"cache_hash": True}),
+    ]
+    for label, options in labels:
+        module = load_module(
+            undataclass(RECORD_MODULE, **options),
+            f"record_{label}",
+        )
+        a = module.Record(1, "widget", 9.99, ("a", "b"))
+        b = module.Record(1, "widget", 9.99, ("a", "b"))
+        c = module.Record(2, "widget", 9.99, ("a", "b"))
+        key = module.Key(12345)
+        operations = {
+            "eq_identical": lambda: a == a,
+            "eq_equal": lambda: a == b,
+            "eq_first_field_differs": lambda: a == c,
+            "lt_first_field_differs": lambda: a < c,
+            "hash": lambda: hash(a),
+            "hash_single_field": lambda: hash(key),
+        }
+        for operation, func in operations.items():
+            seconds = best_time(func, number=number)
+            results[f"{label}_{operation}_ns"] = seconds * 1e9
+    return results
+
+
+SAMPLE_VALUES = {
+    "int": 1,
+    "float": 1.5,
+    "str": "value",
+    "Decimal": Decimal("1.50"),
+    "list": [],
+    "tuple": (),
+}
+
+
+def sample_arguments(cls):
+    """Return keyword arguments for all required __init__ arguments."""
+    arguments = {}
+    for parameter in inspect.signature(cls).parameters.values():
+        if parameter.default is parameter.empty:
+            annotation = getattr(
+                parameter.annotation,
+                "__name__",
+                parameter.annotation,
+            )
+            arguments[parameter.name] = SAMPLE_VALUES.get(annotation, 1)
+    return arguments
+
+
+def instance_size(cls, arguments, count=1000):
+    """Return the average memory (in bytes) allocated per instance."""
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        instances = [cls(**arguments) for _ in range(count)]
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del instances
+    return (end - start) / count
+
+
+def runtime_operations(cls, arguments, field_names):
+    """Return timeable operations that work on instances of cls."""
+    a, b = cls(**arguments), cls(**arguments)
+    operations = {
+        "instantiate": lambda: cls(**arguments),
+        "eq": lambda: a == b,
+        "hash": lambda: hash(a),
+        "order": lambda: a < b,
+        "repr": lambda: repr(a),
+        "pickle": lambda: pickle.loads(pickle.dumps(a)),
+    }
+    if field_names:  # attrgetter requires at least one attribute name
+        get_fields = attrgetter(*field_names)
+        operations["attribute_access"] = lambda: get_fields(a)
+    working_operations = {}
+    for name, operation in operations.items():
+        try:
+            operation()
+        except Exception:  # e.g. unhashable, unorderable, or unpicklable
+            continue
+        working_operations[name] = operation
+    return working_operations
+
+
+def runtime_modules():
+    """Return name and code for each module to compare at runtime."""
+    before = Path(__file__).parent / "test_files" / "before"
+    modules = {
+        path.stem: path.read_text()
+        for path in sorted(before.glob("*.py"))
+    }
+    modules["synthetic"] = make_synthetic_module(5)
+    return modules
+
+
+def bench_runtime(number=5_000, **options):
+    """
+    Time dataclasses against their converted classes at runtime.
+
+    Each *_ratio is the converted time (or size) divided by the dataclass
+    one, so ratios above 1 mean the converted code is slower (or bigger).
+    """
+    results = {}
+    for module_name, code in runtime_modules().items():
+        try:
+            dataclass_module = load_module(code, f"{module_name}_dataclass")
+            converted_module = load_module(
+                undataclass(code, **options),
+                f"{module_name}_undataclass",
+            )
+        except Exception as error:
+            error_name = type(error).__name__
+            results[f"{module_name}.error"] = f"{error_name}: {error}"
+            continue
+        for name, dataclass_cls in vars(dataclass_module).items():
+            if not dataclasses.is_dataclass(dataclass_cls):
+                continue
+            converted_cls = getattr(converted_module, name)
+            prefix = f"{module_name}.{name}"
+            field_names = [f.name for f in dataclasses.fields(dataclass_cls)]
+            try:
+                arguments = sample_arguments(dataclass_cls)
+                sizes = [
+                    instance_size(cls, arguments)
+                    for cls in (dataclass_cls, converted_cls)
+                ]
+                dataclass_operations, converted_operations = [
+                    runtime_operations(cls, arguments, field_names)
+                    for cls in (dataclass_cls, converted_cls)
+                ]
+            except Exception as error:  # can't build from sample arguments
+                error_name = type(error).__name__
+                results[f"{prefix}.skipped"] = f"{error_name}: {error}"
+                continue
+            results[f"{prefix}.memory_dataclass_bytes"] = sizes[0]
+            results[f"{prefix}.memory_undataclass_bytes"] = sizes[1]
+            results[f"{prefix}.memory_ratio"] = sizes[1] / sizes[0]
+            for operation, func in dataclass_operations.items():
+                if operation not in converted_operations:
+                    results[f"{prefix}.{operation}_undataclass"] = "failed"
+                    continue
+                key = f"{prefix}.{operation}"
+                times = [
+                    best_time(func, number=number),
+                    best_time(converted_operations[operation], number=number),
+                ]
+                results[f"{key}_dataclass_ns"] = times[0] * 1e9
+                results[f"{key}_undataclass_ns"] = times[1] * 1e9
+                results[f"{key}_ratio"] = times[1] / times[0]
+    return results
+
+
+def bench_frozen_init(number=200_000):
+    """Time creating frozen dataclasses and generated (or tuple) classes."""
+    modules = {
+        "dataclass": load_module(FROZEN_MODULE, "frozen_dataclass"),
+        "default": load_module(undataclass(FROZEN_MODULE), "frozen_default"),
+        "fast": load_module(
+            undataclass(FROZEN_MODULE, fast_frozen_init=True),
+            "frozen_fast",
+        ),
+        "tuple": load_module(
+            undataclass(FROZEN_MODULE, tuple_backed=True),
+            "frozen_tuple",
+        ),
+    }
+    results = {}
+    for label, module in modules.items():
+        for class_name in ["Frozen", "FrozenSlots"]:
+            cls = getattr(module, class_name)
+            seconds = best_time(lambda: cls(1, 2, 3, 4, 5, 6), number=number)
+            results[f"{label}_{class_name}_ns"] = seconds * 1e9
+    return results
+
+
+def bench_replace(number=100_000):
+    """Time dataclasses.replace against generated __replace__ methods."""
+    dataclass_module = load_module(FROZEN_MODULE, "replace_dataclass")
+    converted_module = load_module(
+        undataclass(FROZEN_MODULE, replace=True),
+        "replace_converted",
+    )
+    results = {}
+    for class_name in ["Frozen", "FrozenSlots"]:
+        original = getattr(dataclass_module, class_name)(1, 2, 3, 4, 5, 6)
+        converted = getattr(converted_module, class_name)(1, 2, 3, 4, 5, 6)
+        seconds = best_time(
+            lambda: dataclasses.replace(original, c=0),
+            number=number,
+        )
+        results[f"dataclasses_replace_{class_name}_ns"] = seconds * 1e9
+        seconds = best_time(lambda: converted.__replace__(c=0), number=number)
+        results[f"generated_replace_{class_name}_ns"] = seconds * 1e9
+    return results
+
+
+def bench_asdict(number=20_000):
+    """Time dataclasses.asdict & astuple against generated methods."""
+    code = (Path(__file__).parent / "test_files/before/asdict.py").read_text()
+    modules = {
+        "dataclass": load_module(code, "asdict_dataclass"),
+        "converted": load_module(undataclass(code), "asdict_converted"),
+    }
+    results = {}
+    for label, module in modules.items():
+        low, high = module.Point(0, 0.5), module.Point(2, 3.5)
+        shapes = [
+            module.Shape("square", [low, high], {"a": low}, module.Pair(1, 2))
+        ]
+        for function in [module.serialize, module.rows]:
+            seconds = best_time(lambda: function(shapes), number=number)
+            results[f"{label}_{function.__name__}_ns"] = seconds * 1e9
+    return results
+
+
+def bench_shared_runtime(class_count=2000):
+    """
+    Compare module size & import time of inlined and shared methods.
+
+    The shared runtime's caches are cleared before each import, so every
+    class pays for making its methods.  Shared methods save the most when
+    many classes have the same fields ("same_fields"); when every class has
+    different fields ("unique_fields") they're about as fast as inlined.
+    """
+    runtime = load_module(SHARED_RUNTIME, "dataclass_runtime")
+
+    def import_shared(bytecode):
+        runtime.class_methods.cache_clear()
+        runtime._getter.cache_clear()
+        exec(marshal.loads(bytecode), {"__name__": "shared"})
+
+    results = {}
+    for shape, unique_names in [("same", False), ("unique", True)]:
+        code = make_synthetic_module(class_count, unique_names=unique_names)
+        bytecode = {}
+        for label, options in [
+            ("inlined", {}),
+            ("shared", {"shared_runtime": runtime.__name__}),
+        ]:
+            new_code = undataclass(code, **options)
+            bytecode[label] = marshal.dumps(compile(new_code, label, "exec"))
+            prefix = f"{shape}_fields_{label}"
+            results[f"{prefix}_source_bytes"] = len(new_code.encode())
+            results[f"{prefix}_bytecode_bytes"] = len(bytecode[label])
+        inlined_seconds = shared_seconds = float("inf")
+        for _ in range(20):  # Alternated, so both see the same machine load
+            inlined_seconds = min(inlined_seconds, best_time(
+                lambda: exec(marshal.loads(bytecode["inlined"]), {}),
+                repeat=1,
+            ))
+            shared_seconds = min(shared_seconds, best_time(
+                lambda: import_shared(bytecode["shared"]),
+                repeat=1,
+            ))
+        results[f"{shape}_fields_inlined_import_seconds"] = inlined_seconds
+        results[f"{shape}_fields_shared_import_seconds"] = shared_seconds
+        inlined = len(bytecode["inlined"])
+        shared = len(bytecode["shared"])
+        results[f"{shape}_fields_bytecode_saving_percent"] = (
+            (inlined - shared) / inlined * 100
+        )
+        results[f"{shape}_fields_import_saving_percent"] = (
+            (inlined_seconds - shared_seconds) / inlined_seconds * 100
+        )
+    return results
+
+
+def bench_annotations(class_count=500):
+    """Time executing modules with kept, lazy, and stripped annotations."""
+    lines = [
+        "from dataclasses import dataclass, field",
+        "from typing import Callable, Optional, Union",
+    ]
+    for n in range(class_count):
+        other = f"C{n-1}" if n else "int"  # Varied so typing can't cache
+        lines += [
+            "",
+            "",
+            "@dataclass",
+            f"class C{n}:",
+            "    name: str",
+            f"    parents: dict[str, list[Optional[{other}]]] = "
+            "field(default_factory=dict)",
+            f"    handler: Optional[Callable[[{other}], Union[{other}, str]]]"
+            " = None",
+        ]
+    code = "\n".join(lines) + "\n"
+    results = {}
+    for mode in ["keep", "lazy", "strip"]:
+        compiled = compile(undataclass(code, annotations=mode), mode, "exec")
+        results[f"{mode}_import_seconds"] = best_time(
+            lambda: exec(compiled, {"__name__": mode}),
+            repeat=20,
+        )
+    return results
+
+
+ORDERED_MODULE = """
+from dataclasses import dataclass
+
+@dataclass(order=True)
+class Version:
+    major: int
+    minor: int
+    patch: int
+"""
+
+
+def with_total_ordering(code):
+    """Return converted code changed to derive __le__, etc. from __lt__."""
+    derived = {"__le__", "__gt__", "__ge__"}
+    tree = ast.parse(code)
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            node.body = [
+                n
+                for n in node.body
+                if getattr(n, "name", None) not in derived
+            ]
+            node.decorator_list.append(ast.Name("total_ordering", ast.Load()))
+    return "from functools import total_ordering\n" + ast.unparse(tree)
+
+
+def bench_sort(count=10_000, number=20):
+    """Time sorting & finding extremes of dataclasses and converted classes."""
+    converted = undataclass(ORDERED_MODULE)
+    modules = {
+        "dataclass": ORDERED_MODULE,
+        "total_ordering": with_total_ordering(converted),
+        "converted": converted,
+        "fast_compare": undataclass(ORDERED_MODULE, fast_compare=True),
+    }
+    generator = Random(0)
+    values = [
+        [generator.randrange(3) for _ in range(3)]
+        for _ in range(count)
+    ]
+    results = {}
+    for label, code in modules.items():
+        Version = load_module(code, f"sort_{label}").Version
+        versions = [Version(*arguments) for arguments in values]
+        operations = {
+            "sorted": lambda: sorted(versions),
+            "max": lambda: max(versions),
+            "ge": lambda: [a >= b for a, b in zip(versions, versions[1:])],
+        }
+        for name, operation in operations.items():
+            seconds = best_time(operation, number=number)
+            results[f"{label}_{name}_ms"] = seconds * 1e3
+    return results
+
+
+def bench_import(class_count=200):
+    """Time importing dataclasses with and without the import hook."""
+    code = make_synthetic_module(class_count)
+    results = {}
+    with TemporaryDirectory() as directory:
+        for package in ["plain_models", "hooked_models"]:
+            Path(directory, package).mkdir()
+            Path(directory, package, "__init__.py").touch()
+            Path(directory, package, "models.py").write_text(code)
+        importlib.invalidate_caches()
+        sys.path.insert(0, directory)
+        finder = install_import_hook(["hooked_models"])
+        dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+        try:
+            for package in ["plain_models", "hooked_models"]:
+                def import_models(name=f"{package}.models"):
+                    sys.modules.pop(name, None)
+                    importlib.import_module(name)
+                start = perf_counter()
+                import_models()  # Writes the .pyc file
+                results[f"{package}_first_import_seconds"] = (
+                    perf_counter() - start
+                )
+                results[f"{package}_cached_import_seconds"] = (
+                    best_time(import_models)
+                )
+        finally:
+            sys.dont_write_bytecode = dont_write_bytecode
+            sys.meta_path.remove(finder)
+            sys.path.remove(directory)
+    plain = results["plain_models_cached_import_seconds"]
+    hooked = results["hooked_models_cached_import_seconds"]
+    results["saving_seconds"] = plain - hooked
+    results["saving_percent"] = (plain - hooked) / plain * 100
+    return results
+
+
+def bench_scaling():
+    """
+    Time the fields & methods phases for wide classes and 4 times wider ones.
+
+    Each *_growth is the wider class's time divided by the narrower one's,
+    so linear growth is about 4 and quadratic growth about 16.
+    """
+    results = {}
+    cases = [
+        ("wide", (2_500, 10_000), 0),
+        ("inherited", (500, 2_000), 10),
+    ]
+    for label, sizes, subclass_count in cases:
+        times = []
+        for size in sizes:
+            code = make_wide_module(size, subclass_count)
+            gc.disable()  # Collections of large trees aren't linear
+            try:
+                _, stats = undataclass_with_stats(code)
+            finally:
+                gc.enable()
+            seconds = stats.phase_seconds["fields"]
+            seconds += stats.phase_seconds["methods"]
+            results[f"{label}_{size}_fields_seconds"] = seconds
+            times.append(seconds)
+        results[f"{label}_growth"] = times[1] / times[0]
+    return results
+
+
+BENCHMARKS = {
+    "transform": bench_transform,
+    "methods": bench_methods,
+    "scaling": bench_scaling,
+    "compare": bench_compare,
+    "frozen_init": bench_frozen_init,
+    "sort": bench_sort,
+    "replace": bench_replace,
+    "asdict": bench_asdict,
+    "runtime": bench_runtime,
+    "shared_runtime": bench_shared_runtime,
+    "annotations": bench_annotations,
+    "import": bench_import,
+}
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "names",
+        nargs="*",
+        metavar="name",
+        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print a machine-readable JSON report",
+    )
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    report = {
+        name: BENCHMARKS[name]()
+        for name in args.names or BENCHMARKS
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for name, results in report.items():
+        print(name)
+        for key, value in results.items():
+            if isinstance(value, float):
+                value = f"{value:.6f}"
+            print(f"    {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
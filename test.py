@@ -1,19 +1,65 @@
+import ast
+import asyncio
+import copy
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+import dataclasses
+from functools import partial
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+import importlib
+from io import StringIO
+import json
+import operator
+import os
 from pathlib import Path
+import shutil
+import sys
+from tempfile import TemporaryDirectory
+from textwrap import dedent
+from types import ModuleType
+import threading
 import unittest
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+import warnings
 
-from undataclass import undataclass
+import undataclass as module
+from undataclass import (
+    ConversionService,
+    DataclassIndex,
+    UndataclassWarning,
+    cache_path,
+    cached_undataclass,
+    install_import_hook,
+    main,
+    make_request_handler,
+    prune_cache,
+    read_cache,
+    undataclass,
+    undataclass_ast,
+    undataclass_many,
+    undataclass_many_async,
+    undataclass_stub,
+    undataclass_with_stats,
+    write_cache,
+)
+
+
+TESTS = Path(__file__).parent / "test_files"
 
 
 class TestUndataclass(unittest.TestCase):
 
     maxDiff = 10_000
 
-    def validate(self, module_name):
-        tests = Path(__file__).parent / "test_files"
+    def validate(self, module_name, **options):
         filename = f"{module_name}.py"
-        before = Path(tests / "before" / filename).read_text()
-        after = Path(tests / "after" / filename).read_text()
-        self.assertEqual(undataclass(before) + "\n", after)
+        before = Path(TESTS / "before" / filename).read_text()
+        after = Path(TESTS / "after" / filename).read_text()
+        self.assertEqual(undataclass(before, **options) + "\n", after)
 
     def test_from_import_no_args_no_fields_or_defaults(self):
         """Tests no-args dataclass, docstring, and no defaults."""
@@ -39,6 +85,1070 @@ class TestUndataclass(unittest.TestCase):
         """Tests non-dataclass and also regular methods."""
         self.validate("with_functions_and_regular_class")
 
+    def test_splice_keeps_code_outside_dataclasses(self):
+        """Tests splice mode keeps comments & formatting of other code."""
+        before = Path(TESTS / "before" / "splice.py").read_text()
+        after = Path(TESTS / "after" / "splice.py").read_text()
+        self.assertEqual(undataclass(before, splice=True), after)
+
+    def test_fast_compare(self):
+        """Tests tuple-free __eq__, __lt__, and __hash__ methods."""
+        self.validate("fast_compare", fast_compare=True)
+
+    def test_fast_frozen_init(self):
+        """Tests frozen __init__ methods that skip object.__setattr__."""
+        self.validate("fast_frozen_init", fast_frozen_init=True)
+
+    def test_cache_hash(self):
+        """Tests __hash__ caching with hidden slot & __getstate__."""
+        self.validate("cache_hash", cache_hash=True)
+
+    def test_replace(self):
+        """Tests __replace__ with InitVars, init=False & kw-only fields."""
+        self.validate("replace", replace=True)
+
+    def test_asdict_and_astuple_calls(self):
+        """Tests _asdict & _astuple methods and rewritten calls to them."""
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", UndataclassWarning)
+            self.validate("asdict")
+        code = dedent("""
+            from dataclasses import asdict, dataclass
+            @dataclass
+            class Point:
+                x: int
+            rows = map(asdict, points)
+        """)
+        with self.assertWarnsRegex(UndataclassWarning, "asdict on line 6"):
+            new_code = undataclass(code)
+        self.assertIn("def _asdict(self):", new_code)
+        self.assertIn("map(asdict, points)", new_code)
+
+    def test_field_table(self):
+        """Tests __field_table__ attributes and rewritten fields() calls."""
+        self.validate("field_table")
+
+    def test_shared_runtime(self):
+        """Tests methods assigned from a shared runtime module."""
+        self.validate("shared_runtime", shared_runtime="dataclass_runtime")
+
+    def test_strip_annotations(self):
+        """Tests stripping annotations from converted classes."""
+        self.validate("annotations", annotations="strip", splice=True)
+
+    def test_lazy_annotations(self):
+        code = (TESTS / "before" / "annotations.py").read_text()
+        lines = undataclass(code, annotations="lazy", splice=True).splitlines()
+        self.assertEqual(lines[:3], [
+            '"""Models with annotations that are expensive to evaluate."""',
+            "from __future__ import annotations",
+            "from typing import ClassVar, Optional",
+        ])
+        self.assertIn(
+            "    def __init__(self, sensor: str, values: "
+            "list[Optional[float]]=None, *, unit: str='C') -> None:",
+            lines,
+        )
+        lazy_code = "\n".join(lines)
+        self.assertEqual(
+            undataclass(lazy_code, annotations="lazy", splice=True),
+            lazy_code,
+        )
+        with self.assertRaises(ValueError):
+            undataclass(code, annotations="eager")
+
+    def test_stub(self):
+        code = (TESTS / "before" / "annotations.py").read_text()
+        stub = (TESTS / "after" / "annotations.pyi").read_text()
+        self.assertEqual(undataclass_stub(code) + "\n", stub)
+        self.assertEqual(
+            undataclass_stub(code, shared_runtime="runtime") + "\n",
+            stub,
+        )
+
+    def test_auto_slots(self):
+        """Tests __slots__ are added only to classes that look safe."""
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.validate("auto_slots", auto_slots=True)
+        self.assertEqual([(w.category, str(w.message)) for w in caught], [
+            (
+                UndataclassWarning,
+                "not adding __slots__ to Cached: sets self.lookups",
+            ),
+            (
+                UndataclassWarning,
+                "not adding __slots__ to CalibratedReading: "
+                "inherits from Reading",
+            ),
+        ])
+
+    def test_auto_slots_skips_subclassed_frozen_classes(self):
+        """Tests frozen classes with subclasses in the module keep __dict__."""
+        code = dedent("""
+            from dataclasses import dataclass
+            @dataclass(frozen=True)
+            class Base:
+                x: int
+            @dataclass(frozen=True)
+            class Sub(Base):
+                z: int = 0
+        """)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            new_code = undataclass(code, auto_slots=True)
+        self.assertIn(
+            "not adding __slots__ to Base: is subclassed by Sub",
+            [str(w.message) for w in caught],
+        )
+        namespace = {}
+        exec(new_code, namespace)
+        sub = namespace["Sub"](1, 5)
+        self.assertEqual(copy.copy(sub), sub)
+        self.assertEqual(repr(copy.copy(sub)), "Sub(x=1, z=5)")
+
+    def test_tuple_backed(self):
+        """Tests tuple subclasses for frozen classes that look safe."""
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.validate("tuple_backed", tuple_backed=True)
+        self.assertEqual([str(w.message) for w in caught], [
+            "not making Reading tuple-backed: has __post_init__",
+            "not making Node tuple-backed: is subclassed by Leaf",
+            "not making Leaf tuple-backed: inherits from Node",
+        ])
+
+    def test_ast_in_and_out(self):
+        """Tests undataclass_ast converts a tree without modifying it."""
+        before = Path(TESTS / "before" / "fast_compare.py").read_text()
+        after = Path(TESTS / "after" / "fast_compare.py").read_text()
+        tree = ast.parse(before)
+        original = ast.dump(tree, include_attributes=True)
+        new_tree = undataclass_ast(tree, fast_compare=True)
+        self.assertEqual(ast.dump(tree, include_attributes=True), original)
+        self.assertEqual(ast.unparse(new_tree) + "\n", after)
+        compile(new_tree, "fast_compare.py", "exec")
+        new_nodes = undataclass_ast(tree.body, fast_compare=True)
+        self.assertEqual(ast.unparse(new_nodes) + "\n", after)
+        result = undataclass_ast(tree, in_place=True, fast_compare=True)
+        self.assertIs(result, tree)
+        self.assertEqual(ast.unparse(tree) + "\n", after)
+        with self.assertRaises(TypeError):
+            undataclass_ast(tree, splice=True)
+
+    def test_generated_methods_are_not_shared(self):
+        """Tests changing returned nodes doesn't affect later conversions."""
+        template = "@dataclass\nclass {}:\n    unshared_field: int\n"
+        tree = undataclass_ast(ast.parse(template.format("A")))
+        for node in ast.walk(tree):
+            if getattr(node, "attr", None) == "unshared_field":
+                node.attr = "renamed"
+        new_tree = undataclass_ast(ast.parse(
+            "\n" * 9 + template.format("B")
+        ))
+        self.assertNotIn("renamed", ast.unparse(new_tree))
+        self.assertIn("self.unshared_field = unshared_field", ast.unparse(
+            new_tree
+        ))
+        line_numbers = {
+            node.lineno
+            for node in ast.walk(new_tree)
+            if hasattr(node, "lineno")
+        }
+        self.assertGreaterEqual(min(line_numbers), 10)
+
+    def test_stats(self):
+        """Tests undataclass_with_stats counts classes, fields & methods."""
+        before = Path(TESTS / "before" / "inheritance.py").read_text()
+        after = Path(TESTS / "after" / "inheritance.py").read_text()
+        new_code, stats = undataclass_with_stats(before)
+        self.assertEqual(new_code + "\n", after)
+        self.assertEqual((stats.files, stats.classes, stats.fields), (1, 4, 9))
+        self.assertEqual(stats.generated["__init__"], 4)
+        self.assertEqual(
+            sorted(name for _, name in stats.slowest_classes),
+            ["Base", "Base", "C", "D"],
+        )
+        self.assertEqual(
+            list(stats.phase_seconds),
+            ["parse", "fields", "methods", "unparse", "total"],
+        )
+
+
+class TestGeneratedCode(unittest.TestCase):
+
+    def load_classes(self, module_name, *class_names, **options):
+        """Return classes from module as dataclasses and as converted code."""
+        before = Path(TESTS / "before" / f"{module_name}.py").read_text()
+        dataclass_namespace, converted_namespace = {}, {}
+        exec(before, dataclass_namespace)
+        exec(undataclass(before, **options), converted_namespace)
+        return [
+            [namespace[name] for name in class_names]
+            for namespace in (dataclass_namespace, converted_namespace)
+        ]
+
+    def test_fast_compare_matches_dataclasses(self):
+        results = []
+        for Version, Tag in self.load_classes(
+            "fast_compare", "Version", "Tag", fast_compare=True,
+        ):
+            same = Version(1, 2)
+            pairs = [
+                (same, same),
+                (Version(1, 2), Version(1, 2, "beta")),
+                (Version(1, 2), Version(1, 3)),
+                (Version(2), Version(1, 9)),
+                (Version(1), (1, 0)),
+                (Tag("a"), Tag("a")),
+                (Tag("a"), Tag("b")),
+            ]
+            results.append([
+                (a == b, a != b, hash(a) == hash(b))
+                for a, b in pairs
+            ] + [
+                (a < b, a <= b, a > b, a >= b)
+                for a, b in pairs[:4]
+            ])
+        dataclass_results, converted_results = results
+        self.assertEqual(converted_results, dataclass_results)
+
+    def test_fast_compare_treats_identical_fields_as_equal(self):
+        results = []
+        nan = float("nan")
+        for Version, Tag in self.load_classes(
+            "fast_compare", "Version", "Tag", fast_compare=True,
+        ):
+            pairs = [
+                (Version(nan), Version(nan)),
+                (Version(1, nan), Version(1, nan)),
+                (Version(nan, 1), Version(nan, 2)),
+                (Version(1, nan), Version(1, float("nan"))),
+            ]
+            results.append([
+                (a == b, a != b, a < b, a <= b, a > b, a >= b)
+                for a, b in pairs
+            ] + [Tag(nan) == Tag(nan)])
+        dataclass_results, converted_results = results
+        self.assertEqual(converted_results, dataclass_results)
+
+    def test_ordering_matches_dataclasses(self):
+        results = []
+        for [Item] in self.load_classes("splice", "Item"):
+            pairs = [
+                (Item("a", 1), Item("a", 1)),
+                (Item("a", 1), Item("a", 2)),
+                (Item("b", 1), Item("a", 2)),
+            ]
+            results.append([
+                (a < b, a <= b, a > b, a >= b)
+                for a, b in pairs
+            ])
+            for operation in ["__lt__", "__le__", "__gt__", "__ge__"]:
+                self.assertIn(operation, vars(Item))
+                with self.assertRaises(TypeError):
+                    getattr(operator, operation)(Item("a", 1), ("a", 1))
+        dataclass_results, converted_results = results
+        self.assertEqual(converted_results, dataclass_results)
+
+    def test_fast_frozen_init_stays_frozen(self):
+        _, (Point, Size, LabeledCell) = self.load_classes(
+            "fast_frozen_init", "Point", "Size", "LabeledCell",
+            fast_frozen_init=True,
+        )
+        point, size = Point(1.5, 2), Size(3, 4)
+        self.assertEqual((point.x, point.y, point.tags), (1.5, 2, []))
+        self.assertEqual((size.width, size.height), (3, 4))
+        cell = LabeledCell(1, "a")
+        self.assertEqual((cell.row, cell.label), (1, "a"))
+        self.assertFalse(hasattr(size, "__dict__"))
+        with self.assertRaises(ValueError):
+            Size(-1, 4)
+        for obj, name in [(point, "x"), (size, "width")]:
+            with self.assertRaises(AttributeError):
+                setattr(obj, name, 0)
+
+    def test_cached_hash_is_not_copied(self):
+        [Key, SlotsKey], converted = self.load_classes(
+            "cache_hash", "Key", "SlotsKey", cache_hash=True,
+        )
+        for original, cls in zip([Key, SlotsKey], converted):
+            key = cls("users", ("a", 1))
+            self.assertEqual(hash(key), hash(original("users", ("a", 1))))
+            self.assertEqual(hash(key), hash(key))
+            clone = copy.copy(key)
+            with self.assertRaises(AttributeError):
+                clone._cached_hash
+            self.assertEqual((clone, hash(clone)), (key, hash(key)))
+
+    def test_replace_matches_dataclasses(self):
+        classes = self.load_classes(
+            "replace", "Point", "Reading", "Request", "Query", replace=True,
+        )
+        results = []
+        for Point, Reading, Request, Query in classes:
+            objects = [
+                Point(1.5),
+                Reading("a", 2.0, offset=1.0),
+                Request(url="/", headers={"a": "b"}),
+                Query("text", limit=5),
+            ]
+            changes = [
+                {"y": 2},
+                {"raw": 4.0},
+                {"sensor": "b", "raw": 1.0, "offset": 2.0},
+                {},
+                {"value": 1},
+                {"timeout": 1.0},
+                {"text": "new"},
+                {"unknown": 1},
+            ]
+            outcomes = []
+            for obj in objects:
+                for change in changes:
+                    try:
+                        if dataclasses.is_dataclass(obj):
+                            new = dataclasses.replace(obj, **change)
+                        else:
+                            new = obj.__replace__(**change)
+                    except (TypeError, ValueError) as error:
+                        outcomes.append(f"{type(error).__name__}: {error}")
+                    else:
+                        self.assertIsNot(new, obj)
+                        outcomes.append(repr(new))
+            results.append(outcomes)
+        dataclass_results, converted_results = results
+        self.assertEqual(converted_results, dataclass_results)
+
+    def test_asdict_matches_dataclasses(self):
+        class Opaque:  # Not a converted class, so _asdict isn't called
+            def _asdict(self):
+                return "called"
+
+            def __eq__(self, other):
+                return isinstance(other, Opaque)
+        results = []
+        for Point, Shape, Pair, serialize, rows in self.load_classes(
+            "asdict", "Point", "Shape", "Pair", "serialize", "rows",
+        ):
+            low, high = Point(0, 0.5), Point(2, 3.5)
+            shape = Shape("square", [low, high], {"a": low}, Pair(low, high))
+            [as_dict, opaque_dict] = serialize([
+                shape,
+                Shape("opaque", labels={"b": Opaque()}),
+            ])
+            [as_tuple] = rows([shape])
+            self.assertIsNot(as_dict["points"], shape.points)
+            self.assertIsInstance(opaque_dict["labels"]["b"], Opaque)
+            results.append((as_dict, as_tuple, shape.to_json()))
+        dataclass_results, converted_results = results
+        self.assertEqual(converted_results, dataclass_results)
+
+    def test_field_table_matches_dataclasses(self):
+        results = []
+        for Column, Cell, field_names in self.load_classes(
+            "field_table", "Column", "Cell", "field_names",
+        ):
+            missing = (
+                dataclasses.MISSING
+                if dataclasses.is_dataclass(Column)
+                else Column.__field_table__[0].default
+            )
+            results.append([
+                field_names(Column("a")),
+                field_names(Cell),
+                [
+                    (
+                        f.name,
+                        None if f.default is missing else f.default,
+                        None if f.default_factory is missing
+                        else f.default_factory,
+                        f.init,
+                        f.repr,
+                        f.hash,
+                        f.compare,
+                        f.kw_only,
+                        dict(f.metadata),
+                    )
+                    for f in (
+                        dataclasses.fields(Column)
+                        if dataclasses.is_dataclass(Column)
+                        else Column.__field_table__
+                    )
+                ],
+            ])
+        dataclass_results, converted_results = results
+        self.assertEqual(converted_results, dataclass_results)
+
+    def test_shared_runtime_matches_dataclasses(self):
+        runtime = ModuleType("dataclass_runtime")
+        exec(module.SHARED_RUNTIME, runtime.__dict__)
+        with patch.dict(sys.modules, dataclass_runtime=runtime):
+            classes = self.load_classes(
+                "shared_runtime", "Version", "Point", "Size", "Span",
+                shared_runtime="dataclass_runtime",
+            )
+        results = []
+        for Version, Point, Size, Span in classes:
+            point = Point(1.5, tags=("a",))
+            pairs = [
+                (Version(1, 2), Version(1, 2, "beta")),
+                (Version(1, 2), Version(1, 3)),
+                (Version(2), (2, 0)),
+                (point, Point(1.5, 0.0, ("a",))),
+                (point, Point(1.5, 0.0, ("b",))),
+                (Size(1, 2), Span(1, 2)),
+            ]
+            outcomes = [
+                (repr(a), a == b, a != b, hash(a) == hash(b))
+                for a, b in pairs[3:]
+            ] + [
+                (repr(a), a == b, a < b, a >= b)
+                for a, b in pairs[:2]
+            ] + [
+                copy.deepcopy(point) == point,
+                Span(2, 3).area(),
+            ]
+            for obj in [point, Size(1, 2)]:
+                with self.assertRaises(AttributeError):
+                    obj.x = 1
+                with self.assertRaises(AttributeError):
+                    del obj.x
+            with self.assertRaises(TypeError):
+                pairs[2][0] < pairs[2][1]
+            results.append(outcomes)
+        dataclass_results, converted_results = results
+        self.assertEqual(converted_results, dataclass_results)
+        self.assertIs(Size.__eq__, Span.__eq__)
+        self.assertIs(Size.__setattr__, Point.__setattr__)
+
+    def test_stripped_annotations_match_dataclasses(self):
+        results = []
+        for Reading, Calibration in self.load_classes(
+            "annotations", "Reading", "Calibration", annotations="strip",
+        ):
+            reading = Reading("a", [1.234, None], unit="F")
+            calibration = Calibration("a", [1.5, 2.0], reading, 1.0)
+            results.append((
+                repr(reading),
+                reading.rounded(),
+                repr(calibration),
+                reading == Reading("a", [1.234, None], unit="F"),
+                Reading.precision,
+            ))
+            if not dataclasses.is_dataclass(Reading):
+                self.assertEqual(Reading.__init__.__annotations__, {})
+                self.assertEqual(Reading.rounded.__annotations__, {})
+                self.assertNotIn("__annotations__", vars(Reading))
+        dataclass_results, converted_results = results
+        self.assertEqual(converted_results, dataclass_results)
+
+    def test_tuple_backed_matches_dataclasses(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UndataclassWarning)
+            classes = self.load_classes(
+                "tuple_backed", "Point", "Span", tuple_backed=True,
+            )
+        results = []
+        for Point, Span in classes:
+            point, span = Point(1.0, tags=("a",)), Span(2, 5, end=3)
+            copies = [copy.copy(point), copy.deepcopy(point)]
+            results.append([
+                repr(point),
+                (point.x, point.y, point.tags, span.start, span.end),
+                point == Point(1.0, 0.0),
+                point != Point(1.0, 0.0),
+                point != Point(1.0, 0.5),
+                point != (1.0, 0.0, ("a",)),
+                (1.0, 0.0, ("a",)) == point,
+                point < Point(2.0),
+                Point(2.0) >= point,
+                hash(point) == hash(Point(1.0)),
+                span == Span(2, end=3),
+                [(c == point, repr(c)) for c in copies],
+                Point.__match_args__,
+            ])
+            for operation in [
+                len, list, iter, reversed, lambda p: p[0], lambda p: 1 in p,
+                lambda p: p + (1,), lambda p: p * 2, lambda p: span < span,
+                lambda p: p < (1.0, 0.0), lambda p: (1.0, 0.0) < p,
+            ]:
+                with self.assertRaises(TypeError):
+                    operation(point)
+            with self.assertRaises(AttributeError):
+                point.x = 2
+        dataclass_results, converted_results = results
+        self.assertEqual(converted_results, dataclass_results)
+        self.assertIsInstance(point, tuple)
+        self.assertFalse(hasattr(point, "__dict__"))
+
+
+class TestScaling(unittest.TestCase):
+
+    def make_code(self, field_count, subclass_count=0):
+        """Return code for a wide dataclass & a chain of its subclasses."""
+        third = field_count // 3
+        lines = [
+            "from dataclasses import KW_ONLY, InitVar, dataclass, field",
+            "@dataclass",
+            "class Wide:",
+            *(f"    a{n}: int = {n}" for n in range(third)),
+            *(f"    b{n}: InitVar[int] = {n}" for n in range(third)),
+            "    _: KW_ONLY",
+            *(
+                f"    c{n}: int = field(kw_only=True, default={n})"
+                for n in range(field_count - 2*third)
+            ),
+        ]
+        for n in range(subclass_count):
+            base = f"Sub{n-1}" if n else "Wide"
+            lines += [
+                "@dataclass",
+                f"class Sub{n}({base}):",
+                f"    s{n}: int = 0",
+            ]
+        return "\n".join(lines)
+
+    def assert_roughly_linear(self, small_size, large_size, **kwargs):
+        """
+        Assert field comparisons grow at most linearly with the field count.
+
+        Searching lists of fields (instead of sets) compares fields with ==,
+        so quadratic field processing shows up as quadratic comparisons.
+        Timings are in benchmark.py's scaling benchmark.
+        """
+        counts = []
+        for size in (small_size, large_size):
+            code = self.make_code(size, **kwargs)
+            comparisons = 0
+
+            def count_comparison(field, other):
+                nonlocal comparisons
+                comparisons += 1
+                return field is other
+            with patch.object(
+                dataclasses.Field, "__eq__", count_comparison, create=True,
+            ):
+                undataclass(code)
+            counts.append(comparisons)
+        # Linear growth would be 4 times as many, quadratic 16 times
+        self.assertLessEqual(counts[1], 4 * counts[0])
+
+    def test_very_wide_dataclass(self):
+        self.assert_roughly_linear(300, 1_200)
+
+    def test_deep_inheritance_of_wide_dataclass(self):
+        self.assert_roughly_linear(300, 1_200, subclass_count=10)
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        shutil.copytree(TESTS / "before", self.root / "before")
+        cache_home = patch.dict(os.environ, XDG_CACHE_HOME=str(self.root))
+        cache_home.start()
+        self.addCleanup(cache_home.stop)
+
+    def run_main(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            status = main([str(arg) for arg in args])
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_single_file_to_stdout(self):
+        status, stdout, _ = self.run_main(self.root / "before" / "simple.py")
+        self.assertEqual(status, 0)
+        self.assertEqual(stdout, (TESTS / "after" / "simple.py").read_text())
+
+    def test_single_file_prunes_cache(self):
+        with patch.object(module, "prune_cache") as prune:
+            self.run_main(self.root / "before" / "simple.py")
+            prune.assert_called_once()
+            self.run_main(self.root / "before" / "simple.py", "--no-cache")
+            prune.assert_called_once()
+
+    def test_directory_to_output_tree_in_parallel(self):
+        nested = self.root / "before" / "nested"
+        nested.mkdir()
+        shutil.copy(self.root / "before" / "simple.py", nested)
+        output = self.root / "output"
+        status, _, stderr = self.run_main(
+            self.root / "before", "-o", output, "--jobs", 2,
+        )
+        self.assertEqual((status, stderr), (0, ""))
+        for path in [Path("simple.py"), Path("nested/simple.py")]:
+            self.assertEqual(
+                (output / path).read_text(),
+                (TESTS / "after" / path.name).read_text(),
+            )
+
+    def test_files_without_dataclasses_are_left_alone(self):
+        regular = self.root / "before" / "regular.py"
+        regular.write_text("def  untouched( ):\n    pass  # Spacing kept\n")
+        os.utime(regular, (0, 0))
+        output = self.root / "output"
+        status, _, _ = self.run_main(regular.parent, "-o", output)
+        self.assertEqual(status, 0)
+        self.assertEqual(
+            (output / "regular.py").read_text(),
+            regular.read_text(),
+        )
+        self.run_main(regular, "--in-place")
+        self.assertEqual(regular.stat().st_mtime, 0)
+
+    def test_check_stops_at_first_dataclass(self):
+        regular = self.root / "before" / "regular.py"
+        regular.write_text("# No dataclass here\n")
+        for path, expected_status in [(regular, 0), (regular.parent, 1)]:
+            with self.subTest(path=path):
+                status, stdout, _ = self.run_main(path, "--check")
+                self.assertEqual(status, expected_status)
+        self.assertEqual(stdout.count("contains dataclasses"), 1)
+
+    def test_declined_auto_slots_are_reported(self):
+        source = self.root / "before" / "auto_slots.py"
+        status, _, stderr = self.run_main(source, "--auto-slots")
+        self.assertEqual(status, 0)
+        self.assertEqual(stderr.splitlines(), [
+            f"{source}: not adding __slots__ to Cached: sets self.lookups",
+            f"{source}: not adding __slots__ to CalibratedReading: "
+            "inherits from Reading",
+        ])
+
+    def test_profile_and_stats_json(self):
+        (self.root / "before" / "regular.py").write_text("x = 1\n")
+        stats_path = self.root / "stats.json"
+        args = ["-o", self.root / "output", "--stats-json", stats_path]
+        status, _, stderr = self.run_main(
+            self.root / "before", *args, "--profile",
+        )
+        self.assertEqual(status, 0)
+        self.assertIn("Slowest classes:", stderr)
+        stats = json.loads(stats_path.read_text())
+        self.assertEqual(stats["skipped_files"], 1)
+        self.assertEqual(stats["cached_files"], 0)
+        self.assertEqual(stats["generated"]["__init__"], stats["classes"])
+        self.run_main(self.root / "before", *args)
+        stats = json.loads(stats_path.read_text())
+        self.assertEqual((stats["files"], stats["classes"]), (0, 0))
+        self.assertGreater(stats["cached_files"], 0)
+
+    def test_stubs_written_next_to_converted_files(self):
+        source = self.root / "before" / "annotations.py"
+        output = self.root / "output"
+        args = [source, "-o", output, "--splice", "--annotations", "strip"]
+        status, _, stderr = self.run_main(*args, "--stubs")
+        self.assertEqual((status, stderr), (0, ""))
+        self.assertEqual(
+            (output / "annotations.pyi").read_text(),
+            (TESTS / "after" / "annotations.pyi").read_text(),
+        )
+        self.assertEqual(
+            (output / "annotations.py").read_text() + "\n",
+            (TESTS / "after" / "annotations.py").read_text(),
+        )
+        with self.assertRaises(SystemExit):
+            self.run_main(source, "--stubs")
+
+    def test_errors_are_reported_without_stopping(self):
+        (self.root / "before" / "broken.py").write_text("@dataclass\nclass\n")
+        status, _, stderr = self.run_main(
+            self.root / "before" / "*.py", "--in-place", "--jobs", 1,
+        )
+        self.assertEqual(status, 1)
+        self.assertIn("broken.py: SyntaxError", stderr)
+        self.assertEqual(
+            (self.root / "before" / "post_init.py").read_text(),
+            (TESTS / "after" / "post_init.py").read_text(),
+        )
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_dir = Path(temp_dir.name)
+
+    def test_cache_hit_skips_conversion(self):
+        source = (TESTS / "before" / "simple.py").read_bytes()
+        expected = (TESTS / "after" / "simple.py").read_text()
+        result = cached_undataclass(source, self.cache_dir)
+        self.assertEqual(result + "\n", expected)
+        with patch.object(module, "undataclass", side_effect=AssertionError):
+            result = cached_undataclass(source, self.cache_dir)
+            with self.assertRaises(AssertionError):
+                cached_undataclass(source + b"\n", self.cache_dir)
+        self.assertEqual(result + "\n", expected)
+
+    def test_cache_hit_warns_again(self):
+        source = (TESTS / "before" / "auto_slots.py").read_bytes()
+        messages = []
+        for _ in range(2):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                cached_undataclass(source, self.cache_dir, auto_slots=True)
+            messages.append([str(warning.message) for warning in caught])
+        self.assertEqual(len(messages[0]), 2)
+        self.assertEqual(messages[1], messages[0])
+
+    def test_prune_evicts_least_recently_used(self):
+        for mtime, key in enumerate(["aa11", "bb22", "cc33"]):
+            write_cache(self.cache_dir, key, "x" * 100)
+            self.assertEqual(read_cache(self.cache_dir, key), "x" * 100)
+            os.utime(cache_path(self.cache_dir, key), (mtime, mtime))
+        prune_cache(self.cache_dir, max_size=250)
+        remaining = sorted(p.stem for p in self.cache_dir.glob("??/*"))
+        self.assertEqual(remaining, ["22", "33"])
+
+    def test_prune_leaves_other_files_alone(self):
+        write_cache(self.cache_dir, "aa11", "x" * 100)
+        other = self.cache_dir / "aa" / "notes.txt"
+        other.write_text("y" * 100)
+        os.utime(other, (0, 0))
+        prune_cache(self.cache_dir, max_size=0)
+        remaining = sorted(p.name for p in self.cache_dir.glob("??/*"))
+        self.assertEqual(remaining, ["notes.txt"])
+
+
+class TestUndataclassMany(unittest.TestCase):
+
+    def setUp(self):
+        self.sources = [
+            (path.name, path.read_text())
+            for path in sorted((TESTS / "before").glob("*.py"))
+        ]
+        self.sources.insert(2, ("broken.py", "@dataclass\nclass\n"))
+
+    def check_results(self, results, ordered=True):
+        keys = [key for key, _ in results]
+        if ordered:
+            self.assertEqual(keys, [key for key, _ in self.sources])
+        else:
+            self.assertCountEqual(keys, [key for key, _ in self.sources])
+        results = dict(results)
+        self.assertIsInstance(results.pop("broken.py"), SyntaxError)
+        sources = dict(self.sources)
+        for key, result in results.items():
+            self.assertEqual(result, undataclass(sources[key]))
+
+    def test_in_order_with_and_without_processes(self):
+        self.check_results(list(undataclass_many(self.sources)))
+        self.check_results(list(undataclass_many(self.sources, jobs=2)))
+
+    def test_in_flight_conversions_are_bounded(self):
+        consumed = []
+
+        def sources():
+            for key, code in self.sources:
+                consumed.append(key)
+                yield key, code
+
+        with ThreadPoolExecutor(2) as executor:
+            results = undataclass_many(
+                sources(),
+                ordered=False,
+                max_pending=2,
+                executor=executor,
+            )
+            first = next(results)
+            self.assertEqual(len(consumed), 2)
+            self.check_results([first, *results], ordered=False)
+
+    def test_async_results(self):
+        async def collect(**kwargs):
+            return [
+                pair
+                async for pair in undataclass_many_async(
+                    self.sources,
+                    **kwargs,
+                )
+            ]
+
+        self.check_results(asyncio.run(collect()))
+        self.check_results(
+            asyncio.run(collect(ordered=False, max_pending=3)),
+            ordered=False,
+        )
+
+    def test_async_sources_are_pulled_off_the_event_loop(self):
+        threads = set()
+
+        def sources():
+            for key, code in self.sources:
+                threads.add(threading.current_thread())
+                yield key, code
+
+        async def collect():
+            return [
+                pair
+                async for pair in undataclass_many_async(sources(), jobs=2)
+            ]
+
+        self.check_results(asyncio.run(collect()))
+        self.assertTrue(threads)
+        self.assertNotIn(threading.main_thread(), threads)
+
+
+class TestDataclassIndex(unittest.TestCase):
+
+    MODELS = dedent("""
+        from dataclasses import KW_ONLY, dataclass, field
+
+        @dataclass
+        class Base:
+            sku: str
+
+        @dataclass
+        class Item(Base):
+            price: float = 0.0
+            _: KW_ONLY
+            tags: list = field(default_factory=list)
+    """)
+    LINES = dedent("""
+        from dataclasses import dataclass
+        from .. import Item
+        import shop.models
+        from shop import models as m
+
+        @dataclass
+        class Line(Item):
+            quantity: int = 1
+
+        @dataclass
+        class Discount(shop.models.Item):
+            percent: int = 0
+
+        @dataclass
+        class Gift(m.Base):
+            note: str = ""
+    """)
+
+    def setUp(self):
+        temp_dir = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        self.cache_dir = self.root / "cache"
+        package = self.root / "project" / "shop"
+        (package / "orders").mkdir(parents=True)
+        (package / "__init__.py").write_text("from .models import Item\n")
+        (package / "orders" / "__init__.py").touch()
+        self.models = package / "models.py"
+        self.models.write_text(self.MODELS)
+        self.lines = package / "orders" / "lines.py"
+        self.lines.write_text(self.LINES)
+
+    def import_lines(self, output):
+        sys.path.insert(0, str(output))
+        self.addCleanup(sys.path.remove, str(output))
+        for name in list(sys.modules):
+            if name.split(".")[0] == "shop":
+                del sys.modules[name]
+        return importlib.import_module("shop.orders.lines")
+
+    def test_imported_bases_across_modules(self):
+        output = self.root / "output"
+        with redirect_stderr(StringIO()) as stderr:
+            status = main([
+                str(self.root / "project"),
+                "-o", str(output),
+                "--cache-dir", str(self.cache_dir),
+                "--jobs", "2",
+            ])
+        self.assertEqual((status, stderr.getvalue()), (0, ""))
+        lines = self.import_lines(output)
+        self.assertEqual(
+            repr(lines.Line("a", 2.0, 3, tags=["new"])),
+            "Line(sku='a', price=2.0, tags=['new'], quantity=3)",
+        )
+        self.assertEqual(
+            repr(lines.Discount("b", percent=5)),
+            "Discount(sku='b', price=0.0, tags=[], percent=5)",
+        )
+        self.assertEqual(repr(lines.Gift("c")), "Gift(sku='c', note='')")
+
+    def test_modules_parsed_once_and_cached(self):
+        index = DataclassIndex(cache_dir=self.cache_dir)
+        code = self.lines.read_text()
+        convert = partial(undataclass, code, path=self.lines)
+        result = convert(index=index)
+        self.assertEqual(convert(index=index), result)
+        self.assertEqual(index.parsed_modules, 2)  # shop and shop.models
+        index = DataclassIndex(cache_dir=self.cache_dir)
+        self.assertEqual(convert(index=index), result)
+        self.assertEqual(index.parsed_modules, 0)
+        self.models.write_text(self.MODELS.replace("str", "str\n    id: int"))
+        index = DataclassIndex(cache_dir=self.cache_dir)
+        result = convert(index=index)
+        self.assertIn("def __init__(self, sku: 'str', id: 'int'", result)
+        self.assertEqual(index.parsed_modules, 1)
+
+    def test_cached_results_never_use_stale_bases(self):
+        args = [self.lines, "--cache-dir", self.cache_dir]
+        with redirect_stdout(StringIO()) as stdout:
+            main([str(arg) for arg in args])
+        self.assertIn("self.sku = sku", stdout.getvalue())
+        self.models.write_text(self.MODELS.replace("sku", "code"))
+        with redirect_stdout(StringIO()) as stdout:
+            main([str(arg) for arg in args])
+        self.assertIn("self.code = code", stdout.getvalue())
+        with redirect_stdout(StringIO()) as stdout:
+            main([str(arg) for arg in [*args, "--no-index"]])
+        self.assertIn("__match_args__ = ('quantity',)", stdout.getvalue())
+
+    def test_in_place_conversion_uses_original_bases(self):
+        directory = self.root / "flat"
+        directory.mkdir()
+        (directory / "a_base.py").write_text(dedent("""
+            from dataclasses import dataclass
+
+            @dataclass
+            class Base:
+                x: int
+                y: int = 0
+        """))
+        (directory / "b_sub.py").write_text(dedent("""
+            from dataclasses import dataclass
+            from a_base import Base
+
+            @dataclass
+            class Sub(Base):
+                z: int = 1
+        """))
+        args = [directory, "--in-place", "--no-cache", "--jobs", 1]
+        with redirect_stderr(StringIO()):
+            self.assertEqual(main([str(arg) for arg in args]), 0)
+        self.assertIn(
+            "def __init__(self, x: 'int', y: 'int'=0, z: int=1)",
+            (directory / "b_sub.py").read_text(),
+        )
+
+
+class TestImportHook(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        package = Path(temp_dir.name, "hooked_models")
+        package.mkdir()
+        (package / "__init__.py").touch()
+        self.source = package / "simple.py"
+        shutil.copy(TESTS / "before" / "simple.py", self.source)
+        sys.path.insert(0, temp_dir.name)
+        self.addCleanup(sys.path.remove, temp_dir.name)
+        write_bytecode = patch.object(sys, "dont_write_bytecode", False)
+        write_bytecode.start()
+        self.addCleanup(write_bytecode.stop)
+        finder = install_import_hook(["hooked_models"])
+        self.addCleanup(sys.meta_path.remove, finder)
+        self.addCleanup(self.unload)
+
+    def unload(self):
+        for name in ["hooked_models", "hooked_models.simple"]:
+            sys.modules.pop(name, None)
+
+    def test_imported_dataclasses_are_converted_and_cached(self):
+        point = importlib.import_module("hooked_models.simple").Point(1, 2)
+        self.assertFalse(dataclasses.is_dataclass(point))
+        self.assertEqual(repr(point), "Point(x=1, y=2)")
+        [bytecode] = self.source.parent.glob("__pycache__/simple.*.pyc")
+        self.assertIn(".opt-undataclass", bytecode.name)
+        self.unload()
+        with patch.object(module, "undataclass", side_effect=AssertionError):
+            importlib.import_module("hooked_models.simple")
+            self.unload()
+            os.utime(self.source, (0, 0))
+            with self.assertRaises(AssertionError):
+                importlib.import_module("hooked_models.simple")
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        self.service = ConversionService(jobs=1, cache_size=2)
+        self.addCleanup(self.service.close)
+
+    def start_server(self):
+        handler = make_request_handler(self.service)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.RequestHandlerClass.log_message = lambda *args: None
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def request(self, url, data=None):
+        if data is not None:
+            data = json.dumps(data).encode()
+        try:
+            with urlopen(url, data, timeout=30) as response:
+                return response.status, json.load(response)
+        except HTTPError as error:
+            return error.code, json.load(error)
+
+    def test_convert_over_http(self):
+        url = self.start_server()
+        source = (TESTS / "before" / "auto_slots.py").read_text()
+        expected = (TESTS / "after" / "auto_slots.py").read_text()
+        request = {"source": source, "options": {"auto_slots": True}}
+        for _ in range(2):
+            status, response = self.request(f"{url}/convert", request)
+            self.assertEqual(status, 200)
+            self.assertEqual(response["code"] + "\n", expected)
+            self.assertEqual(len(response["warnings"]), 2)
+        for bad_request, error in [
+            ({"code": source}, '"source" string'),
+            ({"source": "@dataclass\nclass\n"}, "SyntaxError"),
+            ({"source": source, "options": {"fast": 1}}, "Unknown"),
+        ]:
+            status, response = self.request(f"{url}/convert", bad_request)
+            self.assertEqual(status, 400)
+            self.assertIn(error, response["error"])
+        self.assertEqual(self.request(f"{url}/health")[1]["status"], "ok")
+        status, metrics = self.request(f"{url}/metrics")
+        self.assertEqual(status, 200)
+        self.assertEqual(metrics["requests"], 4)
+        self.assertEqual(metrics["cache_hits"], 1)
+        self.assertEqual(metrics["errors"], 2)
+        self.assertEqual(metrics["cache_hit_rate"], 1/3)
+        self.assertGreater(metrics["latency_p99_seconds"], 0)
+
+    def test_bad_content_length(self):
+        url = self.start_server()
+        for length in [None, "many", "-1"]:
+            with self.subTest(length=length):
+                connection = HTTPConnection(urlsplit(url).netloc, timeout=30)
+                self.addCleanup(connection.close)
+                connection.putrequest("POST", "/convert")
+                if length is not None:
+                    connection.putheader("Content-Length", length)
+                connection.endheaders()
+                response = connection.getresponse()
+                self.assertEqual(response.status, 400)
+                self.assertIn("Content-Length", json.load(response)["error"])
+
+    def test_identical_requests_are_coalesced(self):
+        future = Future()
+        with patch.object(self.service.pool, "submit", return_value=future):
+            for _ in range(2):
+                with self.assertRaises(TimeoutError):
+                    self.service.convert(b"x = 1", {}, timeout=0)
+            future.set_result(("x = 1", []))
+            result = self.service.convert(b"x = 1", {})
+        self.assertEqual(result, ("x = 1", []))
+        metrics = self.service.metrics()
+        self.assertEqual(
+            [metrics[name] for name in ("cache_misses", "coalesced")],
+            [1, 1],
+        )
+        self.assertEqual(metrics["cache_hits"], 1)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,61 @@
+"""Models with annotations that are expensive to evaluate."""
+from typing import ClassVar, Optional
+
+
+class Reading:
+    precision = 2
+    __match_args__ = ('sensor', 'values', 'unit')
+
+    def __init__(self, sensor, values=None, *, unit='C'):
+        if values is None:
+            values = []
+        object.__setattr__(self, 'sensor', sensor)
+        object.__setattr__(self, 'values', values)
+        object.__setattr__(self, 'unit', unit)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(sensor={self.sensor!r}, values={self.values!r}, unit={self.unit!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Reading):
+            return NotImplemented
+        return (self.sensor, self.values, self.unit) == (other.sensor, other.values, other.unit)
+
+    def __hash__(self):
+        return hash((self.sensor, self.values, self.unit))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+    def rounded(self, digits=precision):
+        return [v if v is None else round(v, digits) for v in self.values]
+
+
+class Calibration:
+    __match_args__ = ('sensor', 'raw', 'reading')
+
+    def __init__(self, sensor, raw=None, reading=None, offset=0.0):
+        if raw is None:
+            raw = []
+        self.sensor = sensor
+        self.raw = raw
+        self.reading = reading
+        self.adjusted = [v + offset for v in self.raw]
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(sensor={self.sensor!r}, raw={self.raw!r}, reading={self.reading!r}, adjusted={self.adjusted!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Calibration):
+            return NotImplemented
+        return (self.sensor, self.raw, self.reading, self.adjusted) == (other.sensor, other.raw, other.reading, other.adjusted)
+
+
+def latest(readings: list[Reading]) -> Reading:
+    return readings[-1]
+
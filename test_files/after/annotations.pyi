@@ -0,0 +1,49 @@
+from typing import ClassVar, Optional
+
+class Reading:
+    sensor: str
+    values: list[Optional[float]]
+    unit: str
+    precision: ClassVar[int] = ...
+    registry: ClassVar[dict[str, 'Reading']]
+    __match_args__ = ('sensor', 'values', 'unit')
+
+    def __init__(self, sensor: str, values: list[Optional[float]]=..., *, unit: str=...) -> None:
+        ...
+
+    def __repr__(self):
+        ...
+
+    def __eq__(self, other):
+        ...
+
+    def __hash__(self):
+        ...
+
+    def __setattr__(self, name, value):
+        ...
+
+    def __delattr__(self, name):
+        ...
+
+    def rounded(self, digits: int=...) -> list[Optional[float]]:
+        ...
+
+class Calibration:
+    sensor: str
+    raw: list[float]
+    reading: Optional[Reading]
+    adjusted: list[float]
+    __match_args__ = ('sensor', 'raw', 'reading')
+
+    def __init__(self, sensor: str, raw: list[float]=..., reading: Optional[Reading]=..., offset: float=...) -> None:
+        ...
+
+    def __repr__(self):
+        ...
+
+    def __eq__(self, other):
+        ...
+
+def latest(readings: list[Reading]) -> Reading:
+    ...
@@ -0,0 +1,107 @@
+from collections import namedtuple
+import json
+
+def _asdict_value(value):
+    if type(value) in (int, float, complex, str, bytes, bool, type(None)):
+        return value
+    if isinstance(value, tuple) and hasattr(value, '_fields'):
+        return type(value)(*[_asdict_value(item) for item in value])
+    if hasattr(type(value), '__undataclass__'):
+        return value._asdict()
+    if hasattr(type(value), '__dataclass_fields__'):
+        from dataclasses import asdict
+        return asdict(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)((_asdict_value(item) for item in value))
+    if isinstance(value, dict):
+        return type(value)(((_asdict_value(key), _asdict_value(item)) for key, item in value.items()))
+    from copy import deepcopy
+    return deepcopy(value)
+
+def _astuple_value(value):
+    if type(value) in (int, float, complex, str, bytes, bool, type(None)):
+        return value
+    if isinstance(value, tuple) and hasattr(value, '_fields'):
+        return type(value)(*[_astuple_value(item) for item in value])
+    if hasattr(type(value), '__undataclass__'):
+        return value._astuple()
+    if hasattr(type(value), '__dataclass_fields__'):
+        from dataclasses import astuple
+        return astuple(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)((_astuple_value(item) for item in value))
+    if isinstance(value, dict):
+        return type(value)(((_astuple_value(key), _astuple_value(item)) for key, item in value.items()))
+    from copy import deepcopy
+    return deepcopy(value)
+Pair = namedtuple('Pair', 'low high')
+
+class Point:
+    __match_args__ = ('x', 'y')
+
+    def __init__(self, x: int, y: float) -> None:
+        self.x = x
+        self.y = y
+    __undataclass__ = True
+
+    def _asdict(self):
+        return {'x': self.x, 'y': self.y}
+
+    def _astuple(self):
+        return (self.x, self.y)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(x={self.x!r}, y={self.y!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return (self.x, self.y) == (other.x, other.y)
+
+class Shape:
+    __match_args__ = ('name', 'points', 'labels', 'bounds')
+
+    def __init__(self, name: str, points: list[Point]=None, labels: dict[str, Point]=None, bounds: Pair=Pair(0, 0)) -> None:
+        if points is None:
+            points = []
+        if labels is None:
+            labels = {}
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'points', points)
+        object.__setattr__(self, 'labels', labels)
+        object.__setattr__(self, 'bounds', bounds)
+    __undataclass__ = True
+
+    def _asdict(self):
+        return {'name': self.name, 'points': _asdict_value(self.points), 'labels': _asdict_value(self.labels), 'bounds': _asdict_value(self.bounds)}
+
+    def _astuple(self):
+        return (self.name, _astuple_value(self.points), _astuple_value(self.labels), _astuple_value(self.bounds))
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(name={self.name!r}, points={self.points!r}, labels={self.labels!r}, bounds={self.bounds!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Shape):
+            return NotImplemented
+        return (self.name, self.points, self.labels, self.bounds) == (other.name, other.points, other.labels, other.bounds)
+
+    def __hash__(self):
+        return hash((self.name, self.points, self.labels, self.bounds))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+    def to_json(self):
+        return json.dumps(self._asdict())
+
+def serialize(shapes):
+    return [shape._asdict() for shape in shapes]
+
+def rows(shapes):
+    return [shape._astuple() for shape in shapes]
@@ -0,0 +1,90 @@
+class Reading:
+    __slots__ = ('sensor', 'value', 'tags')
+    __match_args__ = ('sensor', 'value', 'tags')
+
+    def __init__(self, sensor: str, value: float=0.0, tags: list=None) -> None:
+        if tags is None:
+            tags = []
+        self.sensor = sensor
+        self.value = value
+        self.tags = tags
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(sensor={self.sensor!r}, value={self.value!r}, tags={self.tags!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Reading):
+            return NotImplemented
+        return (self.sensor, self.value, self.tags) == (other.sensor, other.value, other.tags)
+
+class Location:
+    __slots__ = ('latitude', 'longitude')
+    __match_args__ = ('latitude', 'longitude')
+
+    def __init__(self, latitude: float, longitude: float, scale: float=1.0) -> None:
+        object.__setattr__(self, 'latitude', latitude)
+        object.__setattr__(self, 'longitude', longitude)
+        object.__setattr__(self, 'latitude', self.latitude * scale)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(latitude={self.latitude!r}, longitude={self.longitude!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Location):
+            return NotImplemented
+        return (self.latitude, self.longitude) == (other.latitude, other.longitude)
+
+    def __hash__(self):
+        return hash((self.latitude, self.longitude))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+    def __getstate__(self):
+        return (self.latitude, self.longitude)
+
+    def __setstate__(self, state):
+        fields = ('latitude', 'longitude')
+        for field, value in zip(fields, state):
+            object.__setattr__(self, field, value)
+
+class Cached:
+    __match_args__ = ('key',)
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.lookups = 0
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(key={self.key!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Cached):
+            return NotImplemented
+        return (self.key,) == (other.key,)
+
+class CalibratedReading(Reading):
+    __match_args__ = ('sensor', 'value', 'tags', 'offset')
+
+    def __init__(self, sensor: str, value: float=0.0, tags: list=None, offset: float=0.0) -> None:
+        if tags is None:
+            tags = []
+        self.sensor = sensor
+        self.value = value
+        self.tags = tags
+        self.offset = offset
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(sensor={self.sensor!r}, value={self.value!r}, tags={self.tags!r}, offset={self.offset!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, CalibratedReading):
+            return NotImplemented
+        return (self.sensor, self.value, self.tags, self.offset) == (other.sensor, other.value, other.tags, other.offset)
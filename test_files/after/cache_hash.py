@@ -0,0 +1,71 @@
+class Key:
+    __match_args__ = ('namespace', 'parts')
+
+    def __init__(self, namespace: str, parts: tuple) -> None:
+        object.__setattr__(self, 'namespace', namespace)
+        object.__setattr__(self, 'parts', parts)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(namespace={self.namespace!r}, parts={self.parts!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Key):
+            return NotImplemented
+        return (self.namespace, self.parts) == (other.namespace, other.parts)
+
+    def __hash__(self):
+        try:
+            return self._cached_hash
+        except AttributeError:
+            object.__setattr__(self, '_cached_hash', hash((self.namespace, self.parts)))
+            return self._cached_hash
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_cached_hash', None)
+        return state
+
+class SlotsKey:
+    __slots__ = ('namespace', 'parts', '_cached_hash')
+    __match_args__ = ('namespace', 'parts')
+
+    def __init__(self, namespace: str, parts: tuple) -> None:
+        object.__setattr__(self, 'namespace', namespace)
+        object.__setattr__(self, 'parts', parts)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(namespace={self.namespace!r}, parts={self.parts!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, SlotsKey):
+            return NotImplemented
+        return (self.namespace, self.parts) == (other.namespace, other.parts)
+
+    def __hash__(self):
+        try:
+            return self._cached_hash
+        except AttributeError:
+            object.__setattr__(self, '_cached_hash', hash((self.namespace, self.parts)))
+            return self._cached_hash
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+    def __getstate__(self):
+        return (self.namespace, self.parts)
+
+    def __setstate__(self, state):
+        fields = ('namespace', 'parts')
+        for field, value in zip(fields, state):
+            object.__setattr__(self, field, value)
@@ -0,0 +1,83 @@
+class Version:
+    __match_args__ = ('major', 'minor', 'label')
+
+    def __init__(self, major: int, minor: int=0, label: str='') -> None:
+        object.__setattr__(self, 'major', major)
+        object.__setattr__(self, 'minor', minor)
+        object.__setattr__(self, 'label', label)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(major={self.major!r}, minor={self.minor!r}, label={self.label!r})'
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.major is other.major or self.major == other.major) and (self.minor is other.minor or self.minor == other.minor)
+
+    def __lt__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        if not (self.major is other.major or self.major == other.major):
+            return self.major < other.major
+        if not (self.minor is other.minor or self.minor == other.minor):
+            return self.minor < other.minor
+        return False
+
+    def __le__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        if not (self.major is other.major or self.major == other.major):
+            return self.major <= other.major
+        if not (self.minor is other.minor or self.minor == other.minor):
+            return self.minor <= other.minor
+        return True
+
+    def __gt__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        if not (self.major is other.major or self.major == other.major):
+            return self.major > other.major
+        if not (self.minor is other.minor or self.minor == other.minor):
+            return self.minor > other.minor
+        return False
+
+    def __ge__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        if not (self.major is other.major or self.major == other.major):
+            return self.major >= other.major
+        if not (self.minor is other.minor or self.minor == other.minor):
+            return self.minor >= other.minor
+        return True
+
+    def __hash__(self):
+        return hash((self.major, self.minor))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+class Tag:
+    __match_args__ = ('name',)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(name={self.name!r})'
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.name is other.name or self.name == other.name
+
+    def __hash__(self):
+        return hash(self.name)
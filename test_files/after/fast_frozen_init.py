@@ -0,0 +1,125 @@
+class Point:
+    __match_args__ = ('x', 'y', 'tags')
+
+    def __init__(self, x: float, y: float, tags: list=None) -> None:
+        if tags is None:
+            tags = []
+        self_dict = self.__dict__
+        self_dict['x'] = x
+        self_dict['y'] = y
+        self_dict['tags'] = tags
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(x={self.x!r}, y={self.y!r}, tags={self.tags!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return (self.x, self.y, self.tags) == (other.x, other.y, other.tags)
+
+    def __hash__(self):
+        return hash((self.x, self.y, self.tags))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+class Size:
+    __slots__ = ('width', 'height')
+    __match_args__ = ('width', 'height')
+
+    def __init__(self, width: int, height: int) -> None:
+        self_setattr = object.__setattr__.__get__(self)
+        self_setattr('width', width)
+        self_setattr('height', height)
+        if self.width < 0 or self.height < 0:
+            raise ValueError('Negative size')
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(width={self.width!r}, height={self.height!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Size):
+            return NotImplemented
+        return (self.width, self.height) == (other.width, other.height)
+
+    def __hash__(self):
+        return hash((self.width, self.height))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+    def __getstate__(self):
+        return (self.width, self.height)
+
+    def __setstate__(self, state):
+        fields = ('width', 'height')
+        for field, value in zip(fields, state):
+            object.__setattr__(self, field, value)
+
+class Cell:
+    __slots__ = ('row',)
+    __match_args__ = ('row',)
+
+    def __init__(self, row: int) -> None:
+        self_setattr = object.__setattr__.__get__(self)
+        self_setattr('row', row)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(row={self.row!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Cell):
+            return NotImplemented
+        return (self.row,) == (other.row,)
+
+    def __hash__(self):
+        return hash((self.row,))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+    def __getstate__(self):
+        return (self.row,)
+
+    def __setstate__(self, state):
+        fields = ('row',)
+        for field, value in zip(fields, state):
+            object.__setattr__(self, field, value)
+
+class LabeledCell(Cell):
+    __match_args__ = ('row', 'label')
+
+    def __init__(self, row: int, label: str) -> None:
+        self_setattr = object.__setattr__.__get__(self)
+        self_setattr('row', row)
+        self_setattr('label', label)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(row={self.row!r}, label={self.label!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, LabeledCell):
+            return NotImplemented
+        return (self.row, self.label) == (other.row, other.label)
+
+    def __hash__(self):
+        return hash((self.row, self.label))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
@@ -0,0 +1,55 @@
+from collections import namedtuple as _namedtuple
+from types import MappingProxyType as _MappingProxyType
+_Field = _namedtuple('_Field', 'name type default default_factory init repr hash compare kw_only metadata')
+_MISSING = object()
+_NO_METADATA = _MappingProxyType({})
+
+class Column:
+    __match_args__ = ('name', 'width', 'tags', 'visible')
+    __field_table__ = (_Field('name', 'str', _MISSING, _MISSING, True, True, None, True, False, _NO_METADATA), _Field('width', 'int', 10, _MISSING, True, True, None, True, False, _MappingProxyType({'unit': 'chars'})), _Field('tags', 'list[str]', _MISSING, list, True, False, None, True, False, _NO_METADATA), _Field('visible', 'bool', True, _MISSING, True, True, None, True, True, _NO_METADATA), _Field('cache', 'dict', _MISSING, dict, False, True, None, False, True, _NO_METADATA))
+
+    def __init__(self, name: str, width: int=10, tags: list[str]=None, *, visible: bool=True) -> None:
+        if tags is None:
+            tags = []
+        self.name = name
+        self.width = width
+        self.tags = tags
+        self.visible = visible
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(name={self.name!r}, width={self.width!r}, visible={self.visible!r}, cache={self.cache!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Column):
+            return NotImplemented
+        return (self.name, self.width, self.tags, self.visible) == (other.name, other.width, other.tags, other.visible)
+
+class Cell:
+    __match_args__ = ('column', 'value')
+    __field_table__ = (_Field('column', 'Column', _MISSING, _MISSING, True, True, None, True, False, _NO_METADATA), _Field('value', 'object', None, _MISSING, True, True, None, True, False, _NO_METADATA))
+
+    def __init__(self, column: Column, value: object=None) -> None:
+        object.__setattr__(self, 'column', column)
+        object.__setattr__(self, 'value', value)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(column={self.column!r}, value={self.value!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Cell):
+            return NotImplemented
+        return (self.column, self.value) == (other.column, other.value)
+
+    def __hash__(self):
+        return hash((self.column, self.value))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+def field_names(obj):
+    return [f.name for f in obj.__field_table__]
@@ -1,7 +1,5 @@
 from decimal import Decimal
-from functools import total_ordering
 
-@total_ordering
 class Item:
     __slots__ = ('name', 'price', 'colors')
     __match_args__ = ('name', 'price', 'colors')
@@ -27,6 +25,21 @@ class Item:
             return NotImplemented
         return (self.name, self.price) < (other.name, other.price)
 
+    def __le__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price) <= (other.name, other.price)
+
+    def __gt__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price) > (other.name, other.price)
+
+    def __ge__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price) >= (other.name, other.price)
+
     def __hash__(self):
         return hash((self.name, self.price))
 
@@ -0,0 +1,91 @@
+class Point:
+    __match_args__ = ('x', 'y')
+
+    def __init__(self, x: float, y: float=0.0) -> None:
+        object.__setattr__(self, 'x', x)
+        object.__setattr__(self, 'y', y)
+
+    def __replace__(self, /, **changes):
+        return type(self)(x=changes.pop('x', self.x), y=changes.pop('y', self.y), **changes)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(x={self.x!r}, y={self.y!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return (self.x, self.y) == (other.x, other.y)
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+class Reading:
+    __match_args__ = ('sensor',)
+
+    def __init__(self, sensor: str, raw: float, offset: float=0.0) -> None:
+        self.sensor = sensor
+        self.value = raw + offset
+
+    def __replace__(self, /, **changes):
+        if 'raw' not in changes:
+            raise ValueError("InitVar 'raw' must be specified with replace()")
+        if 'value' in changes:
+            raise ValueError('field value is declared with init=False, it cannot be specified with replace()')
+        return type(self)(sensor=changes.pop('sensor', self.sensor), **changes)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(sensor={self.sensor!r}, value={self.value!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Reading):
+            return NotImplemented
+        return (self.sensor, self.value) == (other.sensor, other.value)
+
+class Request:
+    __match_args__ = ('url', 'timeout', 'headers')
+
+    def __init__(self, *, url: str, timeout: float=10.0, headers: dict=None) -> None:
+        if headers is None:
+            headers = {}
+        self.url = url
+        self.timeout = timeout
+        self.headers = headers
+
+    def __replace__(self, /, **changes):
+        return type(self)(url=changes.pop('url', self.url), timeout=changes.pop('timeout', self.timeout), headers=changes.pop('headers', self.headers), **changes)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(url={self.url!r}, timeout={self.timeout!r}, headers={self.headers!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Request):
+            return NotImplemented
+        return (self.url, self.timeout, self.headers) == (other.url, other.timeout, other.headers)
+
+class Query:
+    __match_args__ = ('text', 'limit')
+
+    def __init__(self, text: str, *, limit: int=10) -> None:
+        self.text = text
+        self.limit = limit
+
+    def __replace__(self, /, **changes):
+        return type(self)(text=changes.pop('text', self.text), limit=changes.pop('limit', self.limit), **changes)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(text={self.text!r}, limit={self.limit!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Query):
+            return NotImplemented
+        return (self.text, self.limit) == (other.text, other.limit)
@@ -0,0 +1,39 @@
+import dataclass_runtime as _runtime
+
+class Version:
+    __match_args__ = ('major', 'minor', 'label')
+
+    def __init__(self, major: int, minor: int=0, label: str='') -> None:
+        self.major = major
+        self.minor = minor
+        self.label = label
+    __repr__, __eq__, __lt__, __le__, __gt__, __ge__ = _runtime.class_methods('__repr__ __eq__ __lt__ __le__ __gt__ __ge__', ('major', 'minor', 'label'), ('major', 'minor', 'label'), ('major', 'minor'))
+
+class Point:
+    __slots__ = ('x', 'y', 'tags')
+    __match_args__ = ('x', 'y', 'tags')
+
+    def __init__(self, x: float, y: float=0.0, tags: tuple=()) -> None:
+        object.__setattr__(self, 'x', x)
+        object.__setattr__(self, 'y', y)
+        object.__setattr__(self, 'tags', tags)
+    __repr__, __eq__, __hash__, __setattr__, __delattr__, __getstate__, __setstate__ = _runtime.class_methods('__repr__ __eq__ __hash__ __setattr__ __delattr__ __getstate__ __setstate__', ('x', 'y', 'tags'), ('x', 'y'), ('x', 'y', 'tags'))
+
+class Size:
+    __match_args__ = ('width', 'height')
+
+    def __init__(self, width: float, height: float) -> None:
+        object.__setattr__(self, 'width', width)
+        object.__setattr__(self, 'height', height)
+    __repr__, __eq__, __hash__, __setattr__, __delattr__ = _runtime.class_methods('__repr__ __eq__ __hash__ __setattr__ __delattr__', ('width', 'height'), ('width', 'height'), ('width', 'height'))
+
+class Span:
+    __match_args__ = ('width', 'height')
+
+    def __init__(self, width: float, height: float) -> None:
+        object.__setattr__(self, 'width', width)
+        object.__setattr__(self, 'height', height)
+    __repr__, __eq__, __hash__, __setattr__, __delattr__ = _runtime.class_methods('__repr__ __eq__ __hash__ __setattr__ __delattr__', ('width', 'height'), ('width', 'height'), ('width', 'height'))
+
+    def area(self):
+        return self.width * self.height
@@ -0,0 +1,82 @@
+"""Inventory models."""
+from decimal import Decimal
+
+
+# Tax rates are kept in basis points.
+TAX_RATES = {
+    "standard": 2000,   # 20%
+    "reduced":  500,
+}
+
+
+def total(items):
+    # Keep the weird spacing here as-is.
+    return sum( item.price for item in items )
+
+
+class Item:
+    __match_args__ = ('name', 'price')
+
+    def __init__(self, name: str, price: Decimal=Decimal(0)) -> None:
+        self.name = name
+        self.price = price
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(name={self.name!r}, price={self.price!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price) == (other.name, other.price)
+
+    def __lt__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price) < (other.name, other.price)
+
+    def __le__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price) <= (other.name, other.price)
+
+    def __gt__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price) > (other.name, other.price)
+
+    def __ge__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price) >= (other.name, other.price)
+
+
+class Regular:  # Not a dataclass
+    pass
+
+
+class Order:
+    __match_args__ = ('items',)
+
+    def __init__(self, items: list=None) -> None:
+        if items is None:
+            items = []
+        object.__setattr__(self, 'items', items)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(items={self.items!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Order):
+            return NotImplemented
+        return (self.items,) == (other.items,)
+
+    def __hash__(self):
+        return hash((self.items,))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
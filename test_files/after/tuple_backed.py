@@ -0,0 +1,222 @@
+class Point(tuple):
+    __slots__ = ()
+    __match_args__ = ('x', 'y', 'tags')
+
+    def __new__(cls, x: float, y: float=0.0, tags: tuple=None):
+        if tags is None:
+            tags = ()
+        return tuple.__new__(cls, (cls, x, y, tags))
+
+    @property
+    def x(self) -> float:
+        return tuple.__getitem__(self, 1)
+
+    @property
+    def y(self) -> float:
+        return tuple.__getitem__(self, 2)
+
+    @property
+    def tags(self) -> tuple:
+        return tuple.__getitem__(self, 3)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(x={self.x!r}, y={self.y!r}, tags={self.tags!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return (self.x, self.y) == (other.x, other.y)
+
+    def __lt__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return (self.x, self.y) < (other.x, other.y)
+
+    def __le__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return (self.x, self.y) <= (other.x, other.y)
+
+    def __gt__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return (self.x, self.y) > (other.x, other.y)
+
+    def __ge__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return (self.x, self.y) >= (other.x, other.y)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+    def __len__(self):
+        raise TypeError(f'object of type {type(self).__name__!r} has no len()')
+
+    def __getitem__(self, index):
+        raise TypeError(f'{type(self).__name__!r} object is not subscriptable')
+    __iter__ = __reversed__ = __contains__ = None
+
+    def __add__(self, other):
+        return NotImplemented
+    __mul__ = __rmul__ = __add__
+
+    def __reduce__(self):
+        return (tuple.__new__, (type(self), tuple(tuple.__iter__(self))))
+
+class Span(tuple):
+    __slots__ = ()
+    __match_args__ = ('start', 'end')
+
+    def __new__(cls, start: int, scale: int=1, *, end: int=0):
+        return tuple.__new__(cls, (cls, start, end))
+
+    @property
+    def start(self) -> int:
+        return tuple.__getitem__(self, 1)
+
+    @property
+    def end(self) -> int:
+        return tuple.__getitem__(self, 2)
+    __repr__ = object.__repr__
+
+    def __eq__(self, other):
+        if not isinstance(other, Span):
+            return NotImplemented
+        return (self.start, self.end) == (other.start, other.end)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __lt__(self, other):
+        return NotImplemented
+    __le__ = __gt__ = __ge__ = __lt__
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+    def __len__(self):
+        raise TypeError(f'object of type {type(self).__name__!r} has no len()')
+
+    def __getitem__(self, index):
+        raise TypeError(f'{type(self).__name__!r} object is not subscriptable')
+    __iter__ = __reversed__ = __contains__ = None
+
+    def __add__(self, other):
+        return NotImplemented
+    __mul__ = __rmul__ = __add__
+
+    def __reduce__(self):
+        return (tuple.__new__, (type(self), tuple(tuple.__iter__(self))))
+
+class Reading:
+    __match_args__ = ('value',)
+
+    def __init__(self, value: float) -> None:
+        object.__setattr__(self, 'value', value)
+        if self.value < 0:
+            raise ValueError('value must be positive')
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(value={self.value!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Reading):
+            return NotImplemented
+        return (self.value,) == (other.value,)
+
+    def __hash__(self):
+        return hash((self.value,))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+class Node:
+    __match_args__ = ('name',)
+
+    def __init__(self, name: str) -> None:
+        object.__setattr__(self, 'name', name)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(name={self.name!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Node):
+            return NotImplemented
+        return (self.name,) == (other.name,)
+
+    def __hash__(self):
+        return hash((self.name,))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+class Leaf(Node):
+    __match_args__ = ('name', 'weight')
+
+    def __init__(self, name: str, weight: int=1) -> None:
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'weight', weight)
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(name={self.name!r}, weight={self.weight!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Leaf):
+            return NotImplemented
+        return (self.name, self.weight) == (other.name, other.weight)
+
+    def __hash__(self):
+        return hash((self.name, self.weight))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Can't set attribute {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Can't delete attribute {name!r}")
+
+class Counter:
+    __match_args__ = ('count',)
+
+    def __init__(self, count: int=0) -> None:
+        self.count = count
+
+    def __repr__(self):
+        cls = type(self).__name__
+        return f'{cls}(count={self.count!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Counter):
+            return NotImplemented
+        return (self.count,) == (other.count,)
@@ -1,7 +1,6 @@
 'Module for a priced item.'
 import abc
 from decimal import Decimal
-from functools import total_ordering
 
 def default_to_self(attribute_name):
 
@@ -21,7 +20,6 @@ class PricedObject(abc.ABC):
         ...
 
 @default_to_self('parent')
-@total_ordering
 class Item(PricedObject):
     """Priced item."""
     __slots__ = ('name', 'price', 'parent')
@@ -42,6 +40,21 @@ class Item(PricedObject):
             return NotImplemented
         return (self.name, self.price, self.parent) < (other.name, other.price, other.parent)
 
+    def __le__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price, self.parent) <= (other.name, other.price, other.parent)
+
+    def __gt__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price, self.parent) > (other.name, other.price, other.parent)
+
+    def __ge__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.name, self.price, self.parent) >= (other.name, other.price, other.parent)
+
     def __repr__(self):
         items = [f'name={self.name!r}', f'price={self.price!r}']
         if self.parent is not self:
@@ -0,0 +1,32 @@
+"""Models with annotations that are expensive to evaluate."""
+from dataclasses import InitVar, KW_ONLY, dataclass, field
+from typing import ClassVar, Optional
+
+
+@dataclass(frozen=True)
+class Reading:
+    sensor: str
+    values: list[Optional[float]] = field(default_factory=list)
+    _: KW_ONLY
+    unit: str = "C"
+    precision: ClassVar[int] = 2
+    registry: ClassVar[dict[str, "Reading"]]
+
+    def rounded(self, digits: int = precision) -> list[Optional[float]]:
+        return [v if v is None else round(v, digits) for v in self.values]
+
+
+@dataclass
+class Calibration:
+    sensor: str
+    raw: list[float] = field(default_factory=list)
+    reading: Optional[Reading] = None
+    offset: InitVar[float] = 0.0
+    adjusted: list[float] = field(init=False)
+
+    def __post_init__(self, offset: float) -> None:
+        self.adjusted = [v + offset for v in self.raw]
+
+
+def latest(readings: list[Reading]) -> Reading:
+    return readings[-1]
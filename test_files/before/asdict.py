@@ -0,0 +1,32 @@
+from collections import namedtuple
+import dataclasses
+from dataclasses import asdict, astuple, dataclass, field
+import json
+
+
+Pair = namedtuple("Pair", "low high")
+
+
+@dataclass
+class Point:
+    x: int
+    y: float
+
+
+@dataclass(frozen=True)
+class Shape:
+    name: str
+    points: list[Point] = field(default_factory=list)
+    labels: dict[str, Point] = field(default_factory=dict)
+    bounds: Pair = Pair(0, 0)
+
+    def to_json(self):
+        return json.dumps(asdict(self))
+
+
+def serialize(shapes):
+    return [dataclasses.asdict(shape) for shape in shapes]
+
+
+def rows(shapes):
+    return [astuple(shape) for shape in shapes]
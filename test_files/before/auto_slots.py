@@ -0,0 +1,31 @@
+from dataclasses import dataclass, field, InitVar
+
+
+@dataclass
+class Reading:
+    sensor: str
+    value: float = 0.0
+    tags: list = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Location:
+    latitude: float
+    longitude: float
+    scale: InitVar[float] = 1.0
+
+    def __post_init__(self, scale):
+        object.__setattr__(self, "latitude", self.latitude * scale)
+
+
+@dataclass
+class Cached:
+    key: str
+
+    def __post_init__(self):
+        self.lookups = 0
+
+
+@dataclass
+class CalibratedReading(Reading):
+    offset: float = 0.0
@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Key:
+    namespace: str
+    parts: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class SlotsKey:
+    namespace: str
+    parts: tuple
@@ -0,0 +1,13 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True, order=True)
+class Version:
+    major: int
+    minor: int = 0
+    label: str = field(default="", compare=False)
+
+
+@dataclass(unsafe_hash=True)
+class Tag:
+    name: str
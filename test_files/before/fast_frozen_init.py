@@ -0,0 +1,28 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class Point:
+    x: float
+    y: float
+    tags: list = field(default_factory=list)
+
+
+@dataclass(frozen=True, slots=True)
+class Size:
+    width: int
+    height: int
+
+    def __post_init__(self):
+        if self.width < 0 or self.height < 0:
+            raise ValueError("Negative size")
+
+
+@dataclass(frozen=True, slots=True)
+class Cell:
+    row: int
+
+
+@dataclass(frozen=True)
+class LabeledCell(Cell):
+    label: str
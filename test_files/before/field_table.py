@@ -0,0 +1,21 @@
+from dataclasses import KW_ONLY, dataclass, field, fields
+
+
+@dataclass
+class Column:
+    name: str
+    width: int = field(default=10, metadata={"unit": "chars"})
+    tags: list[str] = field(default_factory=list, repr=False)
+    _: KW_ONLY
+    visible: bool = True
+    cache: dict = field(default_factory=dict, init=False, compare=False)
+
+
+@dataclass(frozen=True)
+class Cell:
+    column: Column
+    value: object = None
+
+
+def field_names(obj):
+    return [f.name for f in fields(obj)]
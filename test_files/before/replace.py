@@ -0,0 +1,32 @@
+from dataclasses import InitVar, KW_ONLY, dataclass, field
+
+
+@dataclass(frozen=True)
+class Point:
+    x: float
+    y: float = 0.0
+
+
+@dataclass
+class Reading:
+    sensor: str
+    raw: InitVar[float]
+    offset: InitVar[float] = 0.0
+    value: float = field(init=False)
+
+    def __post_init__(self, raw, offset):
+        self.value = raw + offset
+
+
+@dataclass(kw_only=True)
+class Request:
+    url: str
+    timeout: float = 10.0
+    headers: dict = field(default_factory=dict)
+
+
+@dataclass
+class Query:
+    text: str
+    _: KW_ONLY
+    limit: int = 10
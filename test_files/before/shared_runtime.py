@@ -0,0 +1,30 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(order=True)
+class Version:
+    major: int
+    minor: int = 0
+    label: str = field(default="", compare=False)
+
+
+@dataclass(frozen=True, slots=True)
+class Point:
+    x: float
+    y: float = 0.0
+    tags: tuple = field(default=(), repr=False)
+
+
+@dataclass(frozen=True)
+class Size:
+    width: float
+    height: float
+
+
+@dataclass(frozen=True)
+class Span:
+    width: float
+    height: float
+
+    def area(self):
+        return self.width * self.height
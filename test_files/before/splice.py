@@ -0,0 +1,31 @@
+"""Inventory models."""
+from dataclasses import dataclass, field  # noqa: F401
+from decimal import Decimal
+import dataclasses
+
+
+# Tax rates are kept in basis points.
+TAX_RATES = {
+    "standard": 2000,   # 20%
+    "reduced":  500,
+}
+
+
+def total(items):
+    # Keep the weird spacing here as-is.
+    return sum( item.price for item in items )
+
+
+@dataclass(order=True)
+class Item:
+    name: str
+    price: Decimal = Decimal(0)  # Before tax
+
+
+class Regular:  # Not a dataclass
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class Order:
+    items: list = field(default_factory=list)
@@ -0,0 +1,40 @@
+from dataclasses import KW_ONLY, InitVar, dataclass, field
+
+
+@dataclass(frozen=True, order=True)
+class Point:
+    x: float
+    y: float = 0.0
+    tags: tuple = field(default_factory=tuple, compare=False)
+
+
+@dataclass(frozen=True, repr=False)
+class Span:
+    start: int
+    scale: InitVar[int] = 1
+    _: KW_ONLY
+    end: int = 0
+
+
+@dataclass(frozen=True)
+class Reading:
+    value: float
+
+    def __post_init__(self):
+        if self.value < 0:
+            raise ValueError("value must be positive")
+
+
+@dataclass(frozen=True)
+class Node:
+    name: str
+
+
+@dataclass(frozen=True)
+class Leaf(Node):
+    weight: int = 1
+
+
+@dataclass
+class Counter:
+    count: int = 0
@@ -1,9 +1,325 @@
 import ast
+import builtins
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from copy import copy, deepcopy
 import dataclasses
-from textwrap import dedent, indent
+from functools import cache, partial
+from glob import glob, has_magic
+import hashlib
+from heapq import nlargest
+from importlib.abc import MetaPathFinder
+from importlib.machinery import PathFinder, SourceFileLoader
+from importlib.util import (
+    MAGIC_NUMBER,
+    cache_from_source,
+    decode_source,
+    resolve_name,
+)
+from itertools import accumulate, groupby
+import marshal
+from operator import attrgetter
+import os
+from pathlib import Path
+import sys
+import threading
+from time import perf_counter
+import warnings
 
 
-__all__ = ["undataclass"]
+__all__ = [
+    "DataclassIndex",
+    "UndataclassStats",
+    "UndataclassWarning",
+    "install_import_hook",
+    "undataclass",
+    "undataclass_ast",
+    "undataclass_many",
+    "undataclass_many_async",
+    "undataclass_stub",
+    "undataclass_with_stats",
+]
+
+CACHE_MAX_SIZE = 256 * 2**20  # Bytes of cached results kept between runs
+CACHE_SUFFIX = ".undataclass"  # Only files with this suffix are ever pruned
+SLOWEST_CLASSES = 10  # Number of slowest classes kept in statistics
+LATENCY_SAMPLES = 1000  # Number of recent request latencies kept by server
+CONVERSION_HELPERS = ("asdict", "astuple")  # Rewritten to generated methods
+REWRITTEN_HELPERS = (*CONVERSION_HELPERS, "fields")  # Calls are rewritten
+ATOMIC_TYPES = {"bool", "bytes", "complex", "float", "int", "str", "None"}
+RUNTIME_NAME = "_runtime"  # Name the shared_runtime module is imported as
+CONVERTED_MARKER = "__undataclass__"  # Marks classes with _asdict & _astuple
+ANNOTATION_MODES = ("keep", "lazy", "strip")  # Values of annotations option
+COMPARISONS = {  # Operator: (method name without underscores, AST node type)
+    "==": ("eq", ast.Eq),
+    "<": ("lt", ast.Lt),
+    "<=": ("le", ast.LtE),
+    ">": ("gt", ast.Gt),
+    ">=": ("ge", ast.GtE),
+}
+
+FIELD_TABLE_HELPERS = """
+from collections import namedtuple as _namedtuple
+from types import MappingProxyType as _MappingProxyType
+_Field = _namedtuple('_Field', (
+    'name type default default_factory init repr hash compare kw_only metadata'
+))
+_MISSING = object()
+_NO_METADATA = _MappingProxyType({})
+"""  # Module-level names used by __field_table__ attributes
+SHARED_RUNTIME = '''"""Methods shared by classes converted by undataclass."""
+from functools import cache
+import operator
+
+
+@cache
+def _getter(names):
+    """Return function that gets a tuple of the named attributes."""
+    match names:
+        case ():
+            return lambda obj: ()
+        case (name,):
+            get = operator.attrgetter(name)
+            return lambda obj: (get(obj),)
+        case _:
+            return operator.attrgetter(*names)
+
+
+def __setattr__(self, name, value):
+    raise AttributeError(f"Can't set attribute {name!r}")
+
+
+def __delattr__(self, name):
+    raise AttributeError(f"Can't delete attribute {name!r}")
+
+
+def _repr(fields, repr_fields, compare_fields):
+    get = _getter(repr_fields)
+    arguments = ", ".join([f"{name}={{!r}}" for name in repr_fields])
+    template = f"{{}}({arguments})"
+
+    def __repr__(self):
+        return template.format(type(self).__name__, *get(self))
+    return __repr__
+
+
+def _eq(fields, repr_fields, compare_fields):
+    get = _getter(compare_fields)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return get(self) == get(other)
+    return __eq__
+
+
+def _lt(fields, repr_fields, compare_fields):
+    get = _getter(compare_fields)
+
+    def __lt__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return get(self) < get(other)
+    return __lt__
+
+
+def _le(fields, repr_fields, compare_fields):
+    get = _getter(compare_fields)
+
+    def __le__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return get(self) <= get(other)
+    return __le__
+
+
+def _gt(fields, repr_fields, compare_fields):
+    get = _getter(compare_fields)
+
+    def __gt__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return get(self) > get(other)
+    return __gt__
+
+
+def _ge(fields, repr_fields, compare_fields):
+    get = _getter(compare_fields)
+
+    def __ge__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return get(self) >= get(other)
+    return __ge__
+
+
+def _hash(fields, repr_fields, compare_fields):
+    get = _getter(compare_fields)
+
+    def __hash__(self):
+        return hash(get(self))
+    return __hash__
+
+
+def _getstate(fields, repr_fields, compare_fields):
+    get = _getter(fields)
+
+    def __getstate__(self):
+        return get(self)
+    return __getstate__
+
+
+def _setstate(fields, repr_fields, compare_fields):
+    def __setstate__(self, state):
+        for name, value in zip(fields, state):
+            object.__setattr__(self, name, value)
+    return __setstate__
+
+
+_makers = {
+    "__repr__": _repr,
+    "__eq__": _eq,
+    "__lt__": _lt,
+    "__le__": _le,
+    "__gt__": _gt,
+    "__ge__": _ge,
+    "__hash__": _hash,
+    "__setattr__": lambda *fields: __setattr__,
+    "__delattr__": lambda *fields: __delattr__,
+    "__getstate__": _getstate,
+    "__setstate__": _setstate,
+}
+
+
+@cache
+def class_methods(names, fields, repr_fields, compare_fields):
+    """
+    Return a tuple of the methods named in names (a space-separated string).
+
+    __repr__ shows the repr_fields, the comparison methods & __hash__ use
+    the compare_fields, and __getstate__ & __setstate__ use all the fields.
+    Each class gets all of its methods from one call, only the requested
+    methods are made, and classes with the same arguments share them.
+    """
+    return tuple([
+        _makers[name](fields, repr_fields, compare_fields)
+        for name in names.split()
+    ])
+'''  # Module imported by code converted with the shared_runtime option
+
+
+class UndataclassWarning(UserWarning):
+    """Warning about a dataclass that couldn't be converted as requested."""
+
+
+class UndataclassStats:
+    """
+    Timings and counts collected while undataclassing code.
+
+    Phases are timed in seconds: parse, fields (reading & merging fields),
+    methods (generating new methods), and unparse (or splice), as well as
+    the total time spent converting.  Statistics for separate runs can be
+    combined with merge().
+    """
+
+    def __init__(self):
+        self.phase_seconds = Counter()
+        self.files = 0  # Files (or code strings) converted
+        self.cached_files = 0  # Files whose result came from the cache
+        self.skipped_files = 0  # Files that never mention dataclasses
+        self.classes = 0
+        self.fields = 0
+        self.generated = Counter()  # Generated methods & attributes by name
+        self.slowest_classes = []  # (seconds, class name) pairs
+        self.imported_bases = 0  # Bases looked up in a DataclassIndex
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent within this context to the given phase."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[name] += perf_counter() - start
+
+    def add_class(self, name, seconds, field_count, nodes):
+        """Record a converted class and its newly generated nodes."""
+        self.classes += 1
+        self.fields += field_count
+        for node in nodes:
+            match node:
+                case ast.FunctionDef(name=node_name):
+                    self.generated[node_name] += 1
+                case ast.Assign(targets=targets):
+                    for target in targets:
+                        for subnode in ast.walk(target):
+                            if isinstance(subnode, ast.Name):
+                                self.generated[subnode.id] += 1
+        self.slowest_classes = nlargest(
+            SLOWEST_CLASSES,
+            [*self.slowest_classes, (seconds, name)],
+        )
+
+    def merge(self, other, source=None):
+        """Add other's statistics (with class names prefixed by source)."""
+        self.phase_seconds += other.phase_seconds
+        self.files += other.files
+        self.cached_files += other.cached_files
+        self.skipped_files += other.skipped_files
+        self.classes += other.classes
+        self.fields += other.fields
+        self.generated += other.generated
+        self.imported_bases += other.imported_bases
+        self.slowest_classes = nlargest(SLOWEST_CLASSES, [
+            *self.slowest_classes,
+            *(
+                (seconds, name if source is None else f"{source}:{name}")
+                for seconds, name in other.slowest_classes
+            ),
+        ])
+
+    def as_dict(self):
+        """Return statistics as a JSON-serializable dictionary."""
+        return {
+            "files": self.files,
+            "cached_files": self.cached_files,
+            "skipped_files": self.skipped_files,
+            "classes": self.classes,
+            "fields": self.fields,
+            "phase_seconds": dict(self.phase_seconds),
+            "generated": dict(self.generated.most_common()),
+            "imported_bases": self.imported_bases,
+            "slowest_classes": [
+                {"name": name, "seconds": seconds}
+                for seconds, name in self.slowest_classes
+            ],
+        }
+
+    def report(self):
+        """Return a human-readable report of these statistics."""
+        lines = [
+            f"Files: {self.files} converted, {self.cached_files} from cache, "
+            f"{self.skipped_files} without dataclasses",
+            f"Classes: {self.classes} ({self.fields} fields)",
+            f"Imported bases: {self.imported_bases} looked up in the index",
+            "Phases:",
+        ]
+        total = self.phase_seconds["total"] or 1
+        lines += [
+            f"    {name:<8} {seconds:10.6f}s {seconds / total:7.1%}"
+            for name, seconds in self.phase_seconds.items()
+        ]
+        lines.append("Generated:")
+        lines += [
+            f"    {name}: {count}"
+            for name, count in self.generated.most_common()
+        ]
+        lines.append("Slowest classes:")
+        lines += [
+            f"    {seconds:10.6f}s {name}"
+            for seconds, name in self.slowest_classes
+        ]
+        return "\n".join(lines)
 
 
 def is_dataclass_decorator(node):
@@ -27,6 +343,41 @@ def is_dataclass_decorator(node):
             return False
 
 
+def is_init_var(annotation):
+    """Return True if given annotation node is an InitVar pseudo-field type."""
+    match annotation:
+        case ast.Subscript(value=ast.Name(id="InitVar")):
+            return True
+        case ast.Subscript(value=ast.Attribute(attr="InitVar")):
+            return True
+        case ast.Name(id="InitVar") | ast.Attribute(attr="InitVar"):
+            return True
+        case _:
+            return False
+
+
+def is_kw_only_marker(annotation):
+    """Return True if given annotation node is the KW_ONLY sentinel type."""
+    match annotation:
+        case ast.Name(id="KW_ONLY") | ast.Attribute(attr="KW_ONLY"):
+            return True
+        case _:
+            return False
+
+
+def is_class_var(annotation):
+    """Return True if given annotation node is a ClassVar type."""
+    match annotation:
+        case ast.Constant(value=str(annotation_string)):
+            return "ClassVar" in annotation_string
+        case ast.Subscript(value=value):
+            return is_class_var(value)
+        case ast.Name(id="ClassVar") | ast.Attribute(attr="ClassVar"):
+            return True
+        case _:
+            return False
+
+
 def parse_decorator_options(node):
     """Return dictionary of arguments for given dataclass decorator node."""
     defaults = {
@@ -52,76 +403,255 @@ def parse_decorator_options(node):
             assert False  # There's a bug!
 
 
+def copy_missing_locations(nodes, old_node):
+    """
+    Copy old_node's location to each new statement node (recursively).
+
+    This is all ast.unparse needs, so nested expression nodes are skipped
+    (ast.fix_missing_locations can fill those in before compiling).
+    """
+    for node in nodes:
+        if not hasattr(node, "lineno"):
+            ast.copy_location(node, old_node)
+            copy_missing_locations(getattr(node, "body", ()), old_node)
+            copy_missing_locations(getattr(node, "orelse", ()), old_node)
+            copy_missing_locations(getattr(node, "handlers", ()), old_node)
+
+
+def make_method(name, arguments, body, returns=None):
+    """Return node for a method definition with the given body nodes."""
+    return ast.FunctionDef(
+        name=name,
+        args=arguments,
+        body=body,
+        decorator_list=[],
+        returns=returns,
+        type_params=[],
+    )
+
+
+def make_arguments(*names):
+    """Return node for a list of plain positional arguments (e.g. self)."""
+    return ast.arguments(
+        posonlyargs=[],
+        args=[ast.arg(name) for name in names],
+        vararg=None,
+        kwonlyargs=[],
+        kw_defaults=[],
+        kwarg=None,
+        defaults=[],
+    )
+
+
+def make_attribute(object_name, attribute_name, ctx=ast.Load):
+    """Return node for object_name.attribute_name (e.g. self.x)."""
+    object_node = ast.Name(object_name, ast.Load())
+    return ast.Attribute(object_node, attribute_name, ctx())
+
+
+def make_call(func, *args):
+    """Return node for calling func (a node or name) with argument nodes."""
+    if isinstance(func, str):
+        func = ast.Name(func, ast.Load())
+    return ast.Call(func, list(args), [])
+
+
+def make_assign(target, value):
+    """Return node for assigning a value node to a target name or node."""
+    if isinstance(target, str):
+        target = ast.Name(target, ast.Store())
+    return ast.Assign([target], value)
+
+
 def attr_tuple(object_name, fields):
     """
-    Return code for a tuple of attributes for each field on an object.
+    Return node for a tuple of attributes for each field on an object.
 
     Example:
-    >>> attr_tuple('self', [Field(name='x'), Field(name='y')])
-    "('self.x', 'self.y')"
+    >>> ast.unparse(attr_tuple('self', [Field(name='x'), Field(name='y')]))
+    '(self.x, self.y)'
     """
-    joined_names = ", ".join([
-        f"{object_name}.{f.name}"
-        for f in fields
-    ])
-    return f"({joined_names},)" if len(fields) == 1 else f"({joined_names})"
+    return ast.Tuple(
+        [make_attribute(object_name, f.name) for f in fields],
+        ast.Load(),
+    )
 
 
 def attr_name_tuple(fields):
-    """Return code for a tuple of all field names (as strings)."""
-    joined_names = ", ".join([
-        repr(f.name)
-        for f in fields
-    ])
-    return f"({joined_names},)" if len(fields) == 1 else f"({joined_names})"
+    """Return node for a tuple of all field names (as strings)."""
+    return ast.Tuple([ast.Constant(f.name) for f in fields], ast.Load())
 
 
-def make_slots(fields):
-    """Return code of __slots__."""
-    return f"__slots__ = {attr_name_tuple(fields)}"
+def make_slots(fields, hidden_names=()):
+    """Return node for __slots__ (with extra slots for any hidden names)."""
+    slots = attr_name_tuple(fields)
+    slots.elts += [ast.Constant(name) for name in hidden_names]
+    return make_assign("__slots__", slots)
 
 
 def make_match_args(fields):
-    """Return code of __match_args__."""
+    """Return node for __match_args__."""
     fields = [f for f in fields if f.init]
-    return f"__match_args__ = {attr_name_tuple(fields)}"
+    return make_assign("__match_args__", attr_name_tuple(fields))
 
 
 def make_arg(field):
-    """Return code for an annotated function argument for __init__."""
+    """Return annotated argument node & default node (or None) for __init__."""
     field_type = field.type
-    if "InitVar" in field.type:
-        field_type = (
-            field_type
-            .removeprefix("dataclasses.InitVar[")
-            .removeprefix("InitVar[")
-            .removesuffix("]")
-        )
+    if is_init_var(field_type) and isinstance(field_type, ast.Subscript):
+        field_type = field_type.slice
+    argument = ast.arg(field.name, field_type)
     if field.default is not dataclasses.MISSING:
-        return f"{field.name}: {field_type} = {field.default}"
+        return argument, field.default
     elif field.default_factory is not dataclasses.MISSING:
-        return f"{field.name}: {field_type} = None"
+        return argument, ast.Constant(None)
     else:
-        return f"{field.name}: {field_type}"
+        return argument, None
 
 
 def use_factory(default_factory):
-    """Return code that uses the given factory callable idiomatically."""
-    if default_factory == "list":
-        return "[]"
-    elif default_factory == "dict":
-        return "{}"
-    elif default_factory == "tuple":
-        return "()"
-    elif default_factory.startswith("lambda :"):
-        return default_factory.removeprefix("lambda :").strip()
+    """Return node that uses the given factory callable idiomatically."""
+    match default_factory:
+        case ast.Name(id="list"):
+            return ast.List([], ast.Load())
+        case ast.Name(id="dict"):
+            return ast.Dict([], [])
+        case ast.Name(id="tuple"):
+            return ast.Tuple([], ast.Load())
+        case ast.Lambda(args=ast.arguments(
+            posonlyargs=[], args=[], vararg=None, kwonlyargs=[], kwarg=None,
+        )):
+            return default_factory.body
+        case _:
+            return make_call(default_factory)
+
+
+def unused_name(name, nodes, taken_names=()):
+    """Return name (with "_" prefixes if needed) that nodes don't use."""
+    used_names = {*taken_names}
+    for node in nodes:
+        used_names |= {
+            subnode.id
+            for subnode in ast.walk(node)
+            if isinstance(subnode, ast.Name)
+        }
+    while name in used_names:
+        name = f"_{name}"
+    return name
+
+
+def make_frozen_assignments(fields, frozen_setter, other_nodes):
+    """
+    Return nodes assigning each field's argument to a frozen instance.
+
+    frozen_setter is "object" (for object.__setattr__ calls), "dict" (for
+    storing directly in the instance __dict__), or "bound" (for calling an
+    object.__setattr__ that's bound to self once up front).
+    """
+    taken_names = [f.name for f in fields]
+    if frozen_setter == "dict":
+        self_dict = unused_name("self_dict", other_nodes, taken_names)
+        return [
+            make_assign(self_dict, make_attribute("self", "__dict__")),
+            *(
+                make_assign(
+                    ast.Subscript(
+                        ast.Name(self_dict, ast.Load()),
+                        ast.Constant(f.name),
+                        ast.Store(),
+                    ),
+                    ast.Name(f.name, ast.Load()),
+                )
+                for f in fields
+            ),
+        ]
+    if frozen_setter == "bound":
+        setter = ast.Name(
+            unused_name("self_setattr", other_nodes, taken_names),
+            ast.Load(),
+        )
+        nodes = [make_assign(setter.id, make_call(
+            ast.Attribute(
+                make_attribute("object", "__setattr__"),
+                "__get__",
+                ast.Load(),
+            ),
+            ast.Name("self", ast.Load()),
+        ))]
+        arguments = []
     else:
-        return f"{default_factory}()"
+        setter = make_attribute("object", "__setattr__")
+        nodes = []
+        arguments = [ast.Name("self", ast.Load())]
+    return nodes + [
+        ast.Expr(make_call(
+            setter,
+            *arguments,
+            ast.Constant(f.name),
+            ast.Name(f.name, ast.Load()),
+        ))
+        for f in fields
+    ]
+
+
+def make_init_arguments(fields, kw_only_fields, first_name="self"):
+    """Return arguments node for the given __init__ fields."""
+    kw_only_fields = set(kw_only_fields)
+    args = [
+        make_arg(f)
+        for f in fields
+        if f not in kw_only_fields
+    ]
+    kw_args = [
+        make_arg(f)
+        for f in fields
+        if f in kw_only_fields
+    ]
+    defaults = [default for _, default in args if default is not None]
+    for argument, default in args[len(args)-len(defaults):]:
+        if default is None:
+            raise TypeError(
+                f"non-default argument {argument.arg!r} "
+                "follows default argument"
+            )
+    return ast.arguments(
+        posonlyargs=[],
+        args=[ast.arg(first_name), *(argument for argument, _ in args)],
+        vararg=None,
+        kwonlyargs=[argument for argument, _ in kw_args],
+        kw_defaults=[default for _, default in kw_args],
+        kwarg=None,
+        defaults=defaults,
+    )
+
+
+def make_factory_calls(fields):
+    """Return nodes calling the default factory of any unpassed arguments."""
+    return [
+        ast.If(
+            ast.Compare(
+                ast.Name(f.name, ast.Load()),
+                [ast.Is()],
+                [ast.Constant(None)],
+            ),
+            [make_assign(f.name, use_factory(f.default_factory))],
+            [],
+        )
+        for f in fields
+        if f.default_factory is not dataclasses.MISSING
+    ]
 
 
-def make_init(fields, post_init_nodes, init_vars, frozen, kw_only_fields):
+def make_init(
+    fields,
+    post_init_nodes,
+    init_vars,
+    frozen,
+    kw_only_fields,
+    frozen_setter="object",
+):
     """
-    Return code for the __init__ method.
+    Return node for the __init__ method.
 
     Keyword arguments:
     fields -- list of all fields (INCLUDING any InitVar pseudo-fields)
@@ -129,197 +659,951 @@ def make_init(fields, post_init_nodes, init_vars, frozen, kw_only_fields):
     init_vars -- list of variable names for any InitVar pseudo-fields
     frozen -- True if dataclass is frozen
     kw_only_fields -- list of all fields which are keyword-only arguments
+    frozen_setter -- how frozen fields are set (see make_frozen_assignments)
     """
     fields = [f for f in fields if f.init]
-    arg_list = [
-        make_arg(f)
-        for f in fields
-        if f not in kw_only_fields
-    ]
-    if kw_only_fields:
-        arg_list.append("*")
-        arg_list += [
-            make_arg(f)
-            for f in fields
-            if f in kw_only_fields
-        ]
-    init_args = ", ".join(arg_list)
+    arguments = make_init_arguments(fields, kw_only_fields)
+    body = make_factory_calls(fields)
+    init_vars = set(init_vars)
     assigned_fields = [f for f in fields if f.name not in init_vars]
     if frozen:
-        init_body = "\n".join([
-            f"object.__setattr__(self, {f.name!r}, {f.name})"
-            for f in assigned_fields
-        ])
+        body += make_frozen_assignments(
+            assigned_fields,
+            frozen_setter,
+            post_init_nodes,
+        )
     else:
-        init_body = "\n".join([
-            f"self.{f.name} = {f.name}"
+        body += [
+            make_assign(
+                make_attribute("self", f.name, ast.Store),
+                ast.Name(f.name, ast.Load()),
+            )
             for f in assigned_fields
-        ])
-    if any(f.default_factory is not dataclasses.MISSING for f in fields):
-        init_body = "".join([
-            f"if {f.name} is None:\n" +
-            f"    {f.name} = {use_factory(f.default_factory)}\n"
-            for f in fields
-            if f.default_factory is not dataclasses.MISSING
-        ]) + init_body
-    return dedent("""
-        def __init__(self, {init_args}) -> None:
-        {init_body}
-        {post_init}
-    """).format(
-        init_args=init_args,
-        init_body=indent(init_body, " "*4),
-        post_init=indent(ast.unparse(post_init_nodes), " "*4),
+        ]
+    body += post_init_nodes
+    return make_method(
+        "__init__",
+        arguments,
+        body or [ast.Pass()],
+        returns=ast.Constant(None),
     )
 
 
 def make_repr(fields):
-    """Return code for the __repr__ method."""
-    repr_args = ", ".join([
-        f"{f.name}={{self.{f.name}!r}}"
-        for f in fields
-        if f.repr
+    """Return node for the __repr__ method."""
+    values = [
+        ast.FormattedValue(ast.Name("cls", ast.Load()), -1),
+        ast.Constant("("),
+    ]
+    for f in fields:
+        if f.repr:
+            separator = ", " if len(values) > 2 else ""
+            values += [
+                ast.Constant(f"{separator}{f.name}="),
+                ast.FormattedValue(make_attribute("self", f.name), ord("r")),
+            ]
+    values.append(ast.Constant(")"))
+    return make_method("__repr__", make_arguments("self"), [
+        make_assign("cls", ast.Attribute(
+            make_call("type", ast.Name("self", ast.Load())),
+            "__name__",
+            ast.Load(),
+        )),
+        ast.Return(ast.JoinedStr(values)),
+    ])
+
+
+def make_replace(init_fields, init_vars):
+    """
+    Return node for __replace__ method (which works like dataclasses.replace).
+
+    Unchanged fields are passed to the class from their attributes while
+    InitVars (and any unknown names) are passed through from the changes.
+    """
+    init_vars = set(init_vars)
+    changes = ast.Name("changes", ast.Load())
+    body = []
+    keywords = []
+    for f in init_fields:
+        if not f.init:
+            body.append(ast.If(
+                ast.Compare(ast.Constant(f.name), [ast.In()], [changes]),
+                [ast.Raise(make_call("ValueError", ast.Constant(
+                    f"field {f.name} is declared with init=False, "
+                    "it cannot be specified with replace()"
+                )))],
+                [],
+            ))
+        elif f.name not in init_vars:
+            keywords.append(ast.keyword(f.name, make_call(
+                make_attribute("changes", "pop"),
+                ast.Constant(f.name),
+                make_attribute("self", f.name),
+            )))
+        elif f.default is dataclasses.MISSING:
+            body.append(ast.If(
+                ast.Compare(ast.Constant(f.name), [ast.NotIn()], [changes]),
+                [ast.Raise(make_call("ValueError", ast.Constant(
+                    f"InitVar {f.name!r} must be specified with replace()"
+                )))],
+                [],
+            ))
+    keywords.append(ast.keyword(None, changes))
+    new_instance = make_call("type", ast.Name("self", ast.Load()))
+    body.append(ast.Return(ast.Call(new_instance, [], keywords)))
+    arguments = make_arguments()
+    arguments.posonlyargs = [ast.arg("self")]
+    arguments.kwarg = ast.arg("changes")
+    return make_method("__replace__", arguments, body)
+
+
+def make_field_table(fields):
+    """
+    Return node for __field_table__: a tuple with a _Field for each field.
+
+    Each _Field has the same attributes as a dataclasses.Field, except that
+    types are stored as strings (so they're never evaluated) and missing
+    defaults are _MISSING.  Defaults, default factories, and metadata are
+    evaluated once, when the class is created.
+    """
+    def missing_or(node):
+        if node is dataclasses.MISSING:
+            return ast.Name("_MISSING", ast.Load())
+        return node
+    entries = []
+    for f in fields:
+        match f.type:
+            case ast.Constant(value=str(annotation)):
+                pass
+            case _:
+                annotation = ast.unparse(f.type)
+        metadata = ast.Name("_NO_METADATA", ast.Load())
+        if isinstance(f.metadata, ast.AST):
+            metadata = make_call("_MappingProxyType", f.metadata)
+        entries.append(make_call(
+            "_Field",
+            ast.Constant(f.name),
+            ast.Constant(annotation),
+            missing_or(f.default),
+            missing_or(f.default_factory),
+            ast.Constant(f.init),
+            ast.Constant(f.repr),
+            ast.Constant(f.hash),
+            ast.Constant(f.compare),
+            ast.Constant(f.kw_only is True),
+            metadata,
+        ))
+    return make_assign("__field_table__", ast.Tuple(entries, ast.Load()))
+
+
+def make_conversion_method(kind, fields):
+    """
+    Return node for an _asdict or _astuple method (kind is asdict/astuple).
+
+    Fields annotated with immutable builtin types (like int or str) are used
+    as-is and other values are converted by _asdict_value (or _astuple_value)
+    just as dataclasses.asdict (or astuple) would convert them.
+    """
+    values = []
+    for f in fields:
+        value = make_attribute("self", f.name)
+        match f.type:
+            case ast.Name(id=name) | ast.Constant(value=name) if (
+                name in ATOMIC_TYPES
+            ):
+                pass
+            case _:
+                value = make_call(f"_{kind}_value", value)
+        values.append(value)
+    if kind == "asdict":
+        result = ast.Dict([ast.Constant(f.name) for f in fields], values)
+    else:
+        result = ast.Tuple(values, ast.Load())
+    return make_method(f"_{kind}", make_arguments("self"), [
+        ast.Return(result),
+    ])
+
+
+def make_conversion_methods(fields):
+    """Return nodes for the _asdict & _astuple methods and their marker."""
+    return [
+        make_assign(CONVERTED_MARKER, ast.Constant(True)),
+        *(make_conversion_method(kind, fields) for kind in CONVERSION_HELPERS),
+    ]
+
+
+def make_value_converter(kind):
+    """
+    Return node for the _asdict_value (or _astuple_value) function.
+
+    Like dataclasses.asdict (or astuple), the function recurses into named
+    tuples, lists, tuples, and dictionaries, calls the _asdict (or _astuple)
+    method of converted classes (marked by CONVERTED_MARKER), and deep copies
+    other values.
+    """
+    name = f"_{kind}_value"
+
+    def load(name):
+        return ast.Name(name, ast.Load())
+
+    def store(name):
+        return ast.Name(name, ast.Store())
+
+    def value_type():
+        return make_call("type", load("value"))
+
+    def has(object_node, attribute):
+        return make_call("hasattr", object_node, ast.Constant(attribute))
+
+    def is_instance(*type_names):
+        types = [load(type_name) for type_name in type_names]
+        if len(types) > 1:
+            types = [ast.Tuple(types, ast.Load())]
+        return make_call("isinstance", load("value"), *types)
+
+    def import_from(module, name):
+        return ast.ImportFrom(module, [ast.alias(name)], 0)
+
+    def convert_each(element, target, iterable):
+        return ast.GeneratorExp(element, [
+            ast.comprehension(target, iterable, [], is_async=0),
+        ])
+
+    def return_if(test, *body):
+        *statements, result = body
+        return ast.If(test, [*statements, ast.Return(result)], [])
+
+    atomic_types = [
+        *map(load, ("int", "float", "complex", "str", "bytes", "bool")),
+        make_call("type", ast.Constant(None)),
+    ]
+    return make_method(name, make_arguments("value"), [
+        return_if(
+            ast.Compare(value_type(), [ast.In()], [
+                ast.Tuple(atomic_types, ast.Load()),
+            ]),
+            load("value"),
+        ),
+        return_if(
+            ast.BoolOp(ast.And(), [
+                is_instance("tuple"),
+                has(load("value"), "_fields"),
+            ]),
+            ast.Call(value_type(), [ast.Starred(ast.ListComp(
+                make_call(name, load("item")),
+                [ast.comprehension(
+                    store("item"), load("value"), [], is_async=0,
+                )],
+            ), ast.Load())], []),
+        ),
+        return_if(
+            has(value_type(), CONVERTED_MARKER),
+            make_call(make_attribute("value", f"_{kind}")),
+        ),
+        return_if(
+            has(value_type(), "__dataclass_fields__"),
+            import_from("dataclasses", kind),
+            make_call(kind, load("value")),
+        ),
+        return_if(
+            is_instance("list", "tuple"),
+            make_call(value_type(), convert_each(
+                make_call(name, load("item")),
+                store("item"),
+                load("value"),
+            )),
+        ),
+        return_if(
+            is_instance("dict"),
+            make_call(value_type(), convert_each(
+                ast.Tuple([
+                    make_call(name, load("key")),
+                    make_call(name, load("item")),
+                ], ast.Load()),
+                ast.Tuple([store("key"), store("item")], ast.Store()),
+                make_call(make_attribute("value", "items")),
+            )),
+        ),
+        import_from("copy", "deepcopy"),
+        ast.Return(make_call("deepcopy", load("value"))),
     ])
-    return dedent("""
-        def __repr__(self):
-            cls = type(self).__name__
-            return f"{{cls}}({repr_args})"
-    """).format(repr_args=repr_args)
 
 
 def make_order(operator, class_name, fields):
-    """Return code for __eq__ or __lt__ method."""
-    names = {"==": "eq", "<": "lt"}
+    """Return node for __eq__ or an ordering method (like __lt__)."""
+    name, operator_type = COMPARISONS[operator]
     fields = [f for f in fields if f.compare]
-    self_tuple = attr_tuple("self", fields)
-    other_tuple = attr_tuple("other", fields)
-    return dedent(f"""
-        def __{names[operator]}__(self, other):
-            if not isinstance(other, {class_name}):
-                return NotImplemented
-            return {self_tuple} {operator} {other_tuple}
-    """)
+    return make_method(f"__{name}__", make_arguments("self", "other"), [
+        ast.If(
+            ast.UnaryOp(ast.Not(), make_call(
+                "isinstance",
+                ast.Name("other", ast.Load()),
+                ast.Name(class_name, ast.Load()),
+            )),
+            [ast.Return(ast.Name("NotImplemented", ast.Load()))],
+            [],
+        ),
+        ast.Return(ast.Compare(
+            attr_tuple("self", fields),
+            [operator_type()],
+            [attr_tuple("other", fields)],
+        )),
+    ])
 
 
 def make_hash(fields):
-    """Return code for __hash__ method."""
+    """Return node for __hash__ method."""
     self_tuple = attr_tuple("self", [
         f
         for f in fields
         if f.compare
     ])
-    return dedent(f"""
-        def __hash__(self):
-            return hash({self_tuple})
-    """)
+    return make_method("__hash__", make_arguments("self"), [
+        ast.Return(make_call("hash", self_tuple)),
+    ])
 
 
-def make_setattr_and_delattr():
-    """Return code for __setattr__ and __delattr__ methods."""
-    return dedent("""
-        def __setattr__(self, name, value):
-            raise AttributeError(f"Can't set attribute {name!r}")
-        def __delattr__(self, name):
-            raise AttributeError(f"Can't delete attribute {name!r}")
-    """)
+def make_field_equal(name):
+    """
+    Return node checking the named attribute as tuple comparison does.
 
+    Example:
+    >>> ast.unparse(make_field_equal('x'))
+    'self.x is other.x or self.x == other.x'
+    """
+    return ast.BoolOp(ast.Or(), [
+        ast.Compare(
+            make_attribute("self", name),
+            [ast.Is()],
+            [make_attribute("other", name)],
+        ),
+        ast.Compare(
+            make_attribute("self", name),
+            [ast.Eq()],
+            [make_attribute("other", name)],
+        ),
+    ])
 
-def make_setstate_and_getstate(fields):
-    """Return code for __getstate__ and __setstate__ methods."""
-    return dedent(f"""
-        def __getstate__(self):
-            return {attr_tuple("self", fields)}
-        def __setstate__(self, state):
-            fields = {attr_name_tuple(fields)}
-            for field, value in zip(fields, state):
-                object.__setattr__(self, field, value)
-    """)
 
+def make_fast_order(operator, fields):
+    """
+    Return node for __eq__ or an ordering method that avoids building tuples.
 
-def process_kw_only_fields(options, fields):
-    """Return keyword-only fields and remove any KW_ONLY pseudo-field."""
-    if _ := next((f for f in fields if f.type.endswith("KW_ONLY")), None):
-        kw_only_fields = fields[fields.index(_)+1:]
-        fields.remove(_)
+    Like dataclasses, other objects must be of exactly the same class.
+    Fields are compared one at a time, stopping at the first difference.
+    Like tuples, identical field values are equal (even NaN).
+    """
+    name, operator_type = COMPARISONS[operator]
+    fields = [f for f in fields if f.compare]
+    body = [
+        ast.If(
+            ast.Compare(
+                make_attribute("other", "__class__"),
+                [ast.IsNot()],
+                [make_attribute("self", "__class__")],
+            ),
+            [ast.Return(ast.Name("NotImplemented", ast.Load()))],
+            [],
+        ),
+    ]
+    if operator == "==":
+        body.insert(0, ast.If(
+            ast.Compare(
+                ast.Name("self", ast.Load()),
+                [ast.Is()],
+                [ast.Name("other", ast.Load())],
+            ),
+            [ast.Return(ast.Constant(True))],
+            [],
+        ))
+        comparisons = [make_field_equal(f.name) for f in fields]
+        match comparisons:
+            case []:
+                body.append(ast.Return(ast.Constant(True)))
+            case [comparison]:
+                body.append(ast.Return(comparison))
+            case _:
+                body.append(ast.Return(ast.BoolOp(ast.And(), comparisons)))
     else:
-        kw_only_fields = []
-    if any(f.kw_only for f in fields):
-        old_kw_only_fields = list(kw_only_fields)
-        kw_only_fields = [
-            f
+        body += [
+            ast.If(
+                ast.UnaryOp(ast.Not(), make_field_equal(f.name)),
+                [ast.Return(ast.Compare(
+                    make_attribute("self", f.name),
+                    [operator_type()],
+                    [make_attribute("other", f.name)],
+                ))],
+                [],
+            )
             for f in fields
-            if f.kw_only is True or f in old_kw_only_fields
         ]
-    if options["kw_only"]:
-        kw_only_fields = fields
-    for field in kw_only_fields:
-        field.kw_only = True
-    return kw_only_fields
+        body.append(ast.Return(ast.Constant(operator in ("<=", ">="))))
+    return make_method(f"__{name}__", make_arguments("self", "other"), body)
 
 
-def process_init_vars(fields):
+def make_fast_hash(fields):
+    """Return node for __hash__ method (without a tuple for single fields)."""
+    fields = [f for f in fields if f.compare]
+    if len(fields) != 1:
+        return make_hash(fields)
+    return make_method("__hash__", make_arguments("self"), [
+        ast.Return(make_call("hash", make_attribute("self", fields[0].name))),
+    ])
+
+
+def make_cached_hash(hash_method, cache_name):
     """
-    Return tuple of fields for __init__ and InitVar pseudo-field names
+    Return given __hash__ method node changed to cache its result.
 
-    Also removes InitVar pseudo-fields!
+    The hash is computed on first use and stored in the cache_name attribute.
     """
-    init_var_fields = [
-        f
-        for f in fields
-        if "InitVar" in f.type
+    [return_node] = hash_method.body
+    hash_call = return_node.value
+    cache_attribute = make_attribute("self", cache_name)
+    hash_method.body = [ast.Try(
+        body=[ast.Return(cache_attribute)],
+        handlers=[ast.ExceptHandler(
+            ast.Name("AttributeError", ast.Load()),
+            None,
+            [
+                ast.Expr(make_call(
+                    make_attribute("object", "__setattr__"),
+                    ast.Name("self", ast.Load()),
+                    ast.Constant(cache_name),
+                    hash_call,
+                )),
+                ast.Return(cache_attribute),
+            ],
+        )],
+        orelse=[],
+        finalbody=[],
+    )]
+    return hash_method
+
+
+def make_getstate_without(name):
+    """Return node for __getstate__ returning __dict__ without name in it."""
+    return make_method("__getstate__", make_arguments("self"), [
+        make_assign("state", make_call(ast.Attribute(
+            make_attribute("self", "__dict__"),
+            "copy",
+            ast.Load(),
+        ))),
+        ast.Expr(make_call(
+            make_attribute("state", "pop"),
+            ast.Constant(name),
+            ast.Constant(None),
+        )),
+        ast.Return(ast.Name("state", ast.Load())),
+    ])
+
+
+def make_attribute_error(message):
+    """Return node raising AttributeError(f"{message} {name!r}")."""
+    return ast.Raise(make_call("AttributeError", ast.JoinedStr([
+        ast.Constant(f"{message} "),
+        ast.FormattedValue(ast.Name("name", ast.Load()), ord("r")),
+    ])))
+
+
+def make_setattr_and_delattr():
+    """Return nodes for __setattr__ and __delattr__ methods."""
+    return [
+        make_method("__setattr__", make_arguments("self", "name", "value"), [
+            make_attribute_error("Can't set attribute"),
+        ]),
+        make_method("__delattr__", make_arguments("self", "name"), [
+            make_attribute_error("Can't delete attribute"),
+        ]),
     ]
-    init_fields = list(fields)
-    for field in init_var_fields:
-        fields.remove(field)
-    return (init_fields, [f.name for f in init_var_fields])
 
 
-def make_dataclass_methods(class_name, options, fields, post_init):
-    """Return AST nodes for all new dataclass attributes and methods."""
-    nodes = []
-    kw_only_fields = process_kw_only_fields(options, fields)
-    init_fields, init_vars = process_init_vars(fields)
-    if options["slots"]:
-        nodes += ast.parse(make_slots(fields)).body
-    if options["match_args"]:
-        nodes += ast.parse(make_match_args(fields)).body
-    if options["init"]:
-        nodes += ast.parse(make_init(
-            init_fields,
-            post_init,
-            init_vars,
-            options["frozen"],
-            kw_only_fields,
-        )).body
-    if options["repr"]:
-        nodes += ast.parse(make_repr(fields)).body
-    if options["eq"]:
-        nodes += ast.parse(make_order("==", class_name, fields)).body
-    if options["order"]:
-        nodes += ast.parse(make_order("<", class_name, fields)).body
-    if options["frozen"] and options["eq"] or options["unsafe_hash"]:
-        nodes += ast.parse(make_hash(fields)).body
-    if options["frozen"]:
-        nodes += ast.parse(make_setattr_and_delattr()).body
-        if options["slots"]:
-            nodes += ast.parse(make_setstate_and_getstate(fields)).body
-    return nodes
+def make_setstate_and_getstate(fields):
+    """Return nodes for __getstate__ and __setstate__ methods."""
+    return [
+        make_method("__getstate__", make_arguments("self"), [
+            ast.Return(attr_tuple("self", fields)),
+        ]),
+        make_method("__setstate__", make_arguments("self", "state"), [
+            make_assign("fields", attr_name_tuple(fields)),
+            ast.For(
+                ast.Tuple([
+                    ast.Name("field", ast.Store()),
+                    ast.Name("value", ast.Store()),
+                ], ast.Store()),
+                make_call(
+                    "zip",
+                    ast.Name("fields", ast.Load()),
+                    ast.Name("state", ast.Load()),
+                ),
+                [ast.Expr(make_call(
+                    make_attribute("object", "__setattr__"),
+                    ast.Name("self", ast.Load()),
+                    ast.Name("field", ast.Load()),
+                    ast.Name("value", ast.Load()),
+                ))],
+                [],
+            ),
+        ]),
+    ]
 
 
-def parse_field_argument(name, value_node):
+def make_class_methods(names, fields):
     """
-    Return appropriate value for given field argument.
+    Return node assigning the named methods made by the shared runtime.
 
-    For default & default_factory return code string.
-    Otherwise return literal True/False/None value.
+    Example:
+    >>> ast.unparse(make_class_methods(['__hash__'], []))
+    "__hash__, = _runtime.class_methods('__hash__', (), (), ())"
     """
-    if name not in ("default", "default_factory", "metadata"):
-        return ast.literal_eval(value_node)
-    return ast.unparse(value_node)
+    return ast.Assign(
+        [ast.Tuple(
+            [ast.Name(name, ast.Store()) for name in names],
+            ast.Store(),
+        )],
+        make_call(
+            make_attribute(RUNTIME_NAME, "class_methods"),
+            ast.Constant(" ".join(names)),
+            ast.Constant(tuple(f.name for f in fields)),
+            ast.Constant(tuple(f.name for f in fields if f.repr)),
+            ast.Constant(tuple(f.name for f in fields if f.compare)),
+        ),
+    )
 
 
-def make_field(node):
-    """Return dataclasses.Field instance for the given field(...) node."""
+def strip_annotations(nodes):
+    """
+    Return nodes with annotations removed from all (nested) functions.
+
+    Class-level annotations (like ClassVar declarations) are changed to
+    plain assignments (or removed if they don't assign a value).
+    """
+    new_nodes = []
+    for node in nodes:
+        match node:
+            case ast.AnnAssign(value=None):
+                continue
+            case ast.AnnAssign(target=target, value=value):
+                node = ast.copy_location(make_assign(target, value), node)
+        for subnode in ast.walk(node):
+            if isinstance(subnode, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                arguments = subnode.args
+                for argument in [
+                    *arguments.posonlyargs,
+                    *arguments.args,
+                    arguments.vararg,
+                    *arguments.kwonlyargs,
+                    arguments.kwarg,
+                ]:
+                    if argument:
+                        argument.annotation = None
+                subnode.returns = None
+        new_nodes.append(node)
+    return new_nodes
+
+
+def make_tuple_new(fields, init_vars, kw_only_fields):
+    """
+    Return node for the __new__ method of a tuple-backed class.
+
+    The class itself is stored as the first item of the tuple so instances
+    never compare equal to (or order against) plain tuples.
+    """
+    fields = [f for f in fields if f.init]
+    init_vars = set(init_vars)
+    values = [ast.Name("cls", ast.Load())]
+    values += [
+        ast.Name(f.name, ast.Load())
+        for f in fields
+        if f.name not in init_vars
+    ]
+    return make_method(
+        "__new__",
+        make_init_arguments(fields, kw_only_fields, first_name="cls"),
+        [
+            *make_factory_calls(fields),
+            ast.Return(make_call(
+                make_attribute("tuple", "__new__"),
+                ast.Name("cls", ast.Load()),
+                ast.Tuple(values, ast.Load()),
+            )),
+        ],
+    )
+
+
+def make_tuple_property(field, index):
+    """Return node for a property reading the given item of the tuple."""
+    method = make_method(
+        field.name,
+        make_arguments("self"),
+        [ast.Return(make_call(
+            make_attribute("tuple", "__getitem__"),
+            ast.Name("self", ast.Load()),
+            ast.Constant(index),
+        ))],
+        returns=field.type,
+    )
+    method.decorator_list.append(ast.Name("property", ast.Load()))
+    return method
+
+
+def make_type_error(message):
+    """Return node raising TypeError(message) with {cls!r} as class name."""
+    before, after = message.split("{cls!r}")
+    return ast.Raise(make_call("TypeError", ast.JoinedStr([
+        ast.Constant(before),
+        ast.FormattedValue(ast.Attribute(
+            make_call("type", ast.Name("self", ast.Load())),
+            "__name__",
+            ast.Load(),
+        ), ord("r")),
+        ast.Constant(after),
+    ])))
+
+
+def make_aliases(names, value):
+    """Return node assigning the value node to each of the given names."""
+    return ast.Assign(
+        [ast.Name(name, ast.Store()) for name in names],
+        value,
+    )
+
+
+def make_tuple_overrides():
+    """
+    Return nodes hiding the tuple behaviors that dataclasses don't have.
+
+    Tuple-backed instances can't be measured, indexed, iterated, searched,
+    concatenated, or repeated (the tuple count & index methods still work).
+    """
+    return [
+        make_method("__len__", make_arguments("self"), [
+            make_type_error("object of type {cls!r} has no len()"),
+        ]),
+        make_method("__getitem__", make_arguments("self", "index"), [
+            make_type_error("{cls!r} object is not subscriptable"),
+        ]),
+        make_aliases(
+            ["__iter__", "__reversed__", "__contains__"],
+            ast.Constant(None),
+        ),
+        make_method("__add__", make_arguments("self", "other"), [
+            ast.Return(ast.Name("NotImplemented", ast.Load())),
+        ]),
+        make_aliases(
+            ["__mul__", "__rmul__"],
+            ast.Name("__add__", ast.Load()),
+        ),
+        make_method("__reduce__", make_arguments("self"), [
+            ast.Return(ast.Tuple([
+                make_attribute("tuple", "__new__"),
+                ast.Tuple([
+                    make_call("type", ast.Name("self", ast.Load())),
+                    make_call("tuple", make_call(
+                        make_attribute("tuple", "__iter__"),
+                        ast.Name("self", ast.Load()),
+                    )),
+                ], ast.Load()),
+            ], ast.Load())),
+        ]),
+    ]
+
+
+def make_ne():
+    """Return node for __ne__ negating __eq__ (unless NotImplemented)."""
+    result = ast.Name("result", ast.Load())
+    return make_method("__ne__", make_arguments("self", "other"), [
+        make_assign("result", make_call(
+            make_attribute("self", "__eq__"),
+            ast.Name("other", ast.Load()),
+        )),
+        ast.If(
+            ast.Compare(
+                result,
+                [ast.Is()],
+                [ast.Name("NotImplemented", ast.Load())],
+            ),
+            [ast.Return(ast.Name("result", ast.Load()))],
+            [],
+        ),
+        ast.Return(ast.UnaryOp(ast.Not(), ast.Name("result", ast.Load()))),
+    ])
+
+
+def make_tuple_methods(
+    class_name,
+    options,
+    fields,
+    init_fields,
+    init_vars,
+    kw_only_fields,
+):
+    """
+    Return AST nodes for a frozen dataclass as a tuple subclass.
+
+    Fields are read through properties and instances are built by __new__.
+    Comparison methods (including __ne__) are always defined so that the
+    tuple comparison methods are never used.
+    """
+    nodes = [make_slots([])]
+    if options["match_args"]:
+        nodes.append(make_match_args(fields))
+    if options["field_table"]:
+        nodes.append(make_field_table(fields))
+    nodes.append(make_tuple_new(init_fields, init_vars, kw_only_fields))
+    if options["replace"]:
+        nodes.append(make_replace(init_fields, init_vars))
+    nodes += [
+        make_tuple_property(field, index)
+        for index, field in enumerate(fields, start=1)
+    ]
+    runtime = options["shared_runtime"]
+    shared = []  # Names of methods from the shared runtime
+    shared_index = len(nodes)  # Where they're assigned
+    if options["repr"] and runtime:
+        shared.append("__repr__")
+    elif options["repr"]:
+        nodes.append(make_repr(fields))
+    else:
+        nodes.append(make_assign(
+            "__repr__",
+            make_attribute("object", "__repr__"),
+        ))
+    operators = ["==", "<", "<=", ">", ">="] if options["order"] else ["=="]
+    for operator in operators:
+        if options["fast_compare"]:
+            nodes.append(make_fast_order(operator, fields))
+        elif runtime:
+            shared.append(f"__{COMPARISONS[operator][0]}__")
+        else:
+            nodes.append(make_order(operator, class_name, fields))
+    nodes.append(make_ne())  # tuple.__ne__ would compare every field
+    if not options["order"]:
+        nodes += [
+            make_method("__lt__", make_arguments("self", "other"), [
+                ast.Return(ast.Name("NotImplemented", ast.Load())),
+            ]),
+            make_aliases(
+                ["__le__", "__gt__", "__ge__"],
+                ast.Name("__lt__", ast.Load()),
+            ),
+        ]
+    if options["fast_compare"]:
+        nodes.append(make_fast_hash(fields))
+    elif runtime:
+        shared.append("__hash__")
+    else:
+        nodes.append(make_hash(fields))
+    if options["asdict_methods"]:
+        nodes += make_conversion_methods(fields)
+    if runtime:
+        shared += ["__setattr__", "__delattr__"]
+        nodes.insert(shared_index, make_class_methods(shared, fields))
+    else:
+        nodes += make_setattr_and_delattr()
+    nodes += make_tuple_overrides()
+    return nodes
+
+
+def process_kw_only_fields(options, fields):
+    """Return keyword-only fields and remove any KW_ONLY pseudo-field."""
+    marker_index = next(
+        (i for i, f in enumerate(fields) if is_kw_only_marker(f.type)),
+        None,
+    )
+    if marker_index is not None:
+        kw_only_fields = fields[marker_index+1:]
+        del fields[marker_index]
+    else:
+        kw_only_fields = []
+    if any(f.kw_only for f in fields):
+        old_kw_only_fields = set(kw_only_fields)
+        kw_only_fields = [
+            f
+            for f in fields
+            if f.kw_only is True or f in old_kw_only_fields
+        ]
+    if options["kw_only"]:
+        kw_only_fields = fields
+    for field in kw_only_fields:
+        field.kw_only = True
+    return kw_only_fields
+
+
+def process_init_vars(fields):
+    """
+    Return tuple of fields for __init__ and InitVar pseudo-field names
+
+    Also removes InitVar pseudo-fields!
+    """
+    init_fields = list(fields)
+    fields[:] = [f for f in init_fields if not is_init_var(f.type)]
+    init_vars = [f.name for f in init_fields if is_init_var(f.type)]
+    return (init_fields, init_vars)
+
+
+def make_dataclass_methods(
+    class_name,
+    options,
+    fields,
+    post_init,
+    manual_slots=False,
+    inherits=False,
+):
+    """
+    Return AST nodes for all new dataclass attributes and methods.
+
+    If manual_slots is True, the class body already defines __slots__.
+    If inherits is True, the class has base classes (which may use slots).
+    If the tuple_backed option is True, the class must be made a subclass
+    of tuple (see make_tuple_methods).
+
+    The KW_ONLY & InitVar pseudo-fields are removed from the given fields.
+    """
+    kw_only_fields = process_kw_only_fields(options, fields)
+    init_fields, init_vars = process_init_vars(fields)
+    return build_dataclass_methods(
+        class_name,
+        options,
+        fields,
+        init_fields,
+        init_vars,
+        kw_only_fields,
+        post_init,
+        manual_slots,
+        inherits,
+    )
+
+
+def build_dataclass_methods(
+    class_name,
+    options,
+    fields,
+    init_fields,
+    init_vars,
+    kw_only_fields,
+    post_init,
+    manual_slots,
+    inherits,
+):
+    """Return AST nodes for new attributes & methods of processed fields."""
+    nodes = []
+    if options["tuple_backed"]:
+        nodes = make_tuple_methods(
+            class_name,
+            options,
+            fields,
+            init_fields,
+            init_vars,
+            kw_only_fields,
+        )
+        if options["annotations"] == "strip":
+            nodes = strip_annotations(nodes)
+        return nodes
+    if not options["fast_frozen_init"]:
+        frozen_setter = "object"
+    elif options["slots"] or manual_slots or inherits:
+        frozen_setter = "bound"  # Inherited slots would shadow the __dict__
+    else:
+        frozen_setter = "dict"
+    hash_method = None
+    if options["frozen"] and options["eq"] or options["unsafe_hash"]:
+        if options["fast_compare"]:
+            hash_method = make_fast_hash(fields)
+        else:
+            hash_method = make_hash(fields)
+    hidden_names = []
+    if (
+        options["cache_hash"]
+        and options["frozen"]
+        and hash_method
+        and (options["slots"] or not manual_slots)
+    ):
+        hash_cache_name = unused_name(
+            "_cached_hash",
+            [],
+            [f.name for f in init_fields],
+        )
+        hash_method = make_cached_hash(hash_method, hash_cache_name)
+        hidden_names.append(hash_cache_name)
+    if options["slots"]:
+        nodes.append(make_slots(fields, hidden_names))
+    if options["match_args"]:
+        nodes.append(make_match_args(fields))
+    if options["field_table"]:
+        nodes.append(make_field_table(fields))
+    if options["init"]:
+        nodes.append(make_init(
+            init_fields,
+            post_init,
+            init_vars,
+            options["frozen"],
+            kw_only_fields,
+            frozen_setter,
+        ))
+    if options["replace"]:
+        nodes.append(make_replace(init_fields, init_vars))
+    if options["asdict_methods"]:
+        nodes += make_conversion_methods(fields)
+    runtime = options["shared_runtime"]
+    shared = []  # Names of methods from the shared runtime
+    shared_index = len(nodes)  # Where they're assigned
+    if options["repr"] and runtime:
+        shared.append("__repr__")
+    elif options["repr"]:
+        nodes.append(make_repr(fields))
+    if options["eq"] and options["fast_compare"]:
+        nodes.append(make_fast_order("==", fields))
+    elif options["eq"] and runtime:
+        shared.append("__eq__")
+    elif options["eq"]:
+        nodes.append(make_order("==", class_name, fields))
+    for operator in ["<", "<=", ">", ">="] if options["order"] else []:
+        if options["fast_compare"]:
+            nodes.append(make_fast_order(operator, fields))
+        elif runtime:
+            shared.append(f"__{COMPARISONS[operator][0]}__")
+        else:
+            nodes.append(make_order(operator, class_name, fields))
+    if hash_method and runtime and not (
+        options["fast_compare"] or hidden_names
+    ):
+        shared.append("__hash__")
+    elif hash_method:
+        nodes.append(hash_method)
+    if options["frozen"] and runtime:
+        shared += ["__setattr__", "__delattr__"]
+        if options["slots"]:
+            shared += ["__getstate__", "__setstate__"]
+        elif hidden_names:
+            nodes.append(make_getstate_without(hash_cache_name))
+    elif options["frozen"]:
+        nodes += make_setattr_and_delattr()
+        if options["slots"]:
+            nodes += make_setstate_and_getstate(fields)
+        elif hidden_names:
+            nodes.append(make_getstate_without(hash_cache_name))
+    if shared:
+        nodes.insert(shared_index, make_class_methods(shared, fields))
+    if options["annotations"] == "strip":
+        nodes = strip_annotations(nodes)
+    return nodes
+
+
+def parse_field_argument(name, value_node):
+    """
+    Return appropriate value for given field argument.
+
+    For default, default_factory & metadata return the expression node.
+    Otherwise return literal True/False/None value.
+    """
+    if name not in ("default", "default_factory", "metadata"):
+        return ast.literal_eval(value_node)
+    return value_node
+
+
+def make_field(node):
+    """Return dataclasses.Field instance for the given field(...) node."""
     match node:
         case ast.AnnAssign(value=None):
             field = dataclasses.field()
@@ -328,14 +1612,18 @@ def make_field(node):
                 |
                 ast.Attribute(value=ast.Name(id="dataclasses"), attr="field")
         )):
-            field = dataclasses.field(**{
+            arguments = {
                 kwarg.arg: parse_field_argument(kwarg.arg, kwarg.value)
                 for kwarg in node.value.keywords
-            })
+            }
+            metadata = arguments.pop("metadata", None)
+            field = dataclasses.field(**arguments)
+            if metadata is not None:
+                field.metadata = metadata  # Node (not a mapping) is kept
         case ast.AnnAssign():
-            field = dataclasses.field(default=ast.unparse(node.value))
+            field = dataclasses.field(default=node.value)
     field.name = node.target.id
-    field.type = ast.unparse(node.annotation)
+    field.type = node.annotation
     return field
 
 
@@ -348,34 +1636,160 @@ def merge_fields(field_list):
     return list(new_fields.values())
 
 
-def update_dataclass_node(dataclass_node, previous_dataclass_fields):
-    """Undataclass given dataclass node by updating decorators & attributes."""
-    order = False
-    DATACLASS_STUFF_HERE = object()
+def defines_slots(nodes):
+    """Return True if any of the given class body nodes assigns __slots__."""
+    return any(
+        target.id == "__slots__"
+        for node in nodes
+        if isinstance(node, ast.Assign)
+        for target in node.targets
+        if isinstance(target, ast.Name)
+    )
+
+
+def slots_blockers(class_node, field_names, module_nodes):
+    """
+    Return reasons that adding __slots__ to the given class may be unsafe.
+
+    The class's bases & decorators are checked, as are attribute writes,
+    __dict__/__weakref__/vars() use, and cached_property use within the
+    class and within module-level code (which could be patched onto it).
+    """
+    reasons = [f"inherits from {ast.unparse(b)}" for b in class_node.bases]
+    reasons += [f"uses {k.arg}=" for k in class_node.keywords]
+    reasons += [
+        f"has @{ast.unparse(d)} decorator"
+        for d in class_node.decorator_list
+        if not is_dataclass_decorator(d)
+    ]
+    nodes = [
+        *class_node.body,
+        *(n for n in module_nodes if not isinstance(n, ast.ClassDef)),
+    ]
+    for node in (n for root in nodes for n in ast.walk(root)):
+        match node:
+            case ast.Attribute(
+                value=ast.Name(id="self"),
+                attr=name,
+                ctx=ast.Store(),
+            ) if name not in field_names:
+                reasons.append(f"sets self.{name}")
+            case ast.Call(
+                func=ast.Name(id="setattr") | ast.Attribute(
+                    value=ast.Name(id="object"),
+                    attr="__setattr__",
+                ),
+                args=[ast.Name(id="self"), name_node, *_],
+            ):
+                match name_node:
+                    case ast.Constant(value=name) if name in field_names:
+                        pass
+                    case ast.Constant(value=name):
+                        reasons.append(f"sets self.{name}")
+                    case _:
+                        reasons.append("sets attributes on self dynamically")
+            case ast.Name(id="__dict__" | "__weakref__" as name):
+                reasons.append(f"uses {name}")
+            case ast.Attribute(attr="__dict__" | "__weakref__" as name):
+                reasons.append(f"uses {name}")
+            case ast.Call(func=ast.Name(id="vars")):
+                reasons.append("uses vars()")
+            case ast.Name(id="cached_property"):
+                reasons.append("uses cached_property")
+            case ast.Attribute(attr="cached_property"):
+                reasons.append("uses cached_property")
+            case ast.Import(names=names) if any(
+                alias.name == "weakref" for alias in names
+            ):
+                reasons.append("module uses weakref")
+            case ast.ImportFrom(module="weakref"):
+                reasons.append("module uses weakref")
+    return list(dict.fromkeys(reasons))
+
+
+def tuple_blockers(class_node, fields, options, post_init, module_nodes):
+    """
+    Return reasons that making the given frozen class tuple-backed is unsafe.
+
+    Tuple-backed classes have the same restrictions as slotted classes (see
+    slots_blockers) and must also not have __post_init__, __slots__,
+    init=False, eq=False, or subclasses within the module.
+    """
+    field_names = {f.name for f in fields if not is_init_var(f.type)}
+    reasons = slots_blockers(class_node, field_names, module_nodes)
+    if post_init:
+        reasons.append("has __post_init__")
+    if defines_slots(class_node.body):
+        reasons.append("defines __slots__")
+    reasons += [
+        f"uses {name}=False"
+        for name in ("init", "eq")
+        if not options[name]
+    ]
+    reasons += [f"has init=False field {f.name}" for f in fields if not f.init]
+    reasons += subclass_blockers(class_node, module_nodes)
+    return reasons
+
+
+def subclass_blockers(class_node, module_nodes):
+    """Return an "is subclassed by" reason for each subclass in the module."""
+    return [
+        f"is subclassed by {node.name}"
+        for node in module_nodes
+        if isinstance(node, ast.ClassDef)
+        for base in node.bases
+        if isinstance(base, ast.Name) and base.id == class_node.name
+    ]
+
+
+def update_dataclass_node(
+    dataclass_node,
+    previous_dataclass_fields,
+    undataclass_options=None,
+    module_nodes=(),
+    stats=None,
+    resolve_base=None,
+):
+    """
+    Undataclass given dataclass node by updating decorators & attributes.
+
+    The undataclass_options dictionary (see parse_undataclass_options)
+    controls how the new methods are generated.  The module_nodes are the
+    module's top-level nodes (only used for the auto_slots and tuple_backed
+    options).  Timings & counts are recorded in stats (an UndataclassStats).
+    Bases that aren't dataclasses from this module are passed to
+    resolve_base (if given) which returns their fields (or None).
+    """
+    start = perf_counter()
+    stats = stats or UndataclassStats()
+    extras_index = None  # Generated methods go before the first method
     base_fields = []
     fields = []
     new_body = []
     post_init = []
     for node in reversed(dataclass_node.bases):
         match node:
-            case ast.Name(id=class_name):
-                if class_name in previous_dataclass_fields:
-                    base_fields += previous_dataclass_fields[class_name]
-    for node in dataclass_node.body:
-        match node:
-            case ast.AnnAssign() if (
-                "ClassVar" not in ast.unparse(node.annotation)
+            case ast.Name(id=class_name) if (
+                class_name in previous_dataclass_fields
             ):
-                fields.append(make_field(node))
-            case ast.FunctionDef():
-                if DATACLASS_STUFF_HERE not in new_body:
-                    new_body.append(DATACLASS_STUFF_HERE)
-                if node.name == "__post_init__":
-                    post_init = node.body
-                else:
+                base_fields += previous_dataclass_fields[class_name]
+            case _ if resolve_base:
+                base_fields += resolve_base(node) or []
+    with stats.phase("fields"):
+        for node in dataclass_node.body:
+            match node:
+                case ast.AnnAssign() if not is_class_var(node.annotation):
+                    fields.append(make_field(node))
+                case ast.FunctionDef():
+                    if extras_index is None:
+                        extras_index = len(new_body)
+                    if node.name == "__post_init__":
+                        post_init = node.body
+                    else:
+                        new_body.append(node)
+                case _:
                     new_body.append(node)
-            case _:
-                new_body.append(node)
+    field_count = sum(not is_kw_only_marker(f.type) for f in fields)
     new_decorator_list = []
     options = {}
     for node in dataclass_node.decorator_list:
@@ -383,51 +1797,475 @@ def update_dataclass_node(dataclass_node, previous_dataclass_fields):
             options = parse_decorator_options(node)
         else:
             new_decorator_list.append(node)
-    if options["order"]:
-        order = True
-        new_decorator_list.append(ast.Name(id="total_ordering"))
+    options |= parse_undataclass_options(undataclass_options or {})
+    if options["annotations"] == "strip":
+        if extras_index is not None:
+            extras_index = len(strip_annotations(new_body[:extras_index]))
+        new_body = strip_annotations(new_body)
+    manual_slots = defines_slots(new_body)
+    if options["tuple_backed"] and options["frozen"]:
+        reasons = tuple_blockers(
+            dataclass_node,
+            [f for f in fields if not is_kw_only_marker(f.type)],
+            options,
+            post_init,
+            module_nodes,
+        )
+        if reasons:
+            warnings.warn(
+                f"not making {dataclass_node.name} tuple-backed: "
+                + "; ".join(reasons),
+                UndataclassWarning,
+            )
+            options["tuple_backed"] = False
+        else:
+            dataclass_node.bases = [ast.Name("tuple", ast.Load())]
+    else:
+        options["tuple_backed"] = False
+    if (
+        options["auto_slots"]
+        and not options["tuple_backed"]
+        and not (options["slots"] or manual_slots)
+    ):
+        field_names = {
+            f.name
+            for f in fields
+            if not is_init_var(f.type) and not is_kw_only_marker(f.type)
+        }
+        reasons = slots_blockers(dataclass_node, field_names, module_nodes)
+        if options["frozen"]:
+            # __getstate__ of frozen slotted classes drops subclass fields
+            reasons += subclass_blockers(dataclass_node, module_nodes)
+        if reasons:
+            warnings.warn(
+                f"not adding __slots__ to {dataclass_node.name}: "
+                + "; ".join(reasons),
+                UndataclassWarning,
+            )
+        else:
+            options["slots"] = True
     dataclass_node.decorator_list = new_decorator_list
-    fields = merge_fields([*base_fields, *fields])
+    with stats.phase("fields"):
+        fields = merge_fields([*base_fields, *fields])
     previous_dataclass_fields[dataclass_node.name] = fields
-    dataclass_extras = make_dataclass_methods(
-        dataclass_node.name,
-        options,
-        fields,
-        post_init,
-    )
-    if DATACLASS_STUFF_HERE in new_body:
-        index = new_body.index(DATACLASS_STUFF_HERE)
-        new_body[index:index+1] = dataclass_extras
-    else:
+    with stats.phase("methods"):
+        dataclass_extras = make_dataclass_methods(
+            dataclass_node.name,
+            options,
+            fields,
+            post_init,
+            manual_slots=manual_slots,
+            inherits=bool(dataclass_node.bases),
+        )
+    if extras_index is None:
         new_body += dataclass_extras
+    else:
+        new_body[extras_index:extras_index] = dataclass_extras
     dataclass_node.body = new_body
-    return order
+    copy_missing_locations(dataclass_extras, dataclass_node)
+    stats.add_class(
+        dataclass_node.name,
+        perf_counter() - start,
+        field_count,
+        dataclass_extras,
+    )
 
 
-def undataclass(code):
-    """Return version of the given code with each dataclass undataclassed."""
-    nodes = ast.parse(code).body
+def node_start_line(node):
+    """
+    Return first line number of given node (including any decorators).
+
+    Returns None for nodes without line numbers (like newly built nodes).
+    """
+    decorators = getattr(node, "decorator_list", [])
+    return min(
+        (n.lineno for n in [node, *decorators] if hasattr(n, "lineno")),
+        default=None,
+    )
+
+
+def splice_changes(code, removed_nodes, updated_nodes, inserted=None):
+    """
+    Return code with just the given top-level nodes removed or rewritten.
+
+    Everything outside those nodes is copied through byte for byte.
+
+    Keyword arguments:
+    removed_nodes -- list of top-level nodes to remove from the code
+    updated_nodes -- dictionary mapping updated nodes to their first line
+    inserted -- list of new nodes to insert (at their line numbers) or None
+    """
+    source = code.encode()
+    lines = source.splitlines(keepends=True) or [b""]
+    line_starts = [0, *accumulate(len(line) for line in lines)]
+    newline = lines[0][len(lines[0].rstrip(b"\r\n")):] or b"\n"
+    edits = []
+    for node in removed_nodes:
+        line_start = line_starts[node.lineno-1]
+        next_line_start = line_starts[node.end_lineno]
+        start = line_start + node.col_offset
+        end = line_starts[node.end_lineno-1] + node.end_col_offset
+        after = source[end:next_line_start].strip()
+        if source[line_start:start].strip() or after[:1] not in (b"", b"#"):
+            edits.append((start, end, b"pass"))  # Shares a line with code
+        else:
+            edits.append((line_start, next_line_start, b""))
+    for node, start_line in updated_nodes.items():
+        end_line = lines[node.end_lineno-1]
+        end = line_starts[node.end_lineno-1] + len(end_line.rstrip(b"\r\n"))
+        new_code = ast.unparse(node).encode().replace(b"\n", newline)
+        edits.append((line_starts[start_line-1], end, new_code))
+    for lineno, new_nodes in groupby(inserted or [], attrgetter("lineno")):
+        position = line_starts[lineno-1]
+        new_code = b"".join(
+            (newline * 2 if isinstance(node, ast.FunctionDef) else b"")
+            + ast.unparse(node).encode().replace(b"\n", newline)
+            + newline
+            for node in new_nodes
+        )
+        edits.append((position, position, new_code))
+    chunks = []
+    position = 0
+    for start, end, new_code in sorted(edits, key=lambda edit: edit[:2]):
+        chunks += [source[position:start], new_code]
+        position = end
+    chunks.append(source[position:])
+    return b"".join(chunks).decode()
+
+
+def parse_undataclass_options(options):
+    """
+    Return dictionary of undataclass options (with defaults filled in).
+
+    Options:
+    splice -- only rewrite dataclasses, leaving all other code unchanged
+    fast_compare -- generate __eq__, __lt__ & __hash__ that avoid tuples
+    fast_frozen_init -- generate frozen __init__ methods that avoid calling
+        object.__setattr__ (from scratch) for every field
+    cache_hash -- store the __hash__ of frozen instances after first use
+    auto_slots -- add __slots__ to dataclasses when that looks safe (warning
+        with UndataclassWarning about each class that's left without them)
+    tuple_backed -- make frozen dataclasses tuple subclasses when that looks
+        safe (warning with UndataclassWarning about each one that isn't)
+    replace -- generate __replace__ methods (used by copy.replace on Python
+        3.13+) that work like dataclasses.replace
+    asdict_methods -- generate _asdict & _astuple methods even in modules
+        that don't call dataclasses.asdict or astuple (so other modules can)
+    field_table -- add a __field_table__ attribute (like dataclasses.fields)
+        to classes even in modules that don't call dataclasses.fields
+    shared_runtime -- name of a module (with the SHARED_RUNTIME code) to
+        import generic methods like __repr__ & __eq__ from instead of
+        generating them for every class (None to generate them all)
+    annotations -- "keep" annotations in generated methods, make all of
+        the module's annotations "lazy" (by importing annotations from
+        __future__), or "strip" them from converted classes (see
+        undataclass_stub for keeping them in a stub file instead)
+    """
+    defaults = {
+        "splice": False,
+        "fast_compare": False,
+        "fast_frozen_init": False,
+        "cache_hash": False,
+        "auto_slots": False,
+        "tuple_backed": False,
+        "replace": False,
+        "asdict_methods": False,
+        "field_table": False,
+        "shared_runtime": None,
+        "annotations": "keep",
+    }
+    if unknown := options.keys() - defaults.keys():
+        raise TypeError(f"Unknown undataclass option(s): {sorted(unknown)}")
+    if options.get("annotations", "keep") not in ANNOTATION_MODES:
+        raise ValueError(
+            f"annotations must be one of {ANNOTATION_MODES}, "
+            f"not {options['annotations']!r}"
+        )
+    return defaults | options
+
+
+def might_contain_dataclass(source):
+    """
+    Return False if the given source (str or bytes) can't use dataclasses.
+
+    Every dataclass decorator & dataclasses import mentions "dataclass", so
+    a substring search can rule out most files without parsing them.
+    """
+    if isinstance(source, bytes):
+        return b"dataclass" in source
+    return "dataclass" in source
+
+
+def contains_dataclass(source):
+    """Return True if the given source has any classes to undataclass."""
+    if not might_contain_dataclass(source):
+        return False
+    return any(
+        isinstance(node, ast.ClassDef)
+        and any(is_dataclass_decorator(n) for n in node.decorator_list)
+        for node in ast.parse(source).body
+    )
+
+
+def undataclass(code, index=None, path=None, **options):
+    """
+    Return version of the given code with each dataclass undataclassed.
+
+    Code that never mentions dataclasses is returned as-is (without parsing).
+    Fields of dataclasses imported from other modules are looked up in
+    index (a DataclassIndex) if given, with path as the code's file path
+    (used to resolve relative imports).
+    See parse_undataclass_options for the available keyword options.
+    """
+    new_code, _ = undataclass_with_stats(code, index, path, **options)
+    return new_code
+
+
+def undataclass_with_stats(code, index=None, path=None, **options):
+    """
+    Return (new code, UndataclassStats) tuple for the given code.
+
+    This works just like undataclass, but also times each conversion phase
+    and counts the classes, fields, and generated methods.
+    """
+    stats = UndataclassStats()
+    options = parse_undataclass_options(options)
+    if not might_contain_dataclass(code):
+        stats.skipped_files += 1
+        return code, stats
+    with stats.phase("total"):
+        new_code = convert_code(code, options, stats, index, path)
+    stats.files += 1
+    return new_code, stats
+
+
+def convert_code(code, options, stats, index=None, path=None):
+    """Return undataclassed code, recording timings & counts in stats."""
+    with stats.phase("parse"):
+        nodes = ast.parse(code).body
+    resolve_base = None
+    if index is not None:
+        resolve_base = index.base_resolver(nodes, path, stats)
+    new_nodes, removed_nodes, updated_nodes, inserted_nodes = (
+        undataclass_nodes(nodes, options, stats, resolve_base=resolve_base)
+    )
+    if options["splice"]:
+        with stats.phase("splice"):
+            return splice_changes(
+                code,
+                removed_nodes,
+                updated_nodes,
+                inserted_nodes,
+            )
+    with stats.phase("unparse"):
+        return ast.unparse(new_nodes)
+
+
+def dotted_name(node):
+    """Return "name" or "module.name" for Name & Attribute nodes (or None)."""
+    match node:
+        case ast.Name(id=name):
+            return name
+        case ast.Attribute(value=ast.Name(id=module), attr=name):
+            return f"{module}.{name}"
+        case _:
+            return None
+
+
+def dataclass_helpers(nodes):
+    """
+    Return dict of names for the dataclasses helpers that can be rewritten.
+
+    Names are the local names of the dataclasses asdict, astuple & fields
+    functions (like "asdict" or "dataclasses.asdict") and map to the helper
+    name.
+    """
+    helpers = {}
+    for node in nodes:
+        match node:
+            case ast.ImportFrom(module="dataclasses", names=aliases):
+                for alias in aliases:
+                    if alias.name in REWRITTEN_HELPERS:
+                        helpers[alias.asname or alias.name] = alias.name
+            case ast.Import(names=aliases):
+                for alias in aliases:
+                    if alias.name == "dataclasses":
+                        module = alias.asname or alias.name
+                        for name in REWRITTEN_HELPERS:
+                            helpers[f"{module}.{name}"] = name
+    return helpers
+
+
+def rewrite_helper_calls(node, helpers):
+    """
+    Rewrite asdict, astuple & fields calls within the given node in place.
+
+    Calls like asdict(obj) become obj._asdict() method calls and fields(obj)
+    becomes obj.__field_table__ (helpers is a dict from dataclass_helpers).
+    An UndataclassWarning is shown for any other use of these helpers (like
+    a dict_factory argument).
+    """
+    class Rewriter(ast.NodeTransformer):
+        def visit_Call(self, node):
+            name = helpers.get(dotted_name(node.func))
+            match node:
+                case ast.Call(args=[argument], keywords=[]) if name and (
+                    not isinstance(argument, ast.Starred)
+                ):
+                    argument = self.visit(argument)
+                    if name == "fields":
+                        new_node = ast.Attribute(
+                            argument,
+                            "__field_table__",
+                            ast.Load(),
+                        )
+                    else:
+                        new_node = make_call(
+                            ast.Attribute(argument, f"_{name}", ast.Load()),
+                        )
+                    return ast.copy_location(new_node, node)
+            return self.generic_visit(node)
+
+        def visit_Name(self, node):
+            if isinstance(node.ctx, ast.Load):
+                self.warn_about(node)
+            return node
+
+        def visit_Attribute(self, node):
+            if not self.warn_about(node):
+                self.generic_visit(node)
+            return node
+
+        def warn_about(self, node):
+            if dotted_name(node) not in helpers:
+                return False
+            warnings.warn(
+                f"can't rewrite {dotted_name(node)} on line {node.lineno} "
+                "(only calls with one argument are rewritten)",
+                UndataclassWarning,
+            )
+            return True
+
+    Rewriter().visit(node)
+
+
+def undataclass_nodes(nodes, options, stats, copy=False, resolve_base=None):
+    """
+    Undataclass the given top-level nodes of a module.
+
+    Returns a (new_nodes, removed_nodes, updated_nodes, inserted_nodes) tuple:
+    new_nodes -- list of nodes for the new module
+    removed_nodes -- list of dataclasses import nodes that were removed
+    updated_nodes -- dictionary mapping updated nodes to their first line
+    inserted_nodes -- list of nodes added to new_nodes (the __future__ &
+        shared runtime imports and _asdict_value & _astuple_value
+        functions) with the line numbers they should be inserted at (if
+        known)
+
+    If copy is True, updated nodes are copied before they're changed.
+    Imported bases are resolved with resolve_base (see update_dataclass_node).
+    Calls to dataclasses.asdict, astuple & fields are rewritten to use the
+    generated _asdict & _astuple methods and __field_table__ attributes
+    (which modules that use them always get).
+    """
     new_nodes = []
-    need_total_ordering = False
+    removed_nodes = []
+    updated_nodes = {}
+    need_value_converters = False
+    need_field_table = False
+    need_runtime = False
+    need_future_annotations = False
     dataclass_fields_found = {}
-    for node in nodes:
+    helpers = dataclass_helpers(nodes)
+    helpers_used = [
+        {
+            helpers[name]
+            for subnode in ast.walk(node)
+            if (name := dotted_name(subnode)) in helpers
+        } if helpers else set()
+        for node in nodes
+    ]
+    all_helpers_used = set().union(*helpers_used)
+    if all_helpers_used & {*CONVERSION_HELPERS}:
+        options = options | {"asdict_methods": True}
+    if "fields" in all_helpers_used:
+        options = options | {"field_table": True}
+    for node, node_uses_helpers in zip(nodes, helpers_used):
         match node:
             case ast.ImportFrom(module="dataclasses"):
+                removed_nodes.append(node)
                 continue  # Don't import dataclasses anymore
             case ast.Import(names=[ast.alias("dataclasses")]):
+                removed_nodes.append(node)
                 continue  # Don't import dataclasses anymore
             case ast.ClassDef() if any(
                 is_dataclass_decorator(n)
                 for n in node.decorator_list
             ):
-                need_total_ordering |= update_dataclass_node(
+                if copy:
+                    node = deepcopy(node)
+                if node_uses_helpers:
+                    rewrite_helper_calls(node, helpers)
+                updated_nodes[node] = node_start_line(node)
+                need_value_converters |= options["asdict_methods"]
+                need_field_table |= options["field_table"]
+                need_future_annotations |= options["annotations"] == "lazy"
+                update_dataclass_node(
                     node,
                     dataclass_fields_found,
+                    options,
+                    nodes,
+                    stats,
+                    resolve_base,
+                )
+                need_runtime |= bool(options["shared_runtime"]) and (
+                    any(
+                        isinstance(subnode, ast.Name)
+                        and subnode.id == RUNTIME_NAME
+                        for subnode in ast.walk(node)
+                    )
                 )
                 new_nodes.append(node)
+            case _ if node_uses_helpers:
+                if copy:
+                    node = deepcopy(node)
+                rewrite_helper_calls(node, helpers)
+                updated_nodes[node] = node_start_line(node)
+                new_nodes.append(node)
             case _:
                 new_nodes.append(node)
-    if need_total_ordering:
+    future_imports = []
+    if need_future_annotations and not any(
+        isinstance(node, ast.ImportFrom)
+        and node.module == "__future__"
+        and any(alias.name == "annotations" for alias in node.names)
+        for node in nodes
+    ):
+        future_imports.append(ast.ImportFrom(
+            "__future__",
+            [ast.alias("annotations")],
+            level=0,
+        ))
+    inserted_nodes = []
+    if need_runtime:
+        inserted_nodes.append(ast.Import([
+            ast.alias(options["shared_runtime"], RUNTIME_NAME),
+        ]))
+    if need_field_table:
+        inserted_nodes += ast.parse(FIELD_TABLE_HELPERS).body
+    if need_value_converters:
+        inserted_nodes += [
+            make_value_converter(kind)
+            for kind in CONVERSION_HELPERS
+        ]
+    if future_imports:
+        match new_nodes:
+            case [ast.Expr(value=ast.Constant(value=str())), node, *_]:
+                future_index = 1
+            case [node, *_]:
+                future_index = 0
+        future_lineno = updated_nodes.get(node) or node_start_line(node)
+    if inserted_nodes:
         for i, node in enumerate(new_nodes):
             match node:
                 case ast.Expr(value=ast.Constant()):
@@ -436,20 +2274,1536 @@ def undataclass(code):
                     continue
                 case _:
                     break
-        new_nodes.insert(
-            i,
-            *ast.parse("from functools import total_ordering").body,
+        if i and new_nodes[i-1].end_lineno:
+            lineno = new_nodes[i-1].end_lineno + 1
+        else:
+            lineno = updated_nodes.get(node) or node_start_line(node)
+        set_line_numbers(inserted_nodes, lineno)
+        new_nodes[i:i] = inserted_nodes
+    if future_imports:
+        set_line_numbers(future_imports, future_lineno)
+        new_nodes[future_index:future_index] = future_imports
+    inserted_nodes = [*future_imports, *inserted_nodes]
+    return new_nodes, removed_nodes, updated_nodes, inserted_nodes
+
+
+def set_line_numbers(nodes, lineno):
+    """Put the given nodes (and their subnodes) on line lineno (if known)."""
+    if not lineno:
+        return
+    for node in nodes:
+        for subnode in ast.walk(node):
+            if "lineno" in subnode._attributes:
+                subnode.lineno = subnode.end_lineno = lineno
+                subnode.col_offset = subnode.end_col_offset = 0
+
+
+def undataclass_ast(
+    tree,
+    in_place=False,
+    stats=None,
+    index=None,
+    path=None,
+    **options,
+):
+    """
+    Return version of the given ast.Module (or list of nodes) undataclassed.
+
+    Unless in_place is True, the given tree isn't modified: dataclasses are
+    copied before they're updated and all other nodes are shared with the
+    returned tree.  New nodes get the line numbers of the classes they were
+    added to, so the result can be compiled as-is.  If stats is given (as
+    an UndataclassStats object) the conversion statistics are added to it.
+    The index and path arguments work just as they do for undataclass.
+    See parse_undataclass_options for the available keyword options (the
+    splice option needs source code, so it isn't supported here).
+    """
+    options = parse_undataclass_options(options)
+    if options["splice"]:
+        raise TypeError("The splice option requires source code")
+    stats = stats or UndataclassStats()
+    is_module = isinstance(tree, ast.Module)
+    with stats.phase("total"):
+        nodes = tree.body if is_module else list(tree)
+        resolve_base = None
+        if index is not None:
+            resolve_base = index.base_resolver(nodes, path, stats)
+        new_nodes, _, updated_nodes, inserted_nodes = undataclass_nodes(
+            nodes,
+            options,
+            stats,
+            copy=not in_place,
+            resolve_base=resolve_base,
+        )
+        for node in [*updated_nodes, *inserted_nodes]:
+            ast.fix_missing_locations(node)
+    stats.files += 1
+    if is_module and in_place:
+        tree.body = new_nodes
+        return tree
+    elif is_module:
+        return ast.Module(new_nodes, list(tree.type_ignores))
+    elif in_place:
+        tree[:] = new_nodes
+        return tree
+    return new_nodes
+
+
+def undataclass_stub(code, index=None, path=None, **options):
+    """
+    Return .pyi stub code with the typed signatures of the undataclassed code.
+
+    Converted classes declare each of their fields (with its type) and all
+    functions (including generated methods) have "..." as their body, so
+    type checkers can use the stub when the converted code's annotations
+    are lazy or stripped (see the annotations option).  The index, path,
+    and options work just as they do for undataclass (except that
+    annotations are always kept and methods are never shared).
+    """
+    options = parse_undataclass_options(options) | {
+        "splice": False,
+        "shared_runtime": None,
+        "annotations": "keep",
+    }
+    nodes = ast.parse(code).body
+    resolve_base = None
+    if index is not None:
+        resolve_base = index.base_resolver(nodes, path, UndataclassStats())
+    declarations = {
+        node.name: [
+            ast.AnnAssign(field.target, field.annotation, None, simple=1)
+            for field in node.body
+            if isinstance(field, ast.AnnAssign)
+            and not is_class_var(field.annotation)
+            and not is_init_var(field.annotation)
+            and not is_kw_only_marker(field.annotation)
+        ]
+        for node in nodes
+        if isinstance(node, ast.ClassDef)
+        and any(is_dataclass_decorator(n) for n in node.decorator_list)
+    }
+    new_nodes, *_ = undataclass_nodes(
+        nodes,
+        options,
+        UndataclassStats(),
+        resolve_base=resolve_base,
+    )
+    return ast.unparse(make_stub_nodes(new_nodes, declarations))
+
+
+def make_stub_nodes(nodes, declarations=None):
+    """
+    Return stub versions of the given nodes.
+
+    Functions have "..." as their body and as their default values.
+
+    Classes named in the declarations dictionary start with its list of
+    field declarations (except for fields with methods of the same name,
+    like the properties of tuple-backed classes).  Only imports,
+    assignments, functions, classes, and if statements are kept.
+    """
+    declarations = declarations or {}
+    stub_nodes = []
+    for node in nodes:
+        match node:
+            case ast.Import() | ast.ImportFrom() | ast.Assign():
+                stub_nodes.append(node)
+            case ast.AnnAssign(target=target, annotation=annotation):
+                stub_nodes.append(ast.AnnAssign(
+                    target,
+                    annotation,
+                    ast.Constant(...) if node.value else None,
+                    simple=node.simple,
+                ))
+            case ast.FunctionDef() | ast.AsyncFunctionDef():
+                node = copy(node)
+                node.args = copy(node.args)
+                node.args.defaults = [
+                    ast.Constant(...)
+                    for _ in node.args.defaults
+                ]
+                node.args.kw_defaults = [
+                    default and ast.Constant(...)
+                    for default in node.args.kw_defaults
+                ]
+                node.body = [ast.Expr(ast.Constant(...))]
+                stub_nodes.append(node)
+            case ast.ClassDef(name=name, body=body):
+                method_names = {
+                    n.name
+                    for n in body
+                    if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))
+                }
+                node = copy(node)
+                node.body = [
+                    *(
+                        declaration
+                        for declaration in declarations.get(name, [])
+                        if declaration.target.id not in method_names
+                    ),
+                    *make_stub_nodes(body),
+                ] or [ast.Expr(ast.Constant(...))]
+                stub_nodes.append(node)
+            case ast.If(body=body, orelse=orelse):
+                node = copy(node)
+                node.body = make_stub_nodes(body) or [ast.Pass()]
+                node.orelse = make_stub_nodes(orelse)
+                stub_nodes.append(node)
+    return stub_nodes
+
+
+def undataclass_many(
+    sources,
+    jobs=1,
+    ordered=True,
+    max_pending=None,
+    executor=None,
+    **options,
+):
+    """
+    Undataclass each (key, code) pair, lazily yielding (key, result) pairs.
+
+    Each result is either the new code or the exception raised while
+    converting that code.  When jobs is greater than 1 (or an executor is
+    given) conversions run in a process pool (or the given executor) with at
+    most max_pending conversions (jobs * 4 by default) in flight, so sources
+    are only consumed as quickly as results are.  If ordered is False,
+    results are yielded as soon as they're ready.
+    See parse_undataclass_options for the available keyword options.
+    """
+    options = parse_undataclass_options(options)
+    if jobs <= 1 and executor is None:
+        for key, code in sources:
+            try:
+                yield key, undataclass(code, **options)
+            except Exception as error:
+                yield key, error
+        return
+    from concurrent.futures import (
+        FIRST_COMPLETED,
+        ProcessPoolExecutor,
+        wait,
+    )
+    max_pending = max_pending or max(jobs, 1) * 4
+    convert = partial(undataclass, **options)
+    pool = executor or ProcessPoolExecutor(jobs)
+    pending = {}  # Future: key (in submission order)
+
+    def finished():
+        if ordered:
+            return [next(iter(pending))]
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        return done
+
+    try:
+        for key, code in sources:
+            pending[pool.submit(convert, code)] = key
+            while len(pending) >= max_pending:
+                for future in finished():
+                    yield pending.pop(future), future_outcome(future)
+        while pending:
+            for future in finished():
+                yield pending.pop(future), future_outcome(future)
+    finally:
+        for future in pending:
+            future.cancel()
+        if executor is None:
+            pool.shutdown()
+
+
+async def undataclass_many_async(
+    sources,
+    jobs=1,
+    ordered=True,
+    max_pending=None,
+    executor=None,
+    **options,
+):
+    """
+    Asynchronously yield (key, result) pairs for each (key, code) pair.
+
+    This works like undataclass_many, but conversions run in an executor
+    so the event loop isn't blocked (with jobs <= 1 and no executor, the
+    event loop's default thread pool is used).  The sources may be an
+    iterable or an async iterable.
+    """
+    import asyncio
+    options = parse_undataclass_options(options)
+    if not hasattr(sources, "__aiter__"):
+        sources = async_iter(sources)
+    max_pending = max_pending or max(jobs, 1) * 4
+    convert = partial(undataclass, **options)
+    pool = executor
+    if pool is None and jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(jobs)
+    loop = asyncio.get_running_loop()
+    pending = {}  # Future: key (in submission order)
+
+    async def finished():
+        if ordered:
+            done = [next(iter(pending))]
+            await asyncio.wait(done)
+            return done
+        done, _ = await asyncio.wait(
+            pending,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        return done
+
+    try:
+        async for key, code in sources:
+            pending[loop.run_in_executor(pool, convert, code)] = key
+            while len(pending) >= max_pending:
+                for future in await finished():
+                    yield pending.pop(future), future_outcome(future)
+        while pending:
+            for future in await finished():
+                yield pending.pop(future), future_outcome(future)
+    finally:
+        for future in pending:
+            future.cancel()
+        if pool is not None and executor is None:
+            # Waiting for the workers to exit would block the event loop
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def async_iter(iterable):
+    """
+    Yield each item from the given (regular) iterable.
+
+    Items are pulled in the event loop's default executor, since producing
+    them (e.g. reading files) may block.
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    iterator = await loop.run_in_executor(None, iter, iterable)
+    exhausted = object()
+    while True:
+        item = await loop.run_in_executor(None, next, iterator, exhausted)
+        if item is exhausted:
+            return
+        yield item
+
+
+def future_outcome(future):
+    """Return result of given finished future, or the exception it raised."""
+    try:
+        return future.result()
+    except Exception as error:
+        return error
+
+
+def import_bindings(nodes, package=None):
+    """
+    Return dictionary of the names bound by the given top-level import nodes.
+
+    Each name maps to a (module, attribute) pair, where attribute is None
+    for names bound to modules.  Relative imports are resolved against the
+    given package name (and skipped when package is None).
+    """
+    bindings = {}
+    for node in nodes:
+        match node:
+            case ast.Import(names=aliases):
+                for alias in aliases:
+                    if alias.asname:
+                        bindings[alias.asname] = (alias.name, None)
+                    else:
+                        name = alias.name.partition(".")[0]
+                        bindings[name] = (name, None)
+            case ast.ImportFrom(module=module, names=aliases, level=level):
+                if level:
+                    if package is None:
+                        continue
+                    try:
+                        module = resolve_name(
+                            "." * level + (module or ""),
+                            package,
+                        )
+                    except ImportError:
+                        continue
+                for alias in aliases:
+                    if alias.name != "*":
+                        bindings[alias.asname or alias.name] = (
+                            module,
+                            alias.name,
+                        )
+    return bindings
+
+
+def import_target(node, bindings):
+    """Return (module, name) pair for the imported class node refers to."""
+    attributes = []
+    while isinstance(node, ast.Attribute):
+        attributes.insert(0, node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name) or node.id not in bindings:
+        return None
+    module, name = bindings[node.id]
+    if name is not None:
+        if not attributes:
+            return (module, name)
+        module = f"{module}.{name}"  # Assume a submodule was imported
+    elif not attributes:
+        return None  # A module isn't a class
+    *submodules, name = attributes
+    return (".".join([module, *submodules]), name)
+
+
+def defined_names(nodes):
+    """Return set of names assigned by the given top-level module nodes."""
+    names = set()
+    for node in nodes:
+        match node:
+            case ast.Import(names=aliases) | ast.ImportFrom(names=aliases):
+                names.update(
+                    alias.asname or alias.name.partition(".")[0]
+                    for alias in aliases
+                )
+            case ast.FunctionDef(name=name) | ast.ClassDef(name=name):
+                names.add(name)
+            case ast.AsyncFunctionDef(name=name):
+                names.add(name)
+            case ast.Assign(targets=targets):
+                names.update(
+                    subnode.id
+                    for target in targets
+                    for subnode in ast.walk(target)
+                    if isinstance(subnode, ast.Name)
+                )
+            case ast.AnnAssign(target=ast.Name(id=name)):
+                names.add(name)
+    return names
+
+
+def field_layout(field):
+    """Return JSON-serializable dictionary for given dataclasses.Field."""
+    layout = {"name": field.name, "type": ast.unparse(field.type)}
+    for name in ("default", "default_factory"):
+        value = getattr(field, name)
+        if value is not dataclasses.MISSING:
+            layout[name] = ast.unparse(value)
+    for name in ("init", "repr", "hash", "compare"):
+        layout[name] = getattr(field, name)
+    layout["kw_only"] = field.kw_only is True
+    return layout
+
+
+def layout_field(layout):
+    """Return dataclasses.Field for given field_layout dictionary."""
+    field = dataclasses.field(
+        **{
+            name: ast.parse(layout[name], mode="eval").body
+            for name in ("default", "default_factory")
+            if name in layout
+        },
+        init=layout["init"],
+        repr=layout["repr"],
+        hash=layout["hash"],
+        compare=layout["compare"],
+        kw_only=True if layout["kw_only"] else dataclasses.MISSING,
+    )
+    field.name = layout["name"]
+    field.type = ast.parse(layout["type"], mode="eval").body
+    return field
+
+
+def module_layout(nodes, module, package):
+    """
+    Return JSON-serializable dictionary describing the given module nodes.
+
+    This records the module's imports, and the options, own fields, and
+    (module, name) pairs of dataclass bases for each of its dataclasses.
+    Inherited fields aren't included, so the layout only depends on this
+    module's code.
+    """
+    bindings = import_bindings(nodes, package)
+    classes = {}
+    for node in nodes:
+        match node:
+            case ast.ClassDef() if any(
+                is_dataclass_decorator(n)
+                for n in node.decorator_list
+            ):
+                [options] = [
+                    parse_decorator_options(n)
+                    for n in node.decorator_list
+                    if is_dataclass_decorator(n)
+                ]
+                bases = []
+                for base in node.bases:
+                    match base:
+                        case ast.Name(id=name) if name in classes:
+                            bases.append((module, name))
+                        case _ if target := import_target(base, bindings):
+                            bases.append(target)
+                classes[node.name] = {
+                    "kw_only": options["kw_only"],
+                    "bases": bases,
+                    "fields": [
+                        field_layout(make_field(subnode))
+                        for subnode in node.body
+                        if isinstance(subnode, ast.AnnAssign)
+                        and not is_class_var(subnode.annotation)
+                    ],
+                }
+    return {"imports": bindings, "classes": classes}
+
+
+class DataclassIndex:
+    """
+    Lazily-built index of the dataclass fields defined in a project.
+
+    Modules are looked up (by name) within the given root directories, like
+    sys.path entries.  Each module is parsed at most once, only when one of
+    its classes is first looked up.  If cache_dir is given, module layouts
+    are also stored there, keyed by a hash of each module's source code
+    (see module_layout), so later runs only re-parse modules that changed.
+    """
+
+    def __init__(self, roots=(), cache_dir=None):
+        self.roots = [Path(root).resolve() for root in roots]
+        self.cache_dir = cache_dir
+        self.layouts = {}  # Module name: module layout (or None)
+        self.parsed_modules = 0
+
+    def module_name(self, path):
+        """
+        Return (module name, package name) tuple for the given file path.
+
+        The root directory is found by walking up through parent directories
+        with __init__.py files, and it's added to the roots if needed.
+        """
+        path = Path(path).resolve()
+        names = [] if path.name == "__init__.py" else [path.stem]
+        directory = path.parent
+        while (directory / "__init__.py").is_file():
+            names.insert(0, directory.name)
+            directory = directory.parent
+        if directory not in self.roots:
+            self.roots.append(directory)
+            self.layouts = {  # Modules not found before may be found now
+                name: layout
+                for name, layout in self.layouts.items()
+                if layout is not None
+            }
+        module = ".".join(names)
+        if path.name == "__init__.py":
+            return module, module
+        return module, module.rpartition(".")[0]
+
+    def preload(self, paths):
+        """
+        Load the layouts of the modules in the given files right away.
+
+        Files are usually converted in place after this, so later lookups
+        never see a module that has already been rewritten.
+        """
+        for path in paths:
+            try:
+                source = Path(path).read_bytes()
+            except OSError:
+                continue
+            if might_contain_dataclass(source):
+                self.layout(self.module_name(path)[0])
+
+    def find_module(self, module):
+        """Return (path, package name) for given module name (or None)."""
+        for root in self.roots:
+            path = root.joinpath(*module.split("."))
+            if (path / "__init__.py").is_file():
+                return path / "__init__.py", module
+            path = path.with_name(f"{path.name}.py")
+            if path.is_file():
+                return path, module.rpartition(".")[0]
+        return None
+
+    def layout(self, module):
+        """Return layout for given module name (or None if it's not found)."""
+        if module not in self.layouts:
+            self.layouts[module] = self.load_layout(module)
+        return self.layouts[module]
+
+    def load_layout(self, module):
+        """Return layout of given module from the cache or by parsing it."""
+        import json
+        found = self.find_module(module)
+        if found is None:
+            return None
+        path, package = found
+        try:
+            source = path.read_bytes()
+        except OSError:
+            return None
+        key = hashlib.sha256(tool_fingerprint().encode())
+        key.update(f"index:{module}\0".encode())
+        key.update(source)
+        key = key.hexdigest()
+        if self.cache_dir is not None:
+            cached = read_cache(self.cache_dir, key)
+            if cached is not None:
+                return json.loads(cached)
+        self.parsed_modules += 1
+        try:
+            nodes = ast.parse(decode_source(source)).body
+        except (SyntaxError, UnicodeDecodeError):
+            return None
+        layout = module_layout(nodes, module, package)
+        if self.cache_dir is not None:
+            write_cache(self.cache_dir, key, json.dumps(layout))
+        return layout
+
+    def class_fields(self, module, name, seen=frozenset()):
+        """
+        Return list of fields for the given dataclass (or None).
+
+        Fields are inherited from bases just as they would be for dataclasses
+        in the same module.  New Field objects are returned for each call.
+        """
+        if (module, name) in seen:
+            return None  # Import cycle
+        seen |= {(module, name)}
+        layout = self.layout(module)
+        if layout is None:
+            return None
+        if name not in layout["classes"]:
+            if name not in layout["imports"]:
+                return None
+            module, name = layout["imports"][name]
+            if name is None:
+                return None
+            return self.class_fields(module, name, seen)
+        class_layout = layout["classes"][name]
+        base_fields = []
+        for base_module, base_name in reversed(class_layout["bases"]):
+            base_fields += (
+                self.class_fields(base_module, base_name, seen) or []
+            )
+        fields = merge_fields([
+            *base_fields,
+            *map(layout_field, class_layout["fields"]),
+        ])
+        process_kw_only_fields(class_layout, fields)
+        process_init_vars(fields)
+        return fields
+
+    def base_resolver(self, nodes, path=None, stats=None):
+        """
+        Return function that looks up fields for the base class nodes of the
+        given module nodes (see update_dataclass_node).
+
+        The path of the module is used to resolve relative imports.  Lookups
+        are counted in stats (an UndataclassStats object) if given.
+        Inherited types become string annotations, since the names they use
+        may not be imported in the subclass's module.
+        """
+        package = None if path is None else self.module_name(path)[1]
+        bindings = import_bindings(nodes, package)
+        known_names = defined_names(nodes) | set(vars(builtins))
+
+        def resolve(node):
+            target = import_target(node, bindings)
+            if target is None:
+                return None
+            if stats is not None:
+                stats.imported_bases += 1
+            fields = self.class_fields(*target)
+            for field in fields or []:
+                if not isinstance(field.type, ast.Constant):
+                    field.type = ast.Constant(ast.unparse(field.type))
+                for name in ("default", "default_factory"):
+                    value = getattr(field, name)
+                    if value is dataclasses.MISSING:
+                        continue
+                    missing = sorted({
+                        subnode.id
+                        for subnode in ast.walk(value)
+                        if isinstance(subnode, ast.Name)
+                    } - known_names)
+                    if missing:
+                        warnings.warn(
+                            f"{name} of {field.name} (inherited from "
+                            f"{ast.unparse(node)}) uses undefined names: "
+                            + ", ".join(missing),
+                            UndataclassWarning,
+                        )
+            return fields
+
+        return resolve
+
+
+def default_cache_dir():
+    """Return the default directory for cached conversion results."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "undataclass"
+
+
+@cache
+def tool_fingerprint():
+    """Return hash of this module's code (so changes invalidate caches)."""
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+def cache_key(source, options, indexed=False):
+    """
+    Return cache key for given source bytes and undataclass options.
+
+    Results converted with a DataclassIndex (if indexed is True) get
+    different keys than those converted without one.
+    """
+    key = hashlib.sha256(tool_fingerprint().encode())
+    options = parse_undataclass_options(options)
+    key.update(repr(sorted(options.items())).encode())
+    key.update(b"indexed" if indexed else b"")
+    key.update(source)
+    return key.hexdigest()
+
+
+def cache_path(cache_dir, key):
+    """Return path of the cache entry for given key."""
+    return Path(cache_dir, key[:2], f"{key[2:]}{CACHE_SUFFIX}")
+
+
+def read_cache(cache_dir, key):
+    """Return cached result for given key (or None) & mark it recently used."""
+    path = cache_path(cache_dir, key)
+    try:
+        result = path.read_text(encoding="utf-8")
+        os.utime(path)
+    except OSError:
+        return None
+    return result
+
+
+def write_cache(cache_dir, key, result):
+    """Store result for given key, ignoring unwritable cache directories."""
+    path = cache_path(cache_dir, key)
+    temp_path = path.with_name(f"{key[2:]}.{os.getpid()}.tmp{CACHE_SUFFIX}")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path.write_text(result, encoding="utf-8")
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+
+def prune_cache(cache_dir, max_size=CACHE_MAX_SIZE):
+    """
+    Delete least recently used cache entries until under max_size bytes.
+
+    Only files written by write_cache (ending in CACHE_SUFFIX) are counted
+    or deleted, so other files in cache_dir are left alone.
+    """
+    entries = []
+    for path in Path(cache_dir).glob(f"??/*{CACHE_SUFFIX}"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        path.unlink(missing_ok=True)
+        total_size -= size
+
+
+def cached_undataclass(
+    source,
+    cache_dir=None,
+    stats=None,
+    index=None,
+    path=None,
+    **options,
+):
+    """
+    Return undataclass result for given source bytes, using on-disk cache.
+
+    Cache hits return the stored result without parsing the source at all.
+    If cache_dir is None, no cache is used.  If stats is given (as an
+    UndataclassStats object) the conversion statistics are added to it.
+    Results that used the index (see undataclass) depend on other modules,
+    so they're never cached.  UndataclassWarnings are stored along with
+    each result and warned again on cache hits.
+    """
+    new_stats = UndataclassStats()
+
+    def convert():
+        if stats is None and index is None:
+            return undataclass(decode_source(source), **options)
+        result, file_stats = undataclass_with_stats(
+            decode_source(source),
+            index,
+            path,
+            **options,
+        )
+        new_stats.merge(file_stats)
+        if stats is not None:
+            stats.merge(file_stats)
+        return result
+    if cache_dir is None or not might_contain_dataclass(source):
+        return convert()
+    import json
+    key = cache_key(source, options, indexed=index is not None)
+    entry = read_cache(cache_dir, key)
+    if entry is not None:
+        entry = json.loads(entry)
+        for message in entry["warnings"]:
+            warnings.warn(message, UndataclassWarning)
+        if stats is not None:
+            stats.cached_files += 1
+        return entry["code"]
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", UndataclassWarning)
+        result = convert()
+    for warning in caught:
+        warnings.warn(warning.message)
+    if not new_stats.imported_bases:
+        write_cache(cache_dir, key, json.dumps({
+            "code": result,
+            "warnings": [
+                str(warning.message)
+                for warning in caught
+                if issubclass(warning.category, UndataclassWarning)
+            ],
+        }))
+    return result
+
+
+def pyc_header(source_stats):
+    """Return timestamp-based .pyc header for the given source path stats."""
+    return b"".join([
+        MAGIC_NUMBER,
+        (0).to_bytes(4, "little"),
+        (int(source_stats["mtime"]) & 0xFFFFFFFF).to_bytes(4, "little"),
+        (source_stats["size"] & 0xFFFFFFFF).to_bytes(4, "little"),
+    ])
+
+
+class UndataclassLoader(SourceFileLoader):
+    """
+    Source file loader that runs undataclass() on modules as they're loaded.
+
+    Compiled code is cached in __pycache__ like normal .pyc files, but with
+    an optimization tag that changes along with this tool & its options.
+    """
+
+    def __init__(self, fullname, path, options):
+        super().__init__(fullname, path)
+        self.options = options
+
+    def bytecode_path(self, source_path):
+        """Return path to the cached bytecode for the given source path."""
+        tag = f"undataclass{cache_key(b'', self.options)[:16]}"
+        return cache_from_source(source_path, optimization=tag)
+
+    def source_to_code(self, data, path, *, _optimize=-1):
+        code = undataclass(decode_source(data), **self.options)
+        return compile(
+            code,
+            path,
+            "exec",
+            dont_inherit=True,
+            optimize=_optimize,
+        )
+
+    def get_code(self, fullname):
+        source_path = self.get_filename(fullname)
+        bytecode_path = self.bytecode_path(source_path)
+        header = pyc_header(self.path_stats(source_path))
+        try:
+            data = self.get_data(bytecode_path)
+        except OSError:
+            pass
+        else:
+            if data[:len(header)] == header:
+                return marshal.loads(memoryview(data)[len(header):])
+        code = self.source_to_code(self.get_data(source_path), source_path)
+        if not sys.dont_write_bytecode:
+            self.set_data(bytecode_path, header + marshal.dumps(code))
+        return code
+
+
+class UndataclassFinder(MetaPathFinder):
+    """Meta path finder that loads the given packages with undataclass."""
+
+    def __init__(self, packages, options):
+        self.packages = tuple(packages)
+        self.options = options
+
+    def find_spec(self, fullname, path=None, target=None):
+        if not any(
+            fullname == package or fullname.startswith(f"{package}.")
+            for package in self.packages
+        ):
+            return None
+        spec = PathFinder.find_spec(fullname, path, target)
+        if spec is None or not isinstance(spec.loader, SourceFileLoader):
+            return None
+        spec.loader = UndataclassLoader(fullname, spec.origin, self.options)
+        spec.cached = spec.loader.bytecode_path(spec.origin)
+        return spec
+
+
+def install_import_hook(packages, **options):
+    """
+    Undataclass the given packages (and their submodules) when imported.
+
+    Returns the installed finder (remove it from sys.meta_path to uninstall).
+    """
+    parse_undataclass_options(options)
+    finder = UndataclassFinder(packages, options)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+
+def iter_python_files(paths):
+    """
+    Yield (source, relative) path pairs for the given files/directories/globs.
+
+    Directories are walked recursively for *.py files (skipping hidden and
+    __pycache__ directories) and each file's relative path is relative to the
+    directory it was found in.
+    """
+    for pattern in paths:
+        if has_magic(pattern):
+            matches = sorted(glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for match in matches:
+            path = Path(match)
+            if path.is_dir():
+                for file in sorted(path.rglob("*.py")):
+                    relative = file.relative_to(path)
+                    if not any(
+                        part.startswith(".") or part == "__pycache__"
+                        for part in relative.parts[:-1]
+                    ):
+                        yield file, relative
+            elif path.is_absolute() or ".." in path.parts:
+                yield path, Path(path.name)
+            else:
+                yield path, path
+
+
+@contextmanager
+def reported_warnings(source):
+    """Print warnings raised within this context as "source: message"."""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", UndataclassWarning)
+        yield
+    for warning in caught:
+        print(f"{source}: {warning.message}", file=sys.stderr)
+
+
+def convert_file(
+    source,
+    target,
+    cache_dir=None,
+    index=None,
+    stubs=False,
+    **options,
+):
+    """
+    Undataclass the source file, writing the result to the target file.
+
+    Files without dataclasses are copied as-is (or skipped when in-place).
+    Imported dataclasses are looked up in index (a DataclassIndex) if given.
+    If stubs is True, a .pyi stub (see undataclass_stub) is written next to
+    each converted target file.
+    Return (error, stats) tuple where error is None on success or an error
+    message string on failure and stats is an UndataclassStats object.
+    """
+    stats = UndataclassStats()
+    try:
+        source_code = source.read_bytes()
+        if not might_contain_dataclass(source_code):
+            if source != target:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(source_code)
+            stats.skipped_files += 1
+            return None, stats
+        with reported_warnings(source):
+            new_code = cached_undataclass(
+                source_code,
+                cache_dir,
+                stats,
+                index,
+                source,
+                **options,
+            )
+        if not new_code.endswith("\n"):
+            new_code += "\n"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(new_code, encoding="utf-8")
+        if stubs:
+            stub = undataclass_stub(source_code, index, source, **options)
+            target.with_suffix(".pyi").write_text(
+                stub + "\n",
+                encoding="utf-8",
+            )
+    except Exception as error:
+        return f"{source}: {type(error).__name__}: {error}", stats
+    return None, stats
+
+
+def convert_files(
+    file_pairs,
+    jobs=1,
+    cache_dir=None,
+    stats=None,
+    index=None,
+    stubs=False,
+    **options,
+):
+    """
+    Convert each (source, target) pair, yielding error messages for failures.
+
+    When jobs is greater than 1, files are converted in a process pool
+    (each worker process looks up modules in its own copy of index).
+    Statistics for each file are merged into stats (if given).
+    If stubs is True, .pyi stubs are written next to converted files.
+    """
+    convert = partial(
+        convert_file,
+        cache_dir=cache_dir,
+        index=index,
+        stubs=stubs,
+        **options,
+    )
+    file_pairs = list(file_pairs)
+    if jobs <= 1 or len(file_pairs) <= 1:
+        results = (convert(*pair) for pair in file_pairs)
+        yield from collect_errors(file_pairs, results, stats)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    chunk_size = max(1, min(32, len(file_pairs) // (jobs * 4)))
+    with ProcessPoolExecutor(jobs) as pool:
+        results = pool.map(convert, *zip(*file_pairs), chunksize=chunk_size)
+        yield from collect_errors(file_pairs, results, stats)
+
+
+def collect_errors(file_pairs, results, stats=None):
+    """Yield errors from convert_file results, merging stats (if given)."""
+    for (source, _), (error, file_stats) in zip(file_pairs, results):
+        if stats is not None:
+            stats.merge(file_stats, source=source)
+        if error:
+            yield error
+
+
+def check_files(files):
+    """
+    Print the first of the given files with dataclasses & return exit status.
+
+    Returns 1 if a dataclass was found, 2 if any files could not be checked
+    (reporting them on stderr), and 0 otherwise.
+    """
+    status = 0
+    for source, _ in files:
+        try:
+            found = contains_dataclass(source.read_bytes())
+        except Exception as error:
+            error_name = type(error).__name__
+            print(f"{source}: {error_name}: {error}", file=sys.stderr)
+            status = 2
+            continue
+        if found:
+            print(f"{source}: contains dataclasses")
+            return 1
+    return status
+
+
+def convert_source(source, options):
+    """Return (new code, warning messages) tuple for given source bytes."""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", UndataclassWarning)
+        new_code = undataclass(
+            decode_source(source),
+            **parse_undataclass_options(options),  # No index (or path)
         )
-    return ast.unparse(new_nodes)
+    return new_code, [str(warning.message) for warning in caught]
+
 
+class ServiceBusy(Exception):
+    """Raised when a ConversionService has too many pending conversions."""
+
+
+class ConversionService:
+    """
+    Convert source code for concurrent requests using a pool of processes.
 
-def main():
-    from argparse import ArgumentParser, FileType
-    parser = ArgumentParser()
-    parser.add_argument("code_file", type=FileType("rt"))
-    args = parser.parse_args()
-    print(undataclass(args.code_file.read()))
+    Recent results are kept in a least recently used cache and identical
+    requests that arrive while a conversion is running wait for that same
+    conversion.  At most max_pending conversions run (or wait) at once.
+    """
+
+    def __init__(self, jobs=1, cache_size=1024, max_pending=None):
+        from concurrent.futures import ProcessPoolExecutor
+        self.jobs = jobs
+        self.pool = ProcessPoolExecutor(jobs)
+        self.cache_size = cache_size
+        self.max_pending = max_pending or jobs * 4
+        self.cache = OrderedDict()  # Cache key: (new code, warnings)
+        self.running = {}  # Cache key: Future
+        self.lock = threading.RLock()
+        self.counts = Counter()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def convert(self, source, options, timeout=None):
+        """
+        Return (new code, warning messages) tuple for given source bytes.
+
+        Raises ServiceBusy if too many conversions are already pending and
+        re-raises any exception raised by the conversion itself.
+        """
+        start = perf_counter()
+        try:
+            return self.submit(source, options).result(timeout)
+        except ServiceBusy:
+            raise
+        except Exception:
+            with self.lock:
+                self.counts["errors"] += 1
+            raise
+        finally:
+            with self.lock:
+                self.latencies.append(perf_counter() - start)
+
+    def submit(self, source, options):
+        """Return Future for the (possibly cached or running) conversion."""
+        from concurrent.futures import Future
+        with self.lock:
+            self.counts["requests"] += 1
+            key = cache_key(source, options)
+            if key in self.cache:
+                self.counts["cache_hits"] += 1
+                self.cache.move_to_end(key)
+                future = Future()
+                future.set_result(self.cache[key])
+            elif key in self.running:
+                self.counts["coalesced"] += 1
+                future = self.running[key]
+            elif len(self.running) >= self.max_pending:
+                self.counts["rejected"] += 1
+                raise ServiceBusy(f"{len(self.running)} conversions pending")
+            else:
+                self.counts["cache_misses"] += 1
+                future = self.pool.submit(convert_source, source, options)
+                self.running[key] = future
+                future.add_done_callback(partial(self.finish, key))
+            return future
+
+    def finish(self, key, future):
+        """Cache the result of a finished conversion (unless it failed)."""
+        with self.lock:
+            del self.running[key]
+            if future.cancelled() or future.exception() is not None:
+                return
+            self.cache[key] = future.result()
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def health(self):
+        """Return dictionary describing the state of the service."""
+        with self.lock:
+            return {
+                "status": "ok",
+                "jobs": self.jobs,
+                "pending": len(self.running),
+                "max_pending": self.max_pending,
+            }
+
+    def metrics(self):
+        """Return dictionary of request counts, cache use, and latencies."""
+        with self.lock:
+            counts = dict(self.counts)
+            latencies = sorted(self.latencies)
+            cached = len(self.cache)
+        hits = counts.get("cache_hits", 0)
+        lookups = sum(
+            counts.get(name, 0)
+            for name in ("cache_hits", "cache_misses", "coalesced")
+        )
+        metrics = {
+            name: counts.get(name, 0)
+            for name in (
+                "requests",
+                "cache_hits",
+                "cache_misses",
+                "coalesced",
+                "rejected",
+                "errors",
+            )
+        }
+        metrics["cache_hit_rate"] = hits / lookups if lookups else 0.0
+        metrics["cached_results"] = cached
+        for percentile in (50, 90, 99):
+            seconds = None
+            if latencies:
+                index = round(percentile / 100 * (len(latencies) - 1))
+                seconds = latencies[index]
+            metrics[f"latency_p{percentile}_seconds"] = seconds
+        return metrics
+
+    def close(self):
+        """Shut down the worker processes."""
+        self.pool.shutdown(cancel_futures=True)
+
+
+def make_request_handler(service, max_body_size=2**22):
+    """
+    Return HTTP request handler class for the given ConversionService.
+
+    POST /convert accepts a JSON object with a "source" string & optional
+    "options" object and responds with a JSON object with "code" and
+    "warnings" (or "error").  GET /health and GET /metrics respond with the
+    service's health() and metrics() as JSON.
+    """
+    from http.server import BaseHTTPRequestHandler
+    import json
+
+    class ConversionRequestHandler(BaseHTTPRequestHandler):
+
+        def send_json(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.send_json(200, service.health())
+            elif self.path == "/metrics":
+                self.send_json(200, service.metrics())
+            else:
+                self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/convert":
+                self.send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length"))
+            except (ValueError, TypeError):
+                length = -1
+            if length < 0:
+                self.send_json(400, {
+                    "error": "Expected a non-negative integer Content-Length",
+                })
+                return
+            if length > max_body_size:
+                self.send_json(413, {"error": "Request body too large"})
+                return
+            try:
+                request = json.loads(self.rfile.read(length))
+                source = request["source"].encode()
+                options = dict(request.get("options", {}))
+            except (ValueError, TypeError, KeyError, AttributeError):
+                self.send_json(400, {
+                    "error": 'Expected JSON object with a "source" string',
+                })
+                return
+            try:
+                new_code, messages = service.convert(source, options)
+            except ServiceBusy as error:
+                self.send_json(503, {"error": f"Server busy: {error}"})
+            except Exception as error:
+                self.send_json(400, {
+                    "error": f"{type(error).__name__}: {error}",
+                })
+            else:
+                self.send_json(200, {"code": new_code, "warnings": messages})
+
+    return ConversionRequestHandler
+
+
+def serve(argv=None):
+    """Run an HTTP server that converts code (see make_request_handler)."""
+    from argparse import ArgumentParser
+    from http.server import ThreadingHTTPServer
+    parser = ArgumentParser(
+        prog="undataclass serve",
+        description="Serve dataclass conversions over HTTP",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="port to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        help="number of recent results to keep (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        help="conversions allowed to run or wait at once (default: 4 per job)",
+    )
+    args = parser.parse_args(argv)
+    service = ConversionService(args.jobs, args.cache_size, args.max_pending)
+    handler = make_request_handler(service)
+    with ThreadingHTTPServer((args.host, args.port), handler) as server:
+        host, port = server.server_address[:2]
+        print(f"Serving on http://{host}:{port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.close()
+    return 0
+
+
+def report_stats(stats, profile=False, json_path=None):
+    """Print stats report to stderr and/or write them to a JSON file."""
+    if profile:
+        print(stats.report(), file=sys.stderr)
+    if json_path:
+        import json
+        json_path.write_text(json.dumps(stats.as_dict(), indent=2) + "\n")
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["serve"]:
+        return serve(argv[1:])
+    if argv == ["runtime"]:
+        print(SHARED_RUNTIME, end="")
+        return 0
+    from argparse import ArgumentParser
+    parser = ArgumentParser(
+        description="Turn dataclasses into not-dataclasses",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        metavar="path",
+        help="Python file, directory, or glob pattern ('-' for stdin) "
+        "or 'serve' to run an HTTP conversion server (see 'serve --help') "
+        "or 'runtime' to print the module used by --shared-runtime",
+    )
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument(
+        "-o", "--output-dir",
+        type=Path,
+        help="write converted files into this directory tree",
+    )
+    output.add_argument(
+        "-i", "--in-place",
+        action="store_true",
+        help="overwrite each file with its converted version",
+    )
+    output.add_argument(
+        "--check",
+        action="store_true",
+        help="don't convert, exit 1 at the first file with dataclasses",
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=default_cache_dir(),
+        help="directory for cached results (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_const",
+        const=None,
+        dest="cache_dir",
+        help="don't read or write cached results",
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_false",
+        dest="index",
+        help="don't look up fields of dataclasses imported from other "
+        "modules",
+    )
+    parser.add_argument(
+        "--splice",
+        action="store_true",
+        help="only rewrite dataclasses, keeping all other code as-is",
+    )
+    parser.add_argument(
+        "--fast-compare",
+        action="store_true",
+        help="generate __eq__, __lt__ & __hash__ methods that avoid tuples",
+    )
+    parser.add_argument(
+        "--fast-frozen-init",
+        action="store_true",
+        help="generate frozen __init__ methods that set fields faster",
+    )
+    parser.add_argument(
+        "--cache-hash",
+        action="store_true",
+        help="compute the hash of frozen instances only once",
+    )
+    parser.add_argument(
+        "--auto-slots",
+        action="store_true",
+        help="add __slots__ to dataclasses where that looks safe",
+    )
+    parser.add_argument(
+        "--tuple-backed",
+        action="store_true",
+        help="make frozen dataclasses tuple subclasses where that looks safe",
+    )
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="generate __replace__ methods (like dataclasses.replace)",
+    )
+    parser.add_argument(
+        "--asdict-methods",
+        action="store_true",
+        help="generate _asdict & _astuple methods for every dataclass",
+    )
+    parser.add_argument(
+        "--field-table",
+        action="store_true",
+        help="add a __field_table__ attribute to every dataclass",
+    )
+    parser.add_argument(
+        "--shared-runtime",
+        metavar="MODULE",
+        help="import generic methods (like __repr__ & __eq__) from MODULE "
+        "(see 'runtime') instead of generating them for every class",
+    )
+    parser.add_argument(
+        "--annotations",
+        choices=ANNOTATION_MODES,
+        default="keep",
+        help="keep annotations, make them lazy (with a __future__ import), "
+        "or strip them from converted classes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--stubs",
+        action="store_true",
+        help="write a .pyi stub with typed signatures next to each "
+        "converted file",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print timings & statistics for the conversion to stderr",
+    )
+    parser.add_argument(
+        "--stats-json",
+        type=Path,
+        metavar="FILE",
+        help="write timings & statistics for the conversion as JSON",
+    )
+    args = parser.parse_args(argv)
+    options = {
+        "splice": args.splice,
+        "fast_compare": args.fast_compare,
+        "fast_frozen_init": args.fast_frozen_init,
+        "cache_hash": args.cache_hash,
+        "auto_slots": args.auto_slots,
+        "tuple_backed": args.tuple_backed,
+        "replace": args.replace,
+        "asdict_methods": args.asdict_methods,
+        "field_table": args.field_table,
+        "shared_runtime": args.shared_runtime,
+        "annotations": args.annotations,
+    }
+    if args.check:
+        return check_files(iter_python_files(args.paths))
+    stats = None
+    if args.profile or args.stats_json:
+        stats = UndataclassStats()
+    index = None
+    if args.index:
+        index = DataclassIndex(
+            [
+                *(path for path in args.paths if Path(path).is_dir()),
+                Path.cwd(),
+            ],
+            args.cache_dir,
+        )
+    if not (args.output_dir or args.in_place):
+        [path, *rest] = args.paths
+        if rest or has_magic(path) or Path(path).is_dir():
+            parser.error(
+                "converting multiple files requires --output-dir or --in-place"
+            )
+        if args.stubs:
+            parser.error("--stubs requires --output-dir or --in-place")
+        try:
+            if path == "-":
+                source = sys.stdin.buffer.read()
+            else:
+                source = Path(path).read_bytes()
+        except OSError as error:
+            parser.error(str(error))
+        with reported_warnings(path):
+            new_code = cached_undataclass(
+                source,
+                args.cache_dir,
+                stats,
+                index,
+                None if path == "-" else path,
+                **options,
+            )
+        print(new_code, end="" if new_code.endswith("\n") else "\n")
+        if args.cache_dir is not None:
+            prune_cache(args.cache_dir)
+        report_stats(stats, args.profile, args.stats_json)
+        return 0
+    files = iter_python_files(args.paths)
+    if args.in_place:
+        file_pairs = [(source, source) for source, _ in files]
+        if index is not None:
+            index.preload(source for source, _ in file_pairs)
+    else:
+        file_pairs = [
+            (source, args.output_dir / relative)
+            for source, relative in files
+        ]
+    status = 0
+    errors = convert_files(
+        file_pairs,
+        args.jobs,
+        args.cache_dir,
+        stats,
+        index,
+        args.stubs,
+        **options,
+    )
+    for error in errors:
+        print(error, file=sys.stderr)
+        status = 1
+    if args.cache_dir is not None:
+        prune_cache(args.cache_dir)
+    report_stats(stats, args.profile, args.stats_json)
+    return status
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())